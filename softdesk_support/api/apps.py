@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SupportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # Connexion des signaux
+        from . import signals  # noqa: F401
@@ -0,0 +1,88 @@
+"""
+Requêtes GET conditionnelles (ETag / Last-Modified).
+
+Les validateurs sont calculés avec une agrégation (date de dernière
+modification et nombre de lignes) servie par les index, avant toute
+sérialisation. Un client qui envoie If-None-Match ou If-Modified-Since
+reçoit une réponse 304 vide si rien n'a changé.
+
+Les listes n'ont pas d'en-tête Last-Modified : la suppression d'une ligne
+ne change pas la date de dernière modification des lignes restantes, seul
+l'ETag (qui inclut le nombre de lignes) la détecte.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+Validators = namedtuple('Validators', ['etag', 'last_modified'])
+
+
+def make_validators(request, last_modified, *parts):
+    # La représentation dépend de l'URL (curseur, filtres), de l'utilisateur
+    # et du format demandé
+    key = '|'.join(str(part) for part in (
+        request.get_full_path(),
+        request.user.pk,
+        request.META.get('HTTP_ACCEPT', ''),
+        last_modified.isoformat() if last_modified else '',
+        *parts
+    ))
+    etag = hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+    return Validators(quote_etag(etag), last_modified)
+
+
+def list_state(queryset):
+    """
+    Last modification time and number of rows of a list
+    """
+    aggregate = queryset.order_by().aggregate(
+        last_modified=Max('updated_time'),
+        count=Count('id')
+    )
+    return aggregate['last_modified'], aggregate['count']
+
+
+def state_validators(request, last_modified, count):
+    """
+    Validators of a list state: ETag only
+    """
+    return make_validators(request, last_modified, count)._replace(
+        last_modified=None
+    )
+
+
+def list_validators(request, queryset):
+    return state_validators(request, *list_state(queryset))
+
+
+def instance_validators(request, instance):
+    return make_validators(request, instance.updated_time, instance.pk)
+
+
+def add_validators(response, validators):
+    response['ETag'] = validators.etag
+    if validators.last_modified is not None:
+        response['Last-Modified'] = http_date(
+            validators.last_modified.timestamp()
+        )
+    patch_vary_headers(response, ['Accept', 'Authorization'])
+    return response
+
+
+def not_modified(request, validators):
+    """
+    304 (or 412) response if the client's copy is still valid, else None
+    """
+    last_modified = validators.last_modified
+    response = get_conditional_response(
+        request,
+        etag=validators.etag,
+        last_modified=int(last_modified.timestamp()) if last_modified
+        else None
+    )
+    if response is not None:
+        add_validators(response, validators)
+    return response
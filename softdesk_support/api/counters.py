@@ -0,0 +1,131 @@
+"""
+Compteurs dénormalisés des projets : nombre de tickets par statut, priorité
+et tag, nombre de commentaires et date de dernière activité.
+
+Les signaux (api/signals.py) appliquent des différences avec des
+expressions F() : une seule requête UPDATE par modification, sans relire
+les tickets du projet. rebuild_counters() recalcule tout depuis les tables
+si les compteurs dérivent (commande rebuild_project_counters).
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from .models import Project, Issue, Comment
+
+
+def _counter_fields():
+    fields = {}
+    for name, choices in (
+            ('status', Issue.STATUS_CHOICES),
+            ('priority', Issue.PRIORITY_CHOICES),
+            ('tag', Issue.TAG_CHOICES)
+    ):
+        for value, _ in choices:
+            fields[(name, value)] = f'issues_{value.lower()}'
+    return fields
+
+
+# (champ du ticket, valeur) -> champ compteur du projet
+COUNTER_FIELDS = _counter_fields()
+
+SUMMARY_FIELDS = [
+    *COUNTER_FIELDS.values(),
+    'comments_count',
+    'last_activity_time',
+]
+
+
+def issue_deltas(values, weight=1):
+    """
+    Counter differences for issues given as (status, priority, tag) tuples,
+    each counted `weight` times (-1 for removed issues).
+    Values that aren't valid choices aren't counted.
+    """
+    deltas = Counter()
+    for status, priority, tag in values:
+        for name, value in (
+                ('status', status),
+                ('priority', priority),
+                ('tag', tag)
+        ):
+            field = COUNTER_FIELDS.get((name, value))
+            if field is not None:
+                deltas[field] += weight
+    return deltas
+
+
+def apply_deltas(project_id, deltas=None, comments=0, touch=True):
+    """
+    Apply counter differences to a project in a single UPDATE
+    """
+    updates = {
+        field: F(field) + delta
+        for field, delta in (deltas or {}).items() if delta
+    }
+    if comments:
+        updates['comments_count'] = F('comments_count') + comments
+    if touch:
+        updates['last_activity_time'] = timezone.now()
+    if updates:
+        Project.objects.filter(pk=project_id).update(**updates)
+
+
+def rebuild_counters(project_ids=None, apps=None):
+    """
+    Recompute the counters of the given projects (all by default) from the
+    issue and comment tables. Returns the number of updated projects.
+    `apps` is the app registry of a data migration.
+    """
+    if apps is None:
+        project_model, issue_model, comment_model = Project, Issue, Comment
+    else:
+        project_model, issue_model, comment_model = (
+            apps.get_model('api', name)
+            for name in ('Project', 'Issue', 'Comment')
+        )
+    projects = project_model.objects.all()
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+    project_ids = list(projects.values_list('id', flat=True))
+
+    issue_counts = {
+        row.pop('project_id'): row
+        for row in issue_model.objects.filter(project_id__in=project_ids)
+        .values('project_id')
+        .annotate(
+            last_issue=Max('created_time'),
+            **{
+                field: Count('id', filter=Q(**{name: value}))
+                for (name, value), field in COUNTER_FIELDS.items()
+            }
+        )
+    }
+    comment_counts = {
+        row['project_id']: row
+        for row in comment_model.objects.filter(project_id__in=project_ids)
+        .values('project_id')
+        .annotate(comments_count=Count('id'), last_comment=Max('created_time'))
+    }
+
+    with transaction.atomic():
+        for project_id in project_ids:
+            issues = issue_counts.get(project_id, {})
+            comments = comment_counts.get(project_id, {})
+            activity = [
+                time for time in (
+                    issues.pop('last_issue', None),
+                    comments.get('last_comment')
+                ) if time is not None
+            ]
+            project_model.objects.filter(pk=project_id).update(
+                comments_count=comments.get('comments_count', 0),
+                last_activity_time=max(activity, default=None),
+                **{
+                    field: issues.get(field, 0)
+                    for field in COUNTER_FIELDS.values()
+                }
+            )
+    return len(project_ids)
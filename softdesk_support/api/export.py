@@ -0,0 +1,146 @@
+"""
+Export d'un projet au format NDJSON (un objet JSON par ligne).
+
+La première ligne contient le projet, puis ses tickets et ses commentaires,
+sous la forme {"model": ..., "pk": ..., "fields": {...}}. Les lignes sont
+lues avec QuerySet.iterator() par paquets et sérialisées à partir de
+values() : la mémoire utilisée ne dépend pas de la taille du projet.
+
+Toutes les lectures sont faites dans une transaction de lecture : l'export
+est un instantané de la base, même si des tickets ou des commentaires
+changent pendant sa lecture (pas de commentaire sans son ticket). Elles
+vont sur la base principale (voir ReplicaRouter).
+
+La vue écrit l'export dans un fichier temporaire (en mémoire jusqu'à
+EXPORT_SPOOL_MAX_SIZE octets) avant de l'envoyer : la transaction dure le
+temps de la lecture de la base, pas celui du téléchargement, et ne bloque
+pas les checkpoints du WAL pendant qu'un client lent lit la réponse. Le
+fichier est envoyé par un itérateur synchrone en WSGI et asynchrone en ASGI
+(Django mettrait sinon toute la réponse en mémoire).
+"""
+import tempfile
+import zlib
+from contextlib import contextmanager, nullcontext
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Issue, Comment
+from .serializers import ProjectSerializer, IssueSerializer, \
+    CommentSerializer, values_fields
+
+# En-tête et fin de fichier gzip (zlib avec wbits = 16 + 15)
+GZIP_WBITS = 31
+
+# Taille des morceaux de la réponse lus dans le fichier temporaire
+FILE_CHUNK_SIZE = 64 * 1024
+
+_encoder = JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def _line(model, pk, fields):
+    return _encoder.encode(
+        {'model': model, 'pk': pk, 'fields': fields}
+    ).encode() + b'\n'
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _rows(model, queryset, serializer_class, chunk_size):
+    queryset = queryset.values(*values_fields(serializer_class))
+    for rows in _chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+        data = serializer_class(rows, many=True).data
+        # Un paquet de lignes par morceau de la réponse
+        yield b''.join(
+            _line(model, row['id'], item) for row, item in zip(rows, data)
+        )
+
+
+@contextmanager
+def read_transaction(using=DEFAULT_DB_ALIAS):
+    # Le moteur SQLite de production commence ses transactions par BEGIN
+    # IMMEDIATE : celle-ci, qui dure tout l'envoi, ne prend pas le verrou
+    # d'écriture
+    connection = connections[using]
+    deferred = getattr(connection, 'deferred_transactions', nullcontext)
+    with deferred(), transaction.atomic(using=using):
+        yield
+
+
+def export_project(project, chunk_size=None):
+    """
+    NDJSON lines of a project, its issues and its comments, as chunks of
+    bytes
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    with read_transaction():
+        yield _line(
+            'api.project', project.pk, ProjectSerializer(project).data
+        )
+        yield from _rows(
+            'api.issue',
+            Issue.objects.filter(project=project)
+            .order_by('created_time', 'id'),
+            IssueSerializer, chunk_size
+        )
+        yield from _rows(
+            'api.comment',
+            Comment.objects.filter(project=project).order_by('id'),
+            CommentSerializer, chunk_size
+        )
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=GZIP_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def spool_export(project, compress=False, chunk_size=None):
+    """
+    Export of a project written to a temporary file, returned with its
+    size and positioned at its start. The read transaction ends before
+    the file is sent.
+    """
+    spool = tempfile.SpooledTemporaryFile(
+        max_size=settings.EXPORT_SPOOL_MAX_SIZE
+    )
+    chunks = export_project(project, chunk_size)
+    if compress:
+        chunks = gzip_stream(chunks)
+    try:
+        for chunk in chunks:
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    size = spool.tell()
+    spool.seek(0)
+    return spool, size
+
+
+def file_chunks(file):
+    with file:
+        while chunk := file.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+async def afile_chunks(file):
+    # Lectures hors de la boucle d'événements (fichier sur disque au-delà
+    # de EXPORT_SPOOL_MAX_SIZE)
+    read = sync_to_async(file.read, thread_sensitive=False)
+    try:
+        while chunk := await read(FILE_CHUNK_SIZE):
+            yield chunk
+    finally:
+        file.close()
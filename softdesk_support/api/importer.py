@@ -0,0 +1,333 @@
+"""
+Import en masse de projets, tickets et commentaires (commande
+import_softdesk).
+
+Les enregistrements ont le format de l'export (api/export.py) :
+{"model": "api.issue", "pk": 12, "fields": {...}}, un par ligne en NDJSON
+ou une ligne CSV avec les colonnes model, pk et les champs. Les
+utilisateurs sont donnés par id ou par nom d'utilisateur et les ids
+d'origine sont conservés, ce qui garde les relations entre les lignes.
+
+Les lignes sont insérées par lots avec bulk_create, un lot par
+transaction. Un import interrompu est relancé depuis le dernier lot validé
+(fichier de reprise) : un id déjà présent dans la base est une collision
+avec une autre ligne et arrête l'import, le lot est annulé.
+bulk_create n'envoie pas de signaux : les compteurs des projets du lot
+sont recalculés dans sa transaction (justes après un arrêt de l'import) et
+les caches sont invalidés ici.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import response_cache
+from .counters import rebuild_counters
+from .membership import invalidate_projects
+from .models import Project, Issue, Comment
+
+MODELS = {
+    'api.project': Project,
+    'api.issue': Issue,
+    'api.comment': Comment,
+}
+
+# Ordre d'insertion d'un lot : les lignes référencées d'abord
+INSERT_ORDER = (Project, Issue, Comment)
+
+# Séparateur des contributeurs d'un projet en CSV
+CSV_LIST_SEPARATOR = '|'
+
+
+class InvalidRecord(ValueError):
+
+    def __init__(self, message, record=None):
+        if record is not None:
+            message = f"record {record}: {message}"
+        super().__init__(message)
+
+
+def open_source(path):
+    # '-' : entrée standard ; les fichiers .gz sont décompressés à la volée
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_ndjson(stream):
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def read_csv(stream):
+    for row in csv.DictReader(stream):
+        model, pk = row.pop('model'), row.pop('pk')
+        # Cellule vide : valeur absente
+        fields = {name: value for name, value in row.items() if value != ''}
+        if 'contributors' in fields:
+            fields['contributors'] = \
+                fields['contributors'].split(CSV_LIST_SEPARATOR)
+        yield {'model': model, 'pk': int(pk), 'fields': fields}
+
+
+READERS = {
+    'ndjson': read_ndjson,
+    'csv': read_csv,
+}
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+@contextmanager
+def source_created_time(models=None):
+    # bulk_create remplit created_time (auto_now_add) avec la date
+    # courante : la date d'origine est conservée pendant l'import
+    fields = [
+        model._meta.get_field('created_time')
+        for model in models or MODELS.values()
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+@contextmanager
+def deferred_indexes(models):
+    """
+    Drop the secondary indexes declared in Meta.indexes during the import
+    and recreate them once at the end
+    """
+    with connection.schema_editor() as editor:
+        for model in models:
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+    try:
+        yield
+    finally:
+        with connection.schema_editor() as editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    editor.add_index(model, index)
+
+
+@contextmanager
+def deferred_constraints():
+    """
+    Disable foreign key checks during the import if the backend allows it
+    (SQLite, MySQL) and check the imported tables once at the end
+    """
+    disabled = connection.disable_constraint_checking()
+    try:
+        yield disabled
+    finally:
+        if disabled:
+            connection.enable_constraint_checking()
+    if disabled:
+        connection.check_constraints(table_names=[
+            model._meta.db_table
+            for model in (*MODELS.values(), Project.contributors.through)
+        ])
+
+
+class Checkpoint:
+    """
+    Number of records of a source already committed, kept in a JSON file
+    """
+
+    def __init__(self, path, source):
+        self.path = path
+        self.source = os.path.abspath(source) if source != '-' else source
+
+    def load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return 0
+        with open(self.path) as file:
+            state = json.load(file)
+        if state['source'] != self.source:
+            raise ValueError(
+                f"checkpoint {self.path} belongs to {state['source']}"
+            )
+        return state['records']
+
+    def save(self, records):
+        if self.path is None:
+            return
+        # Écriture atomique : le fichier reste lisible si l'import s'arrête
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'source': self.source, 'records': records}, file)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class Importer:
+
+    def __init__(self, batch_size=5000, log=None):
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        User = get_user_model()
+        # Correspondance des utilisateurs chargée une seule fois
+        self.user_ids = set(User.objects.values_list('id', flat=True))
+        self.usernames = dict(User.objects.values_list('username', 'id'))
+        self.counts = Counter()
+        self.records = 0
+
+    def run(self, records, skip=0, on_batch=None):
+        """
+        Import records, skipping the first `skip` ones (already imported).
+        on_batch(records) is called after each committed batch.
+        """
+        self.records = skip
+        self.start = time.perf_counter()
+        # Date de création des lignes qui n'en ont pas
+        self.now = timezone.now()
+        batch = []
+        for number, record in enumerate(records, 1):
+            if number <= skip:
+                continue
+            batch.append((number, record))
+            if len(batch) >= self.batch_size:
+                self.flush(batch, on_batch)
+                batch = []
+        if batch:
+            self.flush(batch, on_batch)
+        return self.counts
+
+    def flush(self, batch, on_batch):
+        rows = {model: [] for model in INSERT_ORDER}
+        numbers = {}
+        contributors = []
+        for number, record in batch:
+            model, instance, users = self.build(number, record)
+            rows[model].append(instance)
+            numbers[model, instance.pk] = number
+            contributors += [
+                Project.contributors.through(
+                    project_id=instance.pk, user_id=user_id
+                )
+                for user_id in users
+            ]
+        with transaction.atomic():
+            for model in INSERT_ORDER:
+                self.check_collisions(model, rows[model], numbers)
+                model.objects.bulk_create(rows[model])
+            Project.contributors.through.objects.bulk_create(
+                contributors, ignore_conflicts=True
+            )
+            rebuild_counters(self.batch_projects(rows))
+        self.invalidate(rows, contributors)
+        for model in INSERT_ORDER:
+            self.counts[model._meta.label_lower] += len(rows[model])
+        self.records = batch[-1][0]
+        if on_batch is not None:
+            on_batch(self.records)
+        self.log(
+            f"{self.records} records, "
+            f"{self.throughput():.0f} records/s"
+        )
+
+    def check_collisions(self, model, instances, numbers):
+        # Une requête par lot. Les lignes des lots validés ne sont jamais
+        # relues (fichier de reprise) : un id présent appartient à une
+        # autre ligne, qui ne doit ni être ignorée ni recevoir les lignes
+        # liées de l'import. ignore_conflicts n'est pas utilisé car SQLite
+        # ignorerait aussi les autres erreurs (NOT NULL) sans les signaler.
+        if not instances:
+            return
+        existing = (
+            model.objects.filter(pk__in=[row.pk for row in instances])
+            .order_by('pk').values_list('pk', flat=True).first()
+        )
+        if existing is not None:
+            raise InvalidRecord(
+                f"{model._meta.label_lower} {existing} already exists",
+                numbers[model, existing]
+            )
+
+    def batch_projects(self, rows):
+        project_ids = {project.pk for project in rows[Project]}
+        project_ids.update(issue.project_id for issue in rows[Issue])
+        project_ids.update(comment.project_id for comment in rows[Comment])
+        return project_ids
+
+    def invalidate(self, rows, contributors):
+        # Appartenances : projets créés et projets qui reçoivent des
+        # contributeurs
+        members = {project.pk for project in rows[Project]}
+        members.update(row.project_id for row in contributors)
+        if members:
+            invalidate_projects(*members)
+        if rows[Issue]:
+            response_cache.invalidate(
+                response_cache.ISSUES,
+                *{issue.project_id for issue in rows[Issue]}
+            )
+        if rows[Comment]:
+            response_cache.invalidate(
+                response_cache.COMMENTS,
+                *{comment.issue_id for comment in rows[Comment]}
+            )
+
+    def throughput(self):
+        elapsed = time.perf_counter() - self.start
+        return sum(self.counts.values()) / elapsed if elapsed else 0
+
+    def build(self, number, record):
+        try:
+            model = MODELS[record['model']]
+            pk, fields = int(record['pk']), record['fields']
+        except (KeyError, TypeError, ValueError):
+            raise InvalidRecord("expected model, pk and fields", number)
+        values, users = {'pk': pk, 'created_time': self.now}, []
+        for name, value in fields.items():
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise InvalidRecord(f"unknown field {name}", number)
+            if field.many_to_many:
+                users = [self.get_user(user, number) for user in value]
+            elif field.is_relation:
+                if field.related_model is get_user_model():
+                    value = self.get_user(value, number)
+                values[field.attname] = None if value is None else int(value)
+            elif field.get_internal_type() == 'DateTimeField':
+                values[name] = parse_datetime(value) if value else None
+            else:
+                values[name] = value
+        return model, model(**values), users
+
+    def get_user(self, value, number):
+        # Id ou nom d'utilisateur
+        if value is None:
+            return None
+        if isinstance(value, int) or str(value).isdigit():
+            if int(value) in self.user_ids:
+                return int(value)
+        if str(value) in self.usernames:
+            return self.usernames[str(value)]
+        raise InvalidRecord(f"unknown user {value}", number)
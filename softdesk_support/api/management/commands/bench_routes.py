@@ -0,0 +1,434 @@
+import json
+import math
+import statistics
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from authentication.models import User
+from api.models import Project, Issue, Comment
+
+# Inclusions de urls.py qui ne font pas partie de l'API
+EXCLUDED_ROUTES = ('admin/', 'api-auth/')
+
+PASSWORD = 'bench-routes'
+
+# Cache des réponses désactivé (--cold) : chaque liste lit la base
+COLD_CACHES = {
+    'responses': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+}
+
+# route : motif de urls.py (ResolverMatch.route), user : nom de
+# l'utilisateur des fixtures (None : anonyme), build(n) : (chemin, données)
+# de la n-ième requête, sans les objets à créer avant (non mesurés)
+Scenario = namedtuple('Scenario', ['method', 'route', 'user', 'build'])
+
+
+class Rollback(Exception):
+    pass
+
+
+def url_routes(patterns=None, prefix=''):
+    """
+    Routes of urls.py as in ResolverMatch.route, without the admin and
+    browsable API ones
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    routes = []
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern).lstrip('^')
+        if route.startswith(EXCLUDED_ROUTES):
+            continue
+        if hasattr(pattern, 'url_patterns'):
+            routes += url_routes(pattern.url_patterns, route)
+        else:
+            routes.append(route)
+    return routes
+
+
+def percentile(values, percent):
+    # Rang le plus proche, sur des valeurs triées
+    return values[max(math.ceil(len(values) * percent / 100) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Send requests to every route of urls.py through the test client, "
+        "on the largest project of the database (see the seed command), "
+        "and report p50/p95/p99 latency, queries per request and "
+        "throughput. Everything runs in a transaction that is rolled back, "
+        "then the caches are cleared."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20,
+                            help="Measured requests per route")
+        parser.add_argument('--warmup', type=int, default=2,
+                            help="Unmeasured requests per route first")
+        parser.add_argument(
+            '--routes', nargs='*',
+            help="Only the routes containing one of these strings"
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help="Disable the response cache of the issue and comment lists"
+        )
+        parser.add_argument('--json', action='store_true',
+                            help="Print the results as JSON")
+        parser.add_argument(
+            '--baseline',
+            help="JSON results of a previous run to compare the p95 with"
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] <= 0 or options['warmup'] < 0:
+            raise CommandError("--iterations must be positive")
+        baseline = {}
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as file:
+                    baseline = {
+                        (row['method'], row['route']): row
+                        for row in json.load(file)['routes']
+                    }
+            except (OSError, ValueError, KeyError) as error:
+                raise CommandError(f"Invalid baseline: {error}")
+
+        overrides = {
+            # Hôte des requêtes du client de test
+            'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'testserver'],
+            # Aucune limite de débit
+            'REST_FRAMEWORK': {
+                **settings.REST_FRAMEWORK,
+                'DEFAULT_THROTTLE_RATES': dict.fromkeys(
+                    settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+                ),
+            },
+        }
+        if options['cold']:
+            overrides['CACHES'] = {**settings.CACHES, **COLD_CACHES}
+        try:
+            with override_settings(**overrides), transaction.atomic():
+                results = self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+        finally:
+            # Entrées des lignes annulées
+            for cache in caches.all():
+                cache.clear()
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'iterations': options['iterations'],
+                'cold': options['cold'],
+                'routes': results,
+            }))
+        else:
+            for row in results:
+                self.stdout.write(self.format(
+                    row, baseline.get((row['method'], row['route']))
+                ))
+
+    def format(self, row, previous):
+        line = (
+            f"{row['method']:6} {row['route']:60} "
+            f"p50 {row['p50_ms']:7.1f} ms  p95 {row['p95_ms']:7.1f} ms  "
+            f"p99 {row['p99_ms']:7.1f} ms  "
+            f"{row['queries']:5.1f} queries  "
+            f"{row['requests_per_second']:6.0f} req/s"
+        )
+        if row['errors']:
+            line += f"  {row['errors']} error(s)"
+        if previous:
+            change = (row['p95_ms'] / previous['p95_ms'] - 1) * 100 \
+                if previous['p95_ms'] else 0
+            line += f"  p95 {change:+.0f}%"
+        return line
+
+    def run(self, options):
+        fixtures = self.create_fixtures()
+        scenarios = self.scenarios(fixtures)
+        missing = set(url_routes()) - {
+            scenario.route for scenario in scenarios
+        }
+        if missing:
+            raise CommandError(f"Routes without scenario: {sorted(missing)}")
+        if options['routes']:
+            scenarios = [
+                scenario for scenario in scenarios
+                if any(name in scenario.route for name in options['routes'])
+            ]
+        client = Client()
+        tokens = {
+            name: f'Bearer {AccessToken.for_user(user)}'
+            for name, user in fixtures.items()
+            if isinstance(user, User)
+        }
+        results = []
+        for scenario in scenarios:
+            headers = {}
+            if scenario.user is not None:
+                headers['HTTP_AUTHORIZATION'] = tokens[scenario.user]
+            for number in range(options['warmup']):
+                self.call(client, scenario, headers, -number - 1)
+            latencies, queries, errors = [], [], 0
+            for number in range(options['iterations']):
+                latency, count, status = self.call(
+                    client, scenario, headers, number
+                )
+                latencies.append(latency)
+                queries.append(count)
+                errors += status >= 400
+            latencies.sort()
+            results.append({
+                'method': scenario.method,
+                'route': scenario.route,
+                'requests': len(latencies),
+                'errors': errors,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p95_ms': percentile(latencies, 95) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'mean_ms': statistics.mean(latencies) * 1000,
+                'queries': statistics.mean(queries),
+                'requests_per_second': len(latencies) / sum(latencies),
+            })
+        return results
+
+    def call(self, client, scenario, headers, number):
+        path, data = scenario.build(number)
+        kwargs = dict(headers)
+        if scenario.method != 'GET':
+            data = '' if data is None else data
+            if (scenario.method, scenario.route) != ('POST', 'api/projects'):
+                # JSON, sauf la création de projet qui attend un formulaire
+                kwargs['content_type'] = 'application/json'
+        request = getattr(client, scenario.method.lower())
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = request(path, data, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            latency = time.perf_counter() - start
+        return latency, len(context), response.status_code
+
+    def create_fixtures(self):
+        # Plus gros projet (compteurs dénormalisés), son auteur et son
+        # ticket le plus commenté
+        project = Project.objects.select_related('author').order_by(
+            -(F('issues_to_do') + F('issues_in_progress') +
+              F('issues_finished')),
+            'id'
+        ).first()
+        if project is None:
+            raise CommandError("The database is empty, run "
+                               "`manage.py seed` first.")
+        author = project.author
+        author.set_password(PASSWORD)
+        author.save(update_fields=['password'])
+        member = project.contributors.exclude(pk=author.pk).first()
+        if member is None:
+            member = self.create_user('member')
+            project.contributors.add(member)
+        admin = self.create_user('admin', is_staff=True, is_superuser=True)
+        row = Comment.objects.filter(project=project).values('issue') \
+            .annotate(comments=Count('id')).order_by('-comments').first()
+        issue = Issue.objects.get(pk=row['issue']) if row else \
+            self.create_issue(project, author)
+        # Objets modifiés par les requêtes : créés par l'auteur
+        own_issues = [self.create_issue(project, author) for _ in range(10)]
+        own_comment = self.create_comment(own_issues[0], author)
+        return {
+            'author': author,
+            'member': member,
+            'admin': admin,
+            'collaborator': self.create_user('collaborator'),
+            'project': project,
+            'issue': issue,
+            'own_issues': own_issues,
+            'own_comment': own_comment,
+            'refresh': str(RefreshToken.for_user(author)),
+        }
+
+    def create_user(self, name, **fields):
+        return User.objects.create_user(
+            username=f'bench-routes-{name}', password=PASSWORD,
+            email=f'bench-routes-{name}@softdesk.example', age=30,
+            can_be_contacted=False, can_data_be_shared=False, **fields
+        )
+
+    def create_project(self, author):
+        project = Project.objects.create(
+            author=author, name='bench', description='bench',
+            type=Project.BACK_END
+        )
+        project.contributors.add(author)
+        return project
+
+    def create_issue(self, project, author):
+        return Issue.objects.create(
+            project=project, author=author, contributor=author,
+            name='bench', description='bench', priority=Issue.LOW,
+            tag=Issue.BUG
+        )
+
+    def create_comment(self, issue, author):
+        return Comment.objects.create(
+            project_id=issue.project_id, issue=issue, author=author,
+            description='bench'
+        )
+
+    def scenarios(self, f):
+        author, project, issue = f['author'], f['project'], f['issue']
+        own_issue, own_comment = f['own_issues'][0], f['own_comment']
+        p = f'/api/projects/{project.pk}'
+        issue_item = {'name': 'bench', 'description': 'bench',
+                      'priority': 'LOW', 'tag': 'BUG'}
+
+        def new_user(number):
+            name = f'bench-routes-new-{number}'
+            return {
+                'username': name, 'email': f'{name}@softdesk.example',
+                'password': PASSWORD, 'first_name': 'Bench',
+                'last_name': 'Routes', 'age': 30, 'can_be_contacted': False,
+                'can_data_be_shared': False,
+            }
+
+        def bulk_users(number):
+            return [new_user(f'{number}-{i}') for i in range(3)]
+
+        def sign_up(number):
+            return {**new_user(f'sign-up-{number}'), 'password2': PASSWORD}
+
+        def delete_user(number):
+            user = self.create_user(f'delete-{number}')
+            return f'/api/users/{user.pk}/', None
+
+        def delete_project(number):
+            return f'/api/projects/{self.create_project(author).pk}/', None
+
+        def delete_issue(number):
+            new_issue = self.create_issue(project, author)
+            return f'{p}/issues/{new_issue.pk}/', None
+
+        def delete_comment(number):
+            comment = self.create_comment(own_issue, author)
+            return f'/api/issues/{own_issue.pk}/comments/{comment.pk}/', None
+
+        return [
+            Scenario('GET', 'api/users/$', 'admin',
+                     lambda n: ('/api/users/', None)),
+            Scenario('POST', 'api/users/bulk/$', 'admin',
+                     lambda n: ('/api/users/bulk/', bulk_users(n))),
+            Scenario('GET', 'api/users/(?P<pk>[^/.]+)/$', 'author',
+                     lambda n: (f'/api/users/{author.pk}/', None)),
+            Scenario('PATCH', 'api/users/(?P<pk>[^/.]+)/$', 'author',
+                     lambda n: (f'/api/users/{author.pk}/',
+                                {'first_name': f'Bench {n}'})),
+            Scenario('DELETE', 'api/users/(?P<pk>[^/.]+)/$', 'admin',
+                     delete_user),
+            Scenario('POST', 'api/sign-up/', None,
+                     lambda n: ('/api/sign-up/', sign_up(n))),
+            Scenario('POST', 'api/login/', None,
+                     lambda n: ('/api/login/', {
+                         'username': author.username, 'password': PASSWORD
+                     })),
+            Scenario('POST', 'api/token', None,
+                     lambda n: ('/api/token', {
+                         'username': author.username, 'password': PASSWORD
+                     })),
+            Scenario('POST', 'api/token/refresh', None,
+                     lambda n: ('/api/token/refresh',
+                                {'refresh': f['refresh']})),
+            Scenario('GET', 'api/cache/stats', 'admin',
+                     lambda n: ('/api/cache/stats', None)),
+            Scenario('GET', 'api/search', 'author',
+                     lambda n: ('/api/search', {'q': 'login'})),
+            Scenario('GET', 'api/projects', 'author',
+                     lambda n: ('/api/projects', None)),
+            Scenario('POST', 'api/projects', 'author',
+                     lambda n: ('/api/projects', {
+                         'name': f'bench {n}', 'description': 'bench',
+                         'type': Project.BACK_END
+                     })),
+            Scenario('GET', 'api/projects/<int:pk>/', 'author',
+                     lambda n: (f'{p}/', None)),
+            Scenario('PATCH', 'api/projects/<int:pk>/', 'author',
+                     lambda n: (f'{p}/', {'description': f'bench {n}'})),
+            Scenario('DELETE', 'api/projects/<int:pk>/', 'author',
+                     delete_project),
+            Scenario('PATCH', 'api/projects/<int:pk>/add_collaborator',
+                     'author',
+                     lambda n: (f'{p}/add_collaborator',
+                                {'username': f['collaborator'].username})),
+            Scenario('DELETE', 'api/projects/<int:pk>/delete_collaborator',
+                     'author',
+                     lambda n: (f'{p}/delete_collaborator',
+                                {'username': f['collaborator'].username})),
+            Scenario('GET', 'api/projects/<int:pk>/summary', 'author',
+                     lambda n: (f'{p}/summary', None)),
+            Scenario('GET', 'api/projects/<int:pk>/export', 'author',
+                     lambda n: (f'{p}/export', None)),
+            Scenario('GET', 'api/projects/<int:pk>/issues', 'author',
+                     lambda n: (f'{p}/issues', None)),
+            Scenario('POST', 'api/projects/<int:pk>/issues', 'author',
+                     lambda n: (f'{p}/issues', issue_item)),
+            Scenario('GET', 'api/projects/<int:pk>/issues/<int:pk2>/',
+                     'author',
+                     lambda n: (f'{p}/issues/{issue.pk}/', None)),
+            Scenario('PATCH', 'api/projects/<int:pk>/issues/<int:pk2>/',
+                     'author',
+                     lambda n: (f'{p}/issues/{own_issue.pk}/',
+                                {'description': f'bench {n}'})),
+            Scenario('DELETE', 'api/projects/<int:pk>/issues/<int:pk2>/',
+                     'author', delete_issue),
+            Scenario('PATCH', 'api/projects/<int:pk>/issues/bulk', 'author',
+                     lambda n: (f'{p}/issues/bulk', {
+                         'ids': [item.pk for item in f['own_issues']],
+                         'status': ('TO DO', 'IN PROGRESS')[n % 2],
+                     })),
+            Scenario('PATCH',
+                     'api/projects/<int:pk>/issues/<int:pk2>/change_status',
+                     'author',
+                     lambda n: (f'{p}/issues/{own_issue.pk}/change_status',
+                                {'status': ('TO DO', 'IN PROGRESS')[n % 2]})),
+            Scenario('PATCH',
+                     'api/projects/<int:pk>/issues/<int:pk2>/'
+                     'assign_contributor',
+                     'author',
+                     lambda n: (
+                         f'{p}/issues/{own_issue.pk}/assign_contributor',
+                         {'contributor': f['member'].username}
+                     )),
+            Scenario('GET', 'api/issues/<int:pk>/comments', 'author',
+                     lambda n: (f'/api/issues/{issue.pk}/comments', None)),
+            Scenario('POST', 'api/issues/<int:pk>/comments', 'author',
+                     lambda n: (f'/api/issues/{issue.pk}/comments',
+                                {'description': f'bench {n}'})),
+            Scenario('GET', 'api/issues/<int:pk>/comments/<int:pk2>/',
+                     'author',
+                     lambda n: (f'/api/issues/{own_issue.pk}/comments/'
+                                f'{own_comment.pk}/', None)),
+            Scenario('PATCH', 'api/issues/<int:pk>/comments/<int:pk2>/',
+                     'author',
+                     lambda n: (f'/api/issues/{own_issue.pk}/comments/'
+                                f'{own_comment.pk}/',
+                                {'description': f'bench {n}'})),
+            Scenario('DELETE', 'api/issues/<int:pk>/comments/<int:pk2>/',
+                     'author', delete_comment),
+            Scenario('GET',
+                     'api/users/<int:pk>/projects/<int:pk2>/tickets/',
+                     'author',
+                     lambda n: (f'/api/users/{author.pk}/projects/'
+                                f'{project.pk}/tickets/', None)),
+        ]
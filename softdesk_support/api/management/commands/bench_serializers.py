@@ -0,0 +1,93 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import Project, Issue, Comment
+from api.serializers import IssueSerializer, CommentSerializer, \
+    values_fields
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the serialization of issue and comment lists from model "
+        "instances and from QuerySet.values() rows. The benchmark data is "
+        "created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        if rows <= 0 or repeat <= 0:
+            raise CommandError("--rows and --repeat must be positive")
+        try:
+            with transaction.atomic():
+                self.run(rows, repeat)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, rows, repeat):
+        user = get_user_model().objects.create_user(
+            username='bench-serializers', password='bench-serializers',
+            age=30, can_be_contacted=False, can_data_be_shared=False
+        )
+        project = Project.objects.create(
+            author=user, name='bench', description='bench',
+            type=Project.BACK_END
+        )
+        Issue.objects.bulk_create([
+            Issue(
+                name=f'issue {i}', description='bench', status=Issue.TO_DO,
+                priority=Issue.LOW, tag=Issue.BUG, project=project,
+                author=user, contributor=user if i % 2 else None
+            )
+            for i in range(rows)
+        ])
+        issue = Issue.objects.filter(project=project).first()
+        Comment.objects.bulk_create([
+            Comment(description=f'comment {i}', project=project,
+                    issue=issue, author=user)
+            for i in range(rows)
+        ])
+
+        for label, queryset, serializer_class in (
+                ('issues', Issue.objects.filter(project=project),
+                 IssueSerializer),
+                ('comments', Comment.objects.filter(issue=issue),
+                 CommentSerializer),
+        ):
+            queryset = queryset.order_by('created_time', 'id')
+            model_time, model_data = self.measure(
+                queryset, serializer_class, repeat
+            )
+            values_time, values_data = self.measure(
+                queryset.values(*values_fields(serializer_class)),
+                serializer_class, repeat
+            )
+            if model_data != values_data:
+                raise CommandError(f"{label}: outputs differ")
+            self.stdout.write(
+                f"{label} ({rows} rows, best of {repeat}): "
+                f"models {model_time * 1000:.1f} ms, "
+                f"values {values_time * 1000:.1f} ms, "
+                f"x{model_time / values_time:.2f}"
+            )
+
+    def measure(self, queryset, serializer_class, repeat):
+        # Lecture et sérialisation, comme dans une vue
+        best, data = None, None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = serializer_class(queryset.all(), many=True).data
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, data
@@ -0,0 +1,212 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, close_old_connections, connection
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from authentication.models import User
+from api.models import Project, Issue
+from api.views import IssueAPIView, CommentAPIView
+
+PROFILES = ('development', 'production')
+
+# Variables d'environnement des caches partagés (settings.CACHES)
+CACHE_DIRS = {
+    'RESPONSE_CACHE_DIR': 'responses',
+    'THROTTLE_CACHE_DIR': 'throttle',
+    'MEMBERSHIP_CACHE_DIR': 'membership',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent writers (issue and comment creation, bulk issue "
+        "creation in a transaction) and readers against the configured "
+        "database. With --compare, run it on a new database for each "
+        "DATABASE_PROFILE and compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--readers', type=int, default=2)
+        parser.add_argument('--writes', type=int, default=50,
+                            help="Requests per writer")
+        parser.add_argument(
+            '--compare', action='store_true',
+            help="Run the benchmark for each profile in a subprocess, on a "
+                 "new database in a temporary directory"
+        )
+        parser.add_argument('--json', action='store_true',
+                            help="Print the results as JSON")
+
+    def handle(self, *args, **options):
+        if min(options['writers'], options['writes']) <= 0 or \
+                options['readers'] < 0:
+            raise CommandError("--writers and --writes must be positive")
+        if options['compare']:
+            return self.compare(options)
+        results = self.run(
+            options['writers'], options['readers'], options['writes']
+        )
+        if options['json']:
+            self.stdout.write(json.dumps(results))
+        else:
+            self.stdout.write(self.format(settings.DATABASE_PROFILE, results))
+
+    def compare(self, options):
+        manage = str(settings.BASE_DIR / 'manage.py')
+        arguments = [
+            f'--writers={options["writers"]}',
+            f'--readers={options["readers"]}',
+            f'--writes={options["writes"]}', '--json'
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            for profile in PROFILES:
+                env = {
+                    **os.environ,
+                    'DATABASE_PROFILE': profile,
+                    'DATABASE_PATH': os.path.join(
+                        directory, f'{profile}.sqlite3'
+                    ),
+                    # Caches propres à la base temporaire : ses projets
+                    # n'apparaissent pas dans les caches du serveur
+                    **{
+                        variable: os.path.join(directory, profile, name)
+                        for variable, name in CACHE_DIRS.items()
+                    },
+                }
+                for command in (['migrate', '-v0'],
+                                ['bench_writers', *arguments]):
+                    process = subprocess.run(
+                        [sys.executable, manage, *command], env=env,
+                        capture_output=True, text=True
+                    )
+                    if process.returncode:
+                        raise CommandError(process.stderr)
+                results = json.loads(process.stdout.splitlines()[-1])
+                self.stdout.write(self.format(profile, results))
+
+    def format(self, profile, results):
+        return (
+            f"{profile}: {results['writes_per_second']:.0f} writes/s, "
+            f"{results['reads_per_second']:.0f} reads/s, "
+            f"write p50 {results['write_p50_ms']:.1f} ms, "
+            f"p95 {results['write_p95_ms']:.1f} ms, "
+            f"{results['locked_errors']} 'database is locked' error(s), "
+            f"{results['other_errors']} other error(s)"
+        )
+
+    def run(self, writers, readers, writes):
+        user = User.objects.create_user(
+            username='bench-writers', password='bench-writers', age=30,
+            can_be_contacted=False, can_data_be_shared=False
+        )
+        project = Project.objects.create(
+            author=user, name='bench-writers', description='bench-writers',
+            type=Project.BACK_END
+        )
+        project.contributors.add(user)
+        issue = Issue.objects.create(
+            project=project, author=user, contributor=user, name='issue',
+            description='issue', priority=Issue.LOW, tag=Issue.BUG
+        )
+        try:
+            # Hôte des requêtes du RequestFactory
+            with override_settings(
+                    ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+            ):
+                return self.measure(user, project, issue, writers, readers,
+                                    writes)
+        finally:
+            project.delete()
+            user.delete()
+
+    def measure(self, user, project, issue, writers, readers, writes):
+        factory = APIRequestFactory()
+        issue_view = IssueAPIView.as_view(throttle_classes=[])
+        comment_view = CommentAPIView.as_view(throttle_classes=[])
+        issue_url = f'/api/projects/{project.pk}/issues'
+        comment_url = f'/api/issues/{issue.pk}/comments'
+        item = {'name': 'n', 'description': 'd', 'priority': 'LOW',
+                'tag': 'BUG'}
+        requests = [
+            # Un ticket, un commentaire, cinq tickets dans une transaction
+            (issue_view, issue_url, item, {'pk': project.pk}),
+            (comment_view, comment_url, {'description': 'd'},
+             {'pk': issue.pk}),
+            (issue_view, issue_url, [item] * 5, {'pk': project.pk}),
+        ]
+        lock = threading.Lock()
+        errors = {'locked': 0, 'other': 0}
+        done = threading.Event()
+        reads = []
+
+        def call(view, request, kwargs):
+            force_authenticate(request, user=user)
+            try:
+                response = view(request, **kwargs)
+                return response.status_code
+            except DatabaseError as error:
+                with lock:
+                    key = 'locked' if 'locked' in str(error) else 'other'
+                    errors[key] += 1
+            finally:
+                # Fin de requête : connexion fermée sauf si CONN_MAX_AGE
+                close_old_connections()
+
+        def write(number):
+            latencies = []
+            for n in range(writes):
+                view, url, data, kwargs = requests[(number + n) % 3]
+                request = factory.post(url, data, format='json')
+                start = time.perf_counter()
+                if call(view, request, kwargs) == 201:
+                    latencies.append(time.perf_counter() - start)
+            connection.close()
+            return latencies
+
+        def read():
+            count = 0
+            while not done.is_set():
+                request = factory.get(issue_url)
+                if call(issue_view, request, {'pk': project.pk}) == 200:
+                    count += 1
+            connection.close()
+            with lock:
+                reads.append(count)
+
+        reader_threads = [threading.Thread(target=read)
+                          for _ in range(readers)]
+        for thread in reader_threads:
+            thread.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(writers) as pool:
+            latencies = sorted(
+                latency
+                for result in pool.map(write, range(writers))
+                for latency in result
+            )
+        elapsed = time.perf_counter() - start
+        done.set()
+        for thread in reader_threads:
+            thread.join()
+        return {
+            'writes_per_second': len(latencies) / elapsed,
+            'reads_per_second': sum(reads) / elapsed,
+            'write_p50_ms': statistics.median(latencies) * 1000
+            if latencies else 0,
+            'write_p95_ms': latencies[int(len(latencies) * 0.95) - 1] * 1000
+            if latencies else 0,
+            'locked_errors': errors['locked'],
+            'other_errors': errors['other'],
+        }
@@ -0,0 +1,85 @@
+import time
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from api.importer import READERS, Checkpoint, Importer, \
+    deferred_constraints, deferred_indexes, detect_format, open_source, \
+    source_created_time
+from api.models import Issue, Comment
+
+
+class Command(BaseCommand):
+    help = (
+        "Import projects, issues and comments from NDJSON (the format of "
+        "GET /api/projects/<pk>/export) or CSV, in batches"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'source', help="NDJSON or CSV file (.gz accepted), '-' for stdin"
+        )
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help="Input format (guessed from the file name by default)"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help="Records inserted per transaction"
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help="File recording the committed records, to resume an "
+                 "interrupted import"
+        )
+        parser.add_argument(
+            '--defer-indexes', action='store_true',
+            help="Drop the issue and comment indexes during the import and "
+                 "rebuild them at the end"
+        )
+        parser.add_argument(
+            '--defer-constraints', action='store_true',
+            help="Disable foreign key checks during the import (if the "
+                 "database allows it) and check them at the end"
+        )
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if options['batch_size'] <= 0:
+            raise CommandError("--batch-size must be positive")
+        read = READERS[options['format'] or detect_format(source)]
+        checkpoint = Checkpoint(options['checkpoint'], source)
+        try:
+            skip = checkpoint.load()
+        except ValueError as error:
+            raise CommandError(error)
+        if skip:
+            self.stdout.write(f"Resuming after {skip} records.")
+
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        importer = Importer(options['batch_size'], log=log)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(source_created_time())
+                if options['defer_indexes']:
+                    stack.enter_context(deferred_indexes([Issue, Comment]))
+                if options['defer_constraints']:
+                    stack.enter_context(deferred_constraints())
+                stream = stack.enter_context(open_source(source))
+                counts = importer.run(read(stream), skip, checkpoint.save)
+        except (OSError, ValueError, KeyError, IntegrityError) as error:
+            raise CommandError(
+                f"{error} (committed records: {importer.records})"
+            )
+        checkpoint.clear()
+
+        elapsed = time.perf_counter() - start
+        total = sum(counts.values())
+        for label, count in sorted(counts.items()):
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {total} records in {elapsed:.1f} s "
+            f"({total / elapsed if elapsed else 0:.0f} records/s)."
+        ))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized issue and comment counters of projects"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'project_ids', nargs='*', type=int,
+            help="Projects to rebuild (all projects by default)"
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_counters(options['project_ids'] or None)
+        self.stdout.write(self.style.SUCCESS(
+            f"Counters rebuilt for {count} project(s)."
+        ))
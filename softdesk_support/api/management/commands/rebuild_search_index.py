@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = "Reinstall the full-text search triggers and reindex all issues " \
+           "and comments"
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError("Full-text search requires SQLite (FTS5).")
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Search index rebuilt ({count} rows)."
+        ))
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.seed import DEFAULT_PASSWORD, Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate users, projects, memberships, issues and comments with a "
+        "skewed distribution (a few huge projects, many small ones)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--projects', type=int, default=200)
+        parser.add_argument('--issues', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=60000)
+        parser.add_argument(
+            '--max-contributors', type=int, default=50,
+            help="Contributors of the largest project"
+        )
+        parser.add_argument(
+            '--skew', type=float, default=1.2,
+            help="Exponent of the power law of the project sizes (0 for "
+                 "uniform sizes)"
+        )
+        parser.add_argument('--seed', type=int,
+                            help="Random seed, for reproducible data")
+        parser.add_argument(
+            '--prefix', default='seed',
+            help="Prefix of the usernames (<prefix>-user-<n>)"
+        )
+        parser.add_argument(
+            '--password', default=DEFAULT_PASSWORD,
+            help="Password of all the generated users"
+        )
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Rows inserted per transaction")
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['projects'],
+               options['max_contributors'], options['batch_size']) <= 0:
+            raise CommandError(
+                "--users, --projects, --max-contributors and --batch-size "
+                "must be positive"
+            )
+        if min(options['issues'], options['comments'], options['skew']) < 0:
+            raise CommandError("--issues, --comments and --skew can't be "
+                               "negative")
+        log = self.stdout.write if options['verbosity'] > 1 else None
+        seeder = Seeder(options['seed'], options['batch_size'],
+                        options['prefix'], options['password'], log=log)
+        start = time.perf_counter()
+        try:
+            counts = seeder.run(
+                options['users'], options['projects'], options['issues'],
+                options['comments'], options['max_contributors'],
+                options['skew']
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        elapsed = time.perf_counter() - start
+        for label, count in sorted(counts.items()):
+            self.stdout.write(f"{label}: {count}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {sum(counts.values())} rows in {elapsed:.1f} s."
+        ))
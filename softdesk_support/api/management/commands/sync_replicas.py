@@ -0,0 +1,48 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+
+from softdesk_support.replicas import copy_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary database to the read replicas (DATABASE_REPLICAS "
+        "or the given files) with the SQLite backup API, once or every "
+        "--interval seconds"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help="Replica files (default: the DATABASE_REPLICAS databases)"
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help="Seconds between two copies, 0 to copy once. Keep it "
+                 "below REPLICA_STICKY_SECONDS."
+        )
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or [
+            connections[alias].settings_dict['NAME']
+            for alias in settings.DATABASE_REPLICAS
+        ]
+        if not paths:
+            raise CommandError("No replica configured (DATABASE_REPLICAS).")
+        while True:
+            start = time.perf_counter()
+            for path in paths:
+                try:
+                    copy_database(path)
+                except DatabaseError as error:
+                    raise CommandError(f"Cannot copy to {path}: {error}")
+            elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f"{len(paths)} replica(s) synchronized in {elapsed:.2f}s."
+            )
+            if not options['interval']:
+                break
+            time.sleep(max(options['interval'] - elapsed, 0))
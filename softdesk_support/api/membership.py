@@ -0,0 +1,105 @@
+"""
+Résolution de l'appartenance d'un utilisateur à un projet.
+
+Une seule requête EXISTS indexée répond à "U est-il auteur / contributeur
+de P". Le résultat est mémorisé pendant la requête HTTP puis dans le cache
+MEMBERSHIP_CACHE_ALIAS entre les requêtes. Chaque projet a une version dans
+le cache qui est changée par les signaux (voir api/signals.py) pour
+invalider toutes les entrées du projet d'un coup.
+
+L'invalidation n'atteint que les processus qui partagent ce cache (fichiers
+par défaut, les processus d'une même machine). Ailleurs, ou si la version
+d'un projet est évincée du cache, une entrée périmée reste valable au plus
+MEMBERSHIP_CACHE_TIMEOUT secondes.
+"""
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Exists, OuterRef
+
+from softdesk_support.replicas import primary_reads
+from .models import Project
+
+Membership = namedtuple('Membership', ['is_author', 'is_contributor'])
+
+NO_MEMBERSHIP = Membership(is_author=False, is_contributor=False)
+
+
+def get_cache():
+    return caches[settings.MEMBERSHIP_CACHE_ALIAS]
+
+
+def _version_key(project_id):
+    return f"membership:{project_id}:version"
+
+
+def _entry_key(project_id, user_id, version):
+    return f"membership:{project_id}:{version}:{user_id}"
+
+
+def invalidate_projects(*project_ids):
+    """
+    Invalidate the cached memberships of the given projects
+    """
+    version = time.time_ns()
+    get_cache().set_many(
+        {_version_key(project_id): version for project_id in project_ids},
+        timeout=None
+    )
+
+
+def _query_membership(user_id, project_id):
+    through = Project.contributors.through
+    row = Project.objects.filter(pk=project_id).annotate(
+        is_contributor=Exists(through.objects.filter(
+            project_id=OuterRef('pk'),
+            user_id=user_id
+        ))
+    ).values_list('author_id', 'is_contributor').first()
+    if row is None:
+        return NO_MEMBERSHIP
+    author_id, is_contributor = row
+    return Membership(author_id == user_id, is_contributor)
+
+
+def resolve_membership(user_id, project_id):
+    """
+    Membership of a user in a project, shared between requests
+    """
+    cache = get_cache()
+    version = cache.get(_version_key(project_id), 0)
+    key = _entry_key(project_id, user_id, version)
+    membership = cache.get(key)
+    if membership is None:
+        # Base principale : l'appartenance est gardée dans le cache
+        with primary_reads():
+            membership = _query_membership(user_id, project_id)
+        cache.set(key, membership, timeout=settings.MEMBERSHIP_CACHE_TIMEOUT)
+    return membership
+
+
+def get_membership(request, project_id, user=None):
+    """
+    Membership of `user` (request.user by default) in a project,
+    memoized on the request
+    """
+    user = user if user is not None else request.user
+    if not user or not user.is_authenticated:
+        return NO_MEMBERSHIP
+    memo = getattr(request, '_memberships', None)
+    if memo is None:
+        memo = request._memberships = {}
+    key = (user.pk, project_id)
+    if key not in memo:
+        memo[key] = resolve_membership(user.pk, project_id)
+    return memo[key]
+
+
+def is_contributor(request, project_id, user=None):
+    return get_membership(request, project_id, user).is_contributor
+
+
+def is_author(request, project_id, user=None):
+    return get_membership(request, project_id, user).is_author
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.9 on 2026-10-18 13:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='issue',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.issue'),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='contributor',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attributed_issues', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='issue',
+            name='project',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.project'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['issue', 'created_time', 'id'], name='comment_issue_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'created_time', 'id'], name='issue_project_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'status', 'created_time'], name='issue_project_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['contributor', 'project', 'created_time', 'id'], name='issue_contributor_project_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 4.2.9 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_issue_comment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='comments_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issues_bug',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issues_feature',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issues_finished',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issues_high',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issues_in_progress',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issues_low',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issues_medium',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issues_task',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='issues_to_do',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='last_activity_time',
+            field=models.DateTimeField(null=True),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.9 on 2026-10-18 14:02
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_project_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='updated_time',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='updated_time',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='updated_time',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['issue', 'updated_time'], name='comment_issue_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'updated_time'], name='issue_project_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+
+from api import search
+
+
+def create_index(apps, schema_editor):
+    # FTS5 n'existe que sous SQLite : la recherche est désactivée ailleurs
+    if search.is_available(schema_editor.connection):
+        with schema_editor.connection.cursor() as cursor:
+            search.create_index(cursor)
+
+
+def drop_index(apps, schema_editor):
+    if search.is_available(schema_editor.connection):
+        with schema_editor.connection.cursor() as cursor:
+            search.drop_index(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_updated_time'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
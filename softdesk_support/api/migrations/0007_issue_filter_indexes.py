@@ -0,0 +1,25 @@
+# Generated by Django 4.2.9 on 2026-10-18 13:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'priority', 'created_time', 'id'], name='issue_project_priority_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'tag', 'created_time', 'id'], name='issue_project_tag_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='issue',
+            index=models.Index(fields=['project', 'author', 'created_time', 'id'], name='issue_project_author_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def rebuild_counters(apps, schema_editor):
+    # Compteurs ajoutés à 0 par 0004_project_counters
+    from api.counters import rebuild_counters
+    rebuild_counters(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_issue_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_counters, migrations.RunPython.noop),
+    ]
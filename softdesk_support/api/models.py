@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 
 from authentication.models import User
@@ -18,6 +18,7 @@ class Project(models.Model):
         (ANDROID, "Android"),
     )
     created_time = models.DateTimeField(auto_now_add=True)
+    updated_time = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(
         to=settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -28,6 +29,40 @@ class Project(models.Model):
     description = models.TextField(max_length=2048)
     type = models.CharField(max_length=30, choices=TYPE_CHOICES)
 
+    # Compteurs dénormalisés mis à jour par les signaux de Issue et Comment
+    # (api/counters.py), recalculés par la commande rebuild_project_counters
+    issues_to_do = models.IntegerField(default=0)
+    issues_in_progress = models.IntegerField(default=0)
+    issues_finished = models.IntegerField(default=0)
+    issues_low = models.IntegerField(default=0)
+    issues_medium = models.IntegerField(default=0)
+    issues_high = models.IntegerField(default=0)
+    issues_bug = models.IntegerField(default=0)
+    issues_feature = models.IntegerField(default=0)
+    issues_task = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
+    last_activity_time = models.DateTimeField(null=True)
+
+    COUNTER_FIELDS = (
+        'issues_to_do', 'issues_in_progress', 'issues_finished',
+        'issues_low', 'issues_medium', 'issues_high', 'issues_bug',
+        'issues_feature', 'issues_task', 'comments_count',
+        'last_activity_time',
+    )
+
+    def save(self, *args, **kwargs):
+        # Une modification n'écrit pas les compteurs chargés avec le
+        # projet : ils écraseraient les UPDATE avec F() faits depuis par
+        # les tickets et les commentaires
+        if not self._state.adding and not kwargs.get('force_insert') and \
+                kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and
+                field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
 
 class Issue(models.Model):
 
@@ -61,6 +96,7 @@ class Issue(models.Model):
     )
 
     created_time = models.DateTimeField(auto_now_add=True)
+    updated_time = models.DateTimeField(auto_now=True)
     # Créateur
     author = models.ForeignKey(
         to=settings.AUTH_USER_MODEL,
@@ -69,14 +105,21 @@ class Issue(models.Model):
         null=True
     )
     # Contributeur à qui est assigné l'issue
+    # Les index simples des clés étrangères sont remplacés par les index
+    # composites de Meta.indexes qui commencent par la même colonne
     contributor = models.ForeignKey(
         to=settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="attributed_issues",
         null=True,
+        db_index=False,
         # blank=True
     )
-    project = models.ForeignKey(Project, on_delete=models.CASCADE)
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        db_index=False
+    )
     name = models.CharField(max_length=128)
     description = models.TextField(max_length=2048)
     status = models.CharField(
@@ -87,14 +130,95 @@ class Issue(models.Model):
     priority = models.CharField(max_length=30, choices=PRIORITY_CHOICES)
     tag = models.CharField(max_length=30, choices=TAG_CHOICES)
 
+    # Champs comptés dans les compteurs du projet (api/counters.py)
+    COUNTED_FIELDS = {'project_id', 'status', 'priority', 'tag'}
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valeurs chargées, pour calculer les différences des compteurs
+        # lors de la prochaine sauvegarde
+        if cls.COUNTED_FIELDS.issubset(field_names):
+            instance._counted_values = instance.get_counted_values()
+        return instance
+
+    def get_counted_values(self):
+        return self.project_id, self.status, self.priority, self.tag
+
+    def save(self, *args, **kwargs):
+        # Le ticket et les compteurs du projet dans la même transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # Tickets d'un projet triés par date de création
+            models.Index(
+                fields=['project', 'created_time', 'id'],
+                name='issue_project_created_idx'
+            ),
+            # Tickets d'un projet ayant un statut donné
+            models.Index(
+                fields=['project', 'status', 'created_time'],
+                name='issue_project_status_idx'
+            ),
+            # Dernière modification des tickets d'un projet (ETag)
+            models.Index(
+                fields=['project', 'updated_time'],
+                name='issue_project_updated_idx'
+            ),
+            # Tickets d'un contributeur dans un projet (UserTicketsAPIView
+            # et filtre contributor de la liste)
+            models.Index(
+                fields=['contributor', 'project', 'created_time', 'id'],
+                name='issue_contributor_project_idx'
+            ),
+            # Filtres priority, tag et author de la liste des tickets
+            models.Index(
+                fields=['project', 'priority', 'created_time', 'id'],
+                name='issue_project_priority_idx'
+            ),
+            models.Index(
+                fields=['project', 'tag', 'created_time', 'id'],
+                name='issue_project_tag_idx'
+            ),
+            models.Index(
+                fields=['project', 'author', 'created_time', 'id'],
+                name='issue_project_author_idx'
+            ),
+        ]
+
 
 class Comment(models.Model):
 
     created_time = models.DateTimeField(auto_now_add=True)
+    updated_time = models.DateTimeField(auto_now=True)
     author = models.ForeignKey(
         to=settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE
     )
     description = models.TextField(max_length=2048)
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
-    issue = models.ForeignKey(Issue, on_delete=models.CASCADE)
+    issue = models.ForeignKey(
+        Issue,
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    class Meta:
+        indexes = [
+            # Commentaires d'un ticket triés par date de création
+            models.Index(
+                fields=['issue', 'created_time', 'id'],
+                name='comment_issue_created_idx'
+            ),
+            # Dernière modification des commentaires d'un ticket (ETag)
+            models.Index(
+                fields=['issue', 'updated_time'],
+                name='comment_issue_updated_idx'
+            ),
+        ]
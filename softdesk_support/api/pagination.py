@@ -0,0 +1,210 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import FloatField, IntegerField, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Pagination par curseur opaque (keyset).
+
+    Le curseur contient les valeurs des champs de tri de la dernière (ou
+    première) ligne de la page. La page suivante est lue avec un WHERE sur
+    ces valeurs au lieu d'un OFFSET : le coût d'une page ne dépend pas de
+    sa profondeur tant qu'un index couvre le tri.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    # Le dernier champ doit être unique pour que l'ordre soit total
+    ordering = ('created_time', 'id')
+    # Champs des valeurs du curseur, ceux du modèle par défaut
+    position_fields = None
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=None):
+        if ordering is not None:
+            self.ordering = tuple(ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_rows(
+            list(self.get_page_queryset(queryset, request))
+        )
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Queryset of the requested page, with one extra row to know if there
+        is a following page. Call paginate_rows() with its rows.
+        """
+        self.start_page(request, queryset.model)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = tuple(_invert(field) for field in ordering)
+        if self.position is not None:
+            queryset = queryset.filter(
+                _after_position(ordering, self.position)
+            )
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def start_page(self, request, model=None):
+        # Taille de page et position demandées, pour les lectures qui ne
+        # passent pas par un QuerySet (recherche plein texte)
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request, model)
+
+    def paginate_rows(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous = self.position is not None
+            self.has_next = has_more
+        self.page = rows
+        return rows
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_position_fields(self, model):
+        if self.position_fields is not None:
+            return self.position_fields
+        return [
+            model._meta.get_field(field.lstrip('-'))
+            for field in self.ordering
+        ]
+
+    def decode_cursor(self, request, model=None):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            position, reverse = cursor['p'], bool(cursor['r'])
+            if cursor['o'] != list(self.ordering) or \
+                    not isinstance(position, list) or \
+                    len(position) != len(self.ordering):
+                raise ValueError
+            # Valeurs converties comme celles d'un formulaire : un curseur
+            # fabriqué ne doit pas atteindre les filtres de la requête SQL
+            position = [
+                self.to_python(field, value) for field, value in
+                zip(self.get_position_fields(model), position)
+            ]
+        except (TypeError, ValueError, KeyError, UnicodeError,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def to_python(self, field, value):
+        if isinstance(value, (dict, list)):
+            raise ValueError
+        value = field.to_python(value)
+        if value is None and not field.null:
+            raise ValueError
+        return value
+
+    def encode_cursor(self, position, reverse):
+        cursor = {
+            'p': [_json_value(value) for value in position],
+            'r': int(reverse),
+            'o': self.ordering,
+        }
+        encoded = urlsafe_b64encode(json.dumps(cursor).encode('ascii'))
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded.decode('ascii')
+        )
+
+    def get_position(self, row):
+        # Les lignes sont des instances de modèles ou des dictionnaires
+        # (QuerySet.values())
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            position.append(
+                row[name] if isinstance(row, dict) else getattr(row, name)
+            )
+        return position
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            return self.encode_cursor(self.get_position(self.page[-1]), False)
+        return self.encode_cursor(self.position, False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            return self.encode_cursor(self.get_position(self.page[0]), True)
+        return self.encode_cursor(self.position, True)
+
+    def get_paginated_data(self, data):
+        return OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ])
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+
+class SearchPagination(KeysetPagination):
+    # Score bm25 puis rowid de la table de recherche (api/search.py)
+    ordering = ('score', 'rowid')
+    position_fields = (FloatField(), IntegerField())
+
+
+def _json_value(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _after_position(ordering, position):
+    # Comparaison lexicographique :
+    # (a > x) OR (a = x AND b > y) OR (a = x AND b = y AND c > z) ...
+    # précédée de a >= x pour que la base parcoure l'index par intervalle
+    first = ordering[0]
+    lookup = 'lte' if first.startswith('-') else 'gte'
+    bound = Q(**{f'{first.lstrip("-")}__{lookup}': position[0]})
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        clause = Q(**{f'{name}__{lookup}': position[i]})
+        for previous, value in zip(ordering[:i], position[:i]):
+            clause &= Q(**{previous.lstrip('-'): value})
+        condition |= clause
+    return bound & condition
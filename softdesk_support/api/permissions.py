@@ -1,4 +1,5 @@
 from rest_framework.permissions import BasePermission
+from .membership import is_contributor
 from .models import Issue, Comment
 
 
@@ -8,7 +9,10 @@ class IsAuthor(BasePermission):
     # Pour les autorisations personnalisées, vérifier par soi-même avec
     # self.check_object_permissions(request, obj) une fois l'instance récupérée
     def has_object_permission(self, request, view, obj):
-        return obj.author == request.user
+        return (
+            request.user.is_authenticated and
+            obj.author_id == request.user.pk
+        )
 
 
 class IsContributor(BasePermission):
@@ -21,8 +25,6 @@ class IsContributor(BasePermission):
         # Est-ce qu'il est collaborateur du projet ?
         # Est-ce que l'issue appartient à un projet où il est collaborateur ?
         if request.method == 'GET':
-            if isinstance(obj, Issue):
-                return request.user in obj.project.contributors.all()
-            if isinstance(obj, Comment):
-                return request.user in obj.issue.project.contributors.all()
-        return request.user in obj.contributors.all()
+            if isinstance(obj, (Issue, Comment)):
+                return is_contributor(request, obj.project_id)
+        return is_contributor(request, obj.pk)
@@ -0,0 +1,102 @@
+"""
+Cache des réponses des listes de tickets (par projet) et de commentaires
+(par ticket).
+
+Une entrée contient la page sérialisée et l'état de la liste (date de
+dernière modification et nombre de lignes) utilisé pour l'ETag. Elle est
+identifiée par la liste, une version et l'URL complète (curseur, taille
+de page, filtres). Les signaux de Issue et Comment changent la version
+de la liste modifiée, ce qui rend toutes ses entrées inaccessibles ;
+elles disparaissent ensuite du cache à leur expiration.
+
+Le cache est partagé entre les processus (fichiers par défaut) : une
+invalidation atteint tous ceux d'une même machine. Les processus qui ne
+le partagent pas (autres machines) servent une liste périmée au plus
+RESPONSE_CACHE_TIMEOUT secondes.
+
+Statistiques : lectures trouvées (hits) ou non (misses) et listes
+invalidées (invalidations, les entrées expirées ou supprimées par le
+cache ne sont pas comptées).
+
+L'autorisation n'est pas mise en cache : elle est vérifiée à chaque
+requête avant la lecture du cache (api/membership.py, invalidé par les
+modifications de Project.contributors).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+ISSUES = 'issues'
+COMMENTS = 'comments'
+
+STATS = ('hits', 'misses', 'invalidations')
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def _version_key(scope, object_id):
+    return f"responses:{scope}:{object_id}:version"
+
+
+def _stat_key(name):
+    return f"responses:stats:{name}"
+
+
+def _count(name, value=1):
+    cache = get_cache()
+    try:
+        cache.incr(_stat_key(name), value)
+    except ValueError:
+        cache.set(_stat_key(name), value, timeout=None)
+
+
+def get_key(request, scope, object_id):
+    version = get_cache().get(_version_key(scope, object_id), 0)
+    url = hashlib.md5(
+        request.build_absolute_uri().encode(), usedforsecurity=False
+    ).hexdigest()
+    return f"responses:{scope}:{object_id}:{version}:{url}"
+
+
+def get_entry(key):
+    entry = get_cache().get(key)
+    _count('hits' if entry is not None else 'misses')
+    return entry
+
+
+def set_entry(key, entry):
+    get_cache().set(key, entry, timeout=settings.RESPONSE_CACHE_TIMEOUT)
+
+
+def _bump(scope, object_ids):
+    version = time.time_ns()
+    get_cache().set_many(
+        {_version_key(scope, object_id): version for object_id in object_ids},
+        timeout=None
+    )
+
+
+def invalidate(scope, *object_ids):
+    """
+    Invalidate the cached responses of the given lists
+    """
+    _bump(scope, object_ids)
+    _count('invalidations', len(object_ids))
+    # Une requête qui lit la base avant la validation de la transaction
+    # peut enregistrer l'ancienne liste sous la nouvelle version :
+    # la version change à nouveau après la validation
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(scope, object_ids))
+
+
+def get_stats():
+    values = get_cache().get_many([_stat_key(name) for name in STATS])
+    stats = {name: values.get(_stat_key(name), 0) for name in STATS}
+    lookups = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / lookups if lookups else None
+    return stats
@@ -0,0 +1,198 @@
+"""
+Recherche plein texte dans les tickets et les commentaires (SQLite FTS5).
+
+La table virtuelle api_search contient le titre et le texte de chaque
+ticket (rowid = id * 2) et de chaque commentaire (rowid = id * 2 + 1),
+avec leur projet. Elle est tenue à jour par des triggers sur api_issue et
+api_comment, ce qui couvre aussi bulk_create() et QuerySet.update() qui
+n'envoient pas de signaux.
+
+SQLite peut recréer une table lors d'une migration (ALTER non supporté) et
+supprimer ses triggers : la commande rebuild_search_index les réinstalle
+et réindexe toutes les lignes.
+"""
+from django.db import connection
+
+TABLE = 'api_search'
+
+# Marqueurs des termes trouvés dans le titre et l'extrait.
+# Le texte n'est pas échappé : le client doit l'échapper avant affichage.
+HIGHLIGHT = ('<mark>', '</mark>')
+
+# Poids du titre et du texte dans le score bm25 (plus petit = meilleur)
+SCORE = f"bm25({TABLE}, 10.0, 1.0)"
+
+MAX_TERMS = 16
+
+KINDS = ('issue', 'comment')
+
+_ISSUE_ROW = (
+    "new.id * 2, new.name, new.description, 'issue', new.project_id, new.id"
+)
+_COMMENT_ROW = (
+    "new.id * 2 + 1, '', new.description, 'comment', new.project_id, "
+    "new.issue_id"
+)
+_COLUMNS = "rowid, title, body, kind, project_id, issue_id"
+
+CREATE_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        title, body,
+        kind UNINDEXED, project_id UNINDEXED, issue_id UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_issue_insert
+    AFTER INSERT ON api_issue BEGIN
+        INSERT INTO {TABLE} ({_COLUMNS}) VALUES ({_ISSUE_ROW});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_issue_update
+    AFTER UPDATE OF id, name, description, project_id ON api_issue BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id * 2;
+        INSERT INTO {TABLE} ({_COLUMNS}) VALUES ({_ISSUE_ROW});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_issue_delete
+    AFTER DELETE ON api_issue BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id * 2;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_comment_insert
+    AFTER INSERT ON api_comment BEGIN
+        INSERT INTO {TABLE} ({_COLUMNS}) VALUES ({_COMMENT_ROW});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_comment_update
+    AFTER UPDATE OF id, description, project_id, issue_id ON api_comment
+    BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id * 2 + 1;
+        INSERT INTO {TABLE} ({_COLUMNS}) VALUES ({_COMMENT_ROW});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLE}_comment_delete
+    AFTER DELETE ON api_comment BEGIN
+        DELETE FROM {TABLE} WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {TABLE}_issue_insert",
+    f"DROP TRIGGER IF EXISTS {TABLE}_issue_update",
+    f"DROP TRIGGER IF EXISTS {TABLE}_issue_delete",
+    f"DROP TRIGGER IF EXISTS {TABLE}_comment_insert",
+    f"DROP TRIGGER IF EXISTS {TABLE}_comment_update",
+    f"DROP TRIGGER IF EXISTS {TABLE}_comment_delete",
+    f"DROP TABLE IF EXISTS {TABLE}",
+]
+
+FILL_SQL = [
+    f"DELETE FROM {TABLE}",
+    f"""
+    INSERT INTO {TABLE} ({_COLUMNS})
+    SELECT id * 2, name, description, 'issue', project_id, id
+    FROM api_issue
+    """,
+    f"""
+    INSERT INTO {TABLE} ({_COLUMNS})
+    SELECT id * 2 + 1, '', description, 'comment', project_id, issue_id
+    FROM api_comment
+    """,
+    # Fusion des segments de l'index après un chargement complet
+    f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')",
+]
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def create_index(cursor):
+    for statement in CREATE_SQL + FILL_SQL:
+        cursor.execute(statement)
+
+
+def drop_index(cursor):
+    for statement in DROP_SQL:
+        cursor.execute(statement)
+
+
+def rebuild_index():
+    """
+    Reinstall the triggers and reindex every issue and comment.
+    Returns the number of indexed rows.
+    """
+    with connection.cursor() as cursor:
+        create_index(cursor)
+        cursor.execute(f"SELECT count(*) FROM {TABLE}")
+        return cursor.fetchone()[0]
+
+
+def match_expression(query):
+    """
+    FTS5 query matching every word of `query`. Words are quoted so the
+    FTS5 syntax (AND, NEAR, column filters...) can't be injected; a
+    trailing * keeps a prefix search.
+    """
+    terms = []
+    for word in query.split()[:MAX_TERMS]:
+        prefix = word.endswith('*')
+        word = word.rstrip('*').replace('"', '""')
+        if word:
+            terms.append(f'"{word}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+def search(user_id, expression, project_id=None, kind=None, position=None,
+           reverse=False, limit=10):
+    """
+    Matching rows of the projects the user belongs to, ordered by
+    (score, rowid), after `position` (score, rowid) if given.
+    Returns dicts with rowid, kind, project_id, issue_id, title, snippet
+    and score.
+    """
+    where = [
+        f"{TABLE} MATCH %s",
+        """project_id IN (
+            SELECT project_id FROM api_project_contributors
+            WHERE user_id = %s
+            UNION SELECT id FROM api_project WHERE author_id = %s
+        )""",
+    ]
+    params = [expression, user_id, user_id]
+    if project_id is not None:
+        where.append("project_id = %s")
+        params.append(project_id)
+    if kind is not None:
+        where.append("kind = %s")
+        params.append(kind)
+    direction = 'DESC' if reverse else 'ASC'
+    if position is not None:
+        after = '<' if reverse else '>'
+        where.append(
+            f"({SCORE} {after} %s OR ({SCORE} = %s AND rowid {after} %s))"
+        )
+        params += [position[0], position[0], position[1]]
+    sql = f"""
+        SELECT rowid, kind, project_id, issue_id,
+               highlight({TABLE}, 0, %s, %s),
+               snippet({TABLE}, 1, %s, %s, '…', 16),
+               {SCORE}
+        FROM {TABLE}
+        WHERE {' AND '.join(where)}
+        ORDER BY {SCORE} {direction}, rowid {direction}
+        LIMIT %s
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*HIGHLIGHT, *HIGHLIGHT, *params, limit])
+        columns = ('rowid', 'kind', 'project_id', 'issue_id', 'title',
+                   'snippet', 'score')
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -0,0 +1,233 @@
+"""
+Données synthétiques pour reproduire en local une base de production
+(commande seed).
+
+Les tailles suivent une loi de puissance (poids 1 / rang ** skew) : quelques
+projets ont la plupart des contributeurs, des tickets et des commentaires,
+la plupart des projets en ont peu. Dans un projet, les commentaires se
+concentrent de la même façon sur quelques tickets.
+
+Les lignes sont insérées par lots avec bulk_create, un lot par transaction,
+avec des dates de création réparties sur les deux dernières années. Le mot
+de passe est haché une seule fois et partagé par tous les utilisateurs.
+bulk_create n'envoie pas de signaux : les compteurs des projets sont
+recalculés à la fin (l'index de recherche est tenu à jour par ses
+triggers).
+"""
+import itertools
+import random
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from authentication.models import User
+
+from .counters import rebuild_counters
+from .importer import source_created_time
+from .membership import invalidate_projects
+from .models import Project, Issue, Comment
+
+DEFAULT_PASSWORD = 'seed-password'
+HISTORY = timedelta(days=730)
+
+# Mots des noms et descriptions (termes présents pour la recherche)
+WORDS = (
+    'login', 'page', 'error', 'crash', 'timeout', 'button', 'layout', 'api',
+    'token', 'cache', 'database', 'export', 'import', 'search', 'filter',
+    'mobile', 'android', 'ios', 'backend', 'frontend', 'payment', 'email',
+    'notification', 'profile', 'upload', 'image', 'report', 'dashboard',
+    'permission', 'migration', 'performance', 'memory', 'test', 'release',
+    'translation', 'accessibility', 'session', 'password', 'invoice', 'chart',
+)
+
+# Répartition des valeurs des tickets
+STATUS_WEIGHTS = {Issue.TO_DO: 40, Issue.IN_PROGRESS: 25, Issue.FINISHED: 35}
+PRIORITY_WEIGHTS = {Issue.LOW: 50, Issue.MEDIUM: 35, Issue.HIGH: 15}
+TAG_WEIGHTS = {Issue.BUG: 45, Issue.FEATURE: 35, Issue.TASK: 20}
+
+
+def cumulative_weights(count, skew):
+    # Poids cumulés 1 / rang ** skew, pour random.choices()
+    return list(itertools.accumulate(
+        1 / rank ** skew for rank in range(1, count + 1)
+    ))
+
+
+class Seeder:
+
+    def __init__(self, seed=None, batch_size=5000, prefix='seed',
+                 password=DEFAULT_PASSWORD, log=None):
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.prefix = prefix
+        self.password = password
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.counts = Counter()
+
+    def run(self, users, projects, issues, comments, max_contributors=50,
+            skew=1.2):
+        """
+        Create the rows and return their number per model
+        """
+        if User.objects.filter(
+                username__startswith=f'{self.prefix}-user-'
+        ).exists():
+            raise ValueError(
+                f"Users named {self.prefix}-user-* already exist, choose "
+                f"another prefix."
+            )
+        with source_created_time([User, Project, Issue, Comment]):
+            user_ids = self.create_users(users)
+            project_rows = self.create_projects(
+                projects, user_ids, max_contributors, skew
+            )
+            project_issues = self.create_issues(issues, project_rows, skew)
+            self.create_comments(comments, project_rows, project_issues,
+                                 skew)
+        project_ids = [project.pk for project, _ in project_rows]
+        rebuild_counters(project_ids)
+        invalidate_projects(*project_ids)
+        return self.counts
+
+    def random_time(self, start=None):
+        # Date uniforme entre start (par défaut le début de l'historique)
+        # et maintenant
+        start = start or self.now - HISTORY
+        return start + (self.now - start) * self.random.random()
+
+    def text(self, words):
+        return ' '.join(self.random.choices(WORDS, k=words))
+
+    def choice(self, weights):
+        return self.random.choices(
+            list(weights), weights=list(weights.values())
+        )[0]
+
+    def insert(self, model, rows):
+        # Un lot par transaction, clés primaires renvoyées par bulk_create
+        created = []
+        start = time.perf_counter()
+        for index in range(0, len(rows), self.batch_size):
+            with transaction.atomic():
+                created += model.objects.bulk_create(
+                    rows[index:index + self.batch_size]
+                )
+        self.counts[model._meta.label_lower] += len(created)
+        self.log(
+            f"{model._meta.label_lower}: {len(created)} rows in "
+            f"{time.perf_counter() - start:.1f} s"
+        )
+        return created
+
+    def create_users(self, count):
+        password = make_password(self.password)
+        users = self.insert(User, [
+            User(
+                username=f'{self.prefix}-user-{number}',
+                email=f'{self.prefix}-user-{number}@softdesk.example',
+                password=password,
+                first_name=self.random.choice(WORDS).capitalize(),
+                last_name=self.random.choice(WORDS).capitalize(),
+                age=self.random.randint(18, 70),
+                can_be_contacted=self.random.random() < 0.5,
+                can_data_be_shared=self.random.random() < 0.5,
+                created_time=self.random_time(),
+            )
+            for number in range(1, count + 1)
+        ])
+        return [user.pk for user in users]
+
+    def create_projects(self, count, user_ids, max_contributors, skew):
+        # Contributeurs : de 1 (l'auteur) à max_contributors pour le plus
+        # gros projet, selon le rang du projet
+        cumulative = cumulative_weights(count, skew)
+        top = cumulative[0]
+        ranks = list(range(count))
+        self.random.shuffle(ranks)
+        projects, members = [], []
+        for rank in ranks:
+            weight = cumulative[rank] - (cumulative[rank - 1] if rank else 0)
+            size = 1 + round((max_contributors - 1) * weight / top)
+            member_ids = self.random.sample(
+                user_ids, min(size, len(user_ids))
+            )
+            members.append(member_ids)
+            projects.append(Project(
+                author_id=member_ids[0],
+                name=self.text(3).capitalize(),
+                description=self.text(20),
+                type=self.random.choice(Project.TYPE_CHOICES)[0],
+                created_time=self.random_time(),
+            ))
+        projects = self.insert(Project, projects)
+        through = Project.contributors.through
+        self.insert(through, [
+            through(project_id=project.pk, user_id=user_id)
+            for project, member_ids in zip(projects, members)
+            for user_id in member_ids
+        ])
+        # Projets dans l'ordre de leurs rangs (du plus gros au plus petit)
+        return [
+            (project, member_ids)
+            for _, project, member_ids in sorted(
+                zip(ranks, projects, members), key=lambda row: row[0]
+            )
+        ]
+
+    def create_issues(self, count, project_rows, skew):
+        cumulative = cumulative_weights(len(project_rows), skew)
+        sizes = Counter(self.random.choices(
+            range(len(project_rows)), cum_weights=cumulative, k=count
+        ))
+        issues = []
+        for index, (project, member_ids) in enumerate(project_rows):
+            for _ in range(sizes[index]):
+                issues.append(Issue(
+                    project_id=project.pk,
+                    author_id=self.random.choice(member_ids),
+                    contributor_id=self.random.choice(member_ids),
+                    name=self.text(4).capitalize(),
+                    description=self.text(30),
+                    status=self.choice(STATUS_WEIGHTS),
+                    priority=self.choice(PRIORITY_WEIGHTS),
+                    tag=self.choice(TAG_WEIGHTS),
+                    created_time=self.random_time(project.created_time),
+                ))
+        project_issues = {}
+        for issue in self.insert(Issue, issues):
+            project_issues.setdefault(issue.project_id, []).append(issue)
+        return project_issues
+
+    def create_comments(self, count, project_rows, project_issues, skew):
+        # Commentaires proportionnels au nombre de tickets des projets,
+        # concentrés sur quelques tickets dans chaque projet
+        rows = [
+            (project, member_ids, project_issues[project.pk])
+            for project, member_ids in project_rows
+            if project.pk in project_issues
+        ]
+        if not rows or not count:
+            return
+        sizes = Counter(self.random.choices(
+            range(len(rows)), weights=[len(row[2]) for row in rows], k=count
+        ))
+        comments = []
+        for index, (project, member_ids, issues) in enumerate(rows):
+            targets = self.random.choices(
+                issues, cum_weights=cumulative_weights(len(issues), skew),
+                k=sizes[index]
+            )
+            for issue in targets:
+                comments.append(Comment(
+                    project_id=project.pk,
+                    issue_id=issue.pk,
+                    author_id=self.random.choice(member_ids),
+                    description=self.text(15),
+                    created_time=self.random_time(issue.created_time),
+                ))
+        self.insert(Comment, comments)
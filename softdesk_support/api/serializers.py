@@ -1,5 +1,98 @@
-from rest_framework.serializers import ModelSerializer
+from rest_framework import fields, relations
+from rest_framework.serializers import ModelSerializer, ListSerializer, \
+    Serializer, CharField, ChoiceField, DateTimeField, IntegerField
+from rest_framework.settings import api_settings
+
 from api.models import Project, Issue, Comment
+from api.counters import SUMMARY_FIELDS
+
+
+# Champs dont la représentation est la valeur lue en base
+IDENTITY_FIELDS = (
+    fields.CharField,
+    fields.ChoiceField,
+    fields.IntegerField,
+    relations.PrimaryKeyRelatedField,
+)
+
+
+def datetime_converter(field):
+    # Équivalent de DateTimeField.to_representation pour le format ISO 8601
+    # et une date avec fuseau horaire lue en base
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') \
+        else field.default_timezone()
+    if (
+            output_format is None or field_timezone is None or
+            output_format.lower() != fields.ISO_8601
+    ):
+        return field.to_representation
+
+    def convert(value):
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            return value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def values_fields(serializer_class):
+    """
+    Names to pass to QuerySet.values() to serialize rows with
+    serializer_class (the id is added for pagination)
+    """
+    names = [
+        field.source
+        for field in serializer_class().fields.values()
+        if not field.write_only
+    ]
+    return names if 'id' in names else [*names, 'id']
+
+
+class ValuesListSerializer(ListSerializer):
+    """
+    Read-only list serialization of rows from QuerySet.values().
+
+    Each field is rendered by a converter compiled once per serializer
+    class instead of going through the DRF field machinery for every row.
+    Model instances are serialized as usual.
+    """
+
+    def to_representation(self, data):
+        rows = data.all() if hasattr(data, 'all') else data
+        if not isinstance(rows, list):
+            rows = list(rows)
+        if not rows or not isinstance(rows[0], dict):
+            return super().to_representation(rows)
+        converters = self.get_converters()
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, convert in converters:
+                value = row[source]
+                if convert is not None and value is not None:
+                    value = convert(value)
+                item[name] = value
+            data.append(item)
+        return data
+
+    def get_converters(self):
+        child_class = type(self.child)
+        converters = child_class.__dict__.get('_values_converters')
+        if converters is None:
+            converters = []
+            for name, field in self.child.fields.items():
+                if field.write_only:
+                    continue
+                if isinstance(field, fields.DateTimeField):
+                    convert = datetime_converter(field)
+                elif isinstance(field, IDENTITY_FIELDS):
+                    convert = None
+                else:
+                    convert = field.to_representation
+                converters.append((name, field.source, convert))
+            child_class._values_converters = converters
+        return converters
 
 
 class ProjectSerializer(ModelSerializer):
@@ -16,10 +109,19 @@ class ProjectSerializer(ModelSerializer):
         ]
 
 
+class ProjectSummarySerializer(ModelSerializer):
+
+    class Meta:
+        model = Project
+        fields = ['id', *SUMMARY_FIELDS]
+        read_only_fields = fields
+
+
 class IssueSerializer(ModelSerializer):
 
     class Meta:
         model = Issue
+        list_serializer_class = ValuesListSerializer
         fields = [
             'created_time',
             'author',
@@ -33,10 +135,70 @@ class IssueSerializer(ModelSerializer):
         ]
 
 
+class IssueFilterSerializer(Serializer):
+    # Paramètres de filtre et de tri de la liste des tickets.
+    # Chaque filtre est servi par un index commençant par le projet
+    # (Issue.Meta.indexes).
+    LOOKUPS = {
+        'status': 'status',
+        'priority': 'priority',
+        'tag': 'tag',
+        'contributor': 'contributor_id',
+        'author': 'author_id',
+        'created_after': 'created_time__gte',
+        'created_before': 'created_time__lt',
+    }
+    # Tris autorisés -> ordre de la pagination
+    ORDERINGS = {
+        'created_time': ('created_time', 'id'),
+        '-created_time': ('-created_time', '-id'),
+    }
+
+    status = ChoiceField(choices=Issue.STATUS_CHOICES, required=False)
+    priority = ChoiceField(choices=Issue.PRIORITY_CHOICES, required=False)
+    tag = ChoiceField(choices=Issue.TAG_CHOICES, required=False)
+    contributor = IntegerField(min_value=1, required=False)
+    author = IntegerField(min_value=1, required=False)
+    created_after = DateTimeField(required=False)
+    created_before = DateTimeField(required=False)
+    ordering = ChoiceField(
+        choices=list(ORDERINGS), default='created_time', required=False
+    )
+
+    def get_filters(self):
+        return {
+            self.LOOKUPS[name]: value
+            for name, value in self.validated_data.items()
+            if name in self.LOOKUPS
+        }
+
+    def get_ordering(self):
+        return self.ORDERINGS[self.validated_data['ordering']]
+
+
+class IssueBulkSerializer(ModelSerializer):
+    # Éléments d'une création en masse : le projet et l'auteur sont fixés
+    # par la vue et le contributeur est résolu en une seule requête,
+    # la validation ne fait donc aucune requête par élément
+    contributor = CharField(required=False)
+
+    class Meta:
+        model = Issue
+        fields = [
+            'name',
+            'description',
+            'status',
+            'priority',
+            'tag',
+            'contributor'
+        ]
+
+
 class CommentSerializer(ModelSerializer):
 
     class Meta:
         model = Comment
+        list_serializer_class = ValuesListSerializer
         fields = [
             'created_time',
             'author',
@@ -0,0 +1,113 @@
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+    pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import response_cache
+from .counters import apply_deltas, issue_deltas
+from .membership import invalidate_projects
+from .models import Project, Issue, Comment
+
+
+def deleted_from(origin, *models):
+    # origin : instance ou queryset à l'origine d'une suppression en cascade
+    if isinstance(origin, QuerySet):
+        return origin.model in models
+    return isinstance(origin, models)
+
+
+@receiver(m2m_changed, sender=Project.contributors.through)
+def contributors_changed(sender, instance, action, reverse, pk_set,
+                         **kwargs):
+    # reverse : modification depuis l'utilisateur (user.projects.add(...))
+    # instance est alors un utilisateur et pk_set des ids de projets
+    if action == 'pre_clear' and reverse:
+        instance._cleared_project_ids = list(
+            instance.projects.values_list('id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        project_ids = [instance.pk]
+    elif action == 'post_clear':
+        project_ids = instance.__dict__.pop('_cleared_project_ids')
+    else:
+        project_ids = list(pk_set)
+    invalidate_projects(*project_ids)
+    # Les contributeurs font partie de la représentation du projet (ETag)
+    Project.objects.filter(pk__in=project_ids) \
+        .update(updated_time=timezone.now())
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, instance, **kwargs):
+    # L'auteur du projet peut avoir changé
+    invalidate_projects(instance.pk)
+
+
+@receiver(pre_save, sender=Issue)
+def issue_saving(sender, instance, raw=False, **kwargs):
+    # Ticket modifié sans avoir été chargé depuis la base (Issue(pk=...))
+    if raw or instance.pk is None or hasattr(instance, '_counted_values'):
+        return
+    instance._counted_values = Issue.objects.filter(pk=instance.pk) \
+        .values_list('project_id', 'status', 'priority', 'tag').first()
+
+
+@receiver(post_save, sender=Issue)
+def issue_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = instance.__dict__.pop('_counted_values', None)
+    current = instance.get_counted_values()
+    instance._counted_values = current
+    if previous is None:
+        apply_deltas(current[0], issue_deltas([current[1:]]))
+    elif previous[0] != current[0]:
+        # Ticket déplacé dans un autre projet
+        apply_deltas(previous[0], issue_deltas([previous[1:]], -1))
+        apply_deltas(current[0], issue_deltas([current[1:]]))
+        response_cache.invalidate(response_cache.ISSUES, previous[0])
+    else:
+        deltas = issue_deltas([current[1:]])
+        deltas.subtract(issue_deltas([previous[1:]]))
+        apply_deltas(current[0], deltas)
+    response_cache.invalidate(response_cache.ISSUES, current[0])
+
+
+@receiver(pre_delete, sender=Issue)
+def issue_deleting(sender, instance, origin=None, **kwargs):
+    # Les commentaires supprimés en cascade sont décomptés en une fois
+    if deleted_from(origin, Issue):
+        instance._deleted_comments = instance.comment_set.count()
+
+
+@receiver(post_delete, sender=Issue)
+def issue_deleted(sender, instance, origin=None, **kwargs):
+    if deleted_from(origin, Project):
+        return
+    apply_deltas(
+        instance.project_id,
+        issue_deltas([instance.get_counted_values()[1:]], -1),
+        comments=-instance.__dict__.get('_deleted_comments', 0)
+    )
+    response_cache.invalidate(response_cache.ISSUES, instance.project_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    apply_deltas(instance.project_id, comments=1 if created else 0)
+    response_cache.invalidate(response_cache.COMMENTS, instance.issue_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    if deleted_from(origin, Project, Issue):
+        return
+    apply_deltas(instance.project_id, comments=-1)
+    response_cache.invalidate(response_cache.COMMENTS, instance.issue_id)
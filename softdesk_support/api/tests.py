@@ -0,0 +1,2012 @@
+import asyncio
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from base64 import urlsafe_b64encode
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import skipUnless
+
+from asgiref.sync import async_to_sync
+
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import Count
+from django.http import HttpResponse
+from django.test import AsyncClient, AsyncRequestFactory, \
+    RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from authentication.models import User
+from softdesk_support.instrumentation import \
+    QueryInstrumentationMiddleware
+from softdesk_support.replicas import ReplicaMiddleware, ReplicaRouter, \
+    _read_alias, primary_reads, read_alias
+from softdesk_support.sqlite.base import \
+    DatabaseWrapper as ProductionDatabaseWrapper
+from .membership import resolve_membership
+from .models import Project, Issue, Comment
+from .serializers import IssueSerializer, CommentSerializer, values_fields
+
+# Caches en mémoire pendant les tests : les caches partagés du serveur
+# (fichiers du dossier temporaire) ne sont ni lus ni vidés
+TEST_CACHES = {
+    alias: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'softdesk-test-{alias}',
+        'OPTIONS': config.get('OPTIONS', {}),
+    }
+    for alias, config in settings.CACHES.items()
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SupportAPITestCase(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username="author",
+            password="author",
+            age=30,
+            email="author@support.fr",
+            can_be_contacted=True,
+            can_data_be_shared=True
+        )
+        cls.collaborator = User.objects.create_user(
+            username="collaborator",
+            password="collaborator",
+            age=25,
+            email="collaborator@support.fr",
+            can_be_contacted=True,
+            can_data_be_shared=True
+        )
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def create_projects(self, count, author=None, contributors=()):
+        author = author or self.author
+        projects = Project.objects.bulk_create([
+            Project(
+                author=author,
+                name=f"project {i}",
+                description=f"description {i}",
+                type=Project.BACK_END
+            )
+            for i in range(count)
+        ])
+        through = Project.contributors.through
+        through.objects.bulk_create([
+            through(project_id=project.id, user_id=user.id)
+            for project in projects
+            for user in (author, *contributors)
+        ])
+        return projects
+
+    def create_issues(self, project, count, contributor=None):
+        return Issue.objects.bulk_create([
+            Issue(
+                project=project,
+                author=project.author,
+                contributor=contributor or project.author,
+                name=f"issue {i}",
+                description=f"description {i}",
+                priority=Issue.LOW,
+                tag=Issue.BUG
+            )
+            for i in range(count)
+        ])
+
+    def create_comments(self, issue, count):
+        return Comment.objects.bulk_create([
+            Comment(
+                project_id=issue.project_id,
+                issue=issue,
+                author_id=issue.author_id,
+                description=f"comment {i}"
+            )
+            for i in range(count)
+        ])
+
+    def walk(self, url):
+        # Parcourt toutes les pages d'une liste paginée
+        names, count = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            names += [row.get('name', row.get('description'))
+                      for row in response.json()['results']]
+            url = response.json()['next']
+            count += 1
+        return names, count
+
+    def count_queries(self, method, url, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, len(queries)
+
+
+class TestProject(SupportAPITestCase):
+
+    def test_list_has_no_duplicates(self):
+        # L'auteur est aussi contributeur : la jointure OR renvoyait
+        # le projet deux fois
+        self.create_projects(3, contributors=[self.collaborator])
+        self.client.force_authenticate(self.author)
+        response = self.client.get('/api/projects')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(
+            response.json()[0]['contributors'],
+            [self.author.id, self.collaborator.id]
+        )
+
+    def test_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.collaborator)
+        self.create_projects(1, contributors=[self.collaborator])
+        response, small = self.count_queries('get', '/api/projects')
+        self.assertEqual(len(response.json()), 1)
+
+        self.create_projects(50, contributors=[self.collaborator])
+        response, large = self.count_queries('get', '/api/projects')
+        self.assertEqual(len(response.json()), 51)
+        self.assertEqual(small, large)
+        # Validateurs (ETag), projets, contributeurs
+        self.assertEqual(large, 3)
+
+    def test_detail(self):
+        project, = self.create_projects(1, contributors=[self.collaborator])
+        self.client.force_authenticate(self.collaborator)
+        response = self.client.get(f'/api/projects/{project.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['name'], "project 0")
+
+
+class TestMembership(SupportAPITestCase):
+
+    def test_membership_is_cached(self):
+        project, = self.create_projects(1)
+        with self.assertNumQueries(1):
+            membership = resolve_membership(self.author.pk, project.pk)
+        self.assertTrue(membership.is_author)
+        self.assertTrue(membership.is_contributor)
+        with self.assertNumQueries(0):
+            resolve_membership(self.author.pk, project.pk)
+
+    def test_unknown_project(self):
+        membership = resolve_membership(self.author.pk, 0)
+        self.assertFalse(membership.is_author)
+        self.assertFalse(membership.is_contributor)
+
+    def test_invalidated_by_contributors_changes(self):
+        project, = self.create_projects(1)
+        user = self.collaborator
+
+        def contributes():
+            return resolve_membership(user.pk, project.pk).is_contributor
+
+        self.assertFalse(contributes())
+        project.contributors.add(user)
+        self.assertTrue(contributes())
+        project.contributors.remove(user)
+        self.assertFalse(contributes())
+        user.projects.add(project)
+        self.assertTrue(contributes())
+        user.projects.clear()
+        self.assertFalse(contributes())
+
+    def test_invalidated_by_author_change(self):
+        project, = self.create_projects(1)
+        self.assertFalse(
+            resolve_membership(self.collaborator.pk, project.pk).is_author
+        )
+        project.author = self.collaborator
+        project.save()
+        self.assertTrue(
+            resolve_membership(self.collaborator.pk, project.pk).is_author
+        )
+
+    def test_permission_check_does_not_load_contributors(self):
+        self.client.force_authenticate(self.collaborator)
+        small, = self.create_projects(1, contributors=[self.collaborator])
+        others = [
+            User(username=f"member{i}", email=f"member{i}@support.fr",
+                 age=20, can_be_contacted=False, can_data_be_shared=False)
+            for i in range(100)
+        ]
+        others = User.objects.bulk_create(others)
+        large, = self.create_projects(
+            1, contributors=[self.collaborator, *others]
+        )
+        _, small_count = self.count_queries(
+            'get', f'/api/projects/{small.pk}/issues'
+        )
+        _, large_count = self.count_queries(
+            'get', f'/api/projects/{large.pk}/issues'
+        )
+        self.assertEqual(small_count, large_count)
+
+
+class TestKeysetPagination(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, = self.create_projects(
+            1, contributors=[self.collaborator]
+        )
+        self.issues = self.create_issues(self.project, 12)
+        # Même date de création pour une partie des tickets :
+        # l'id départage
+        Issue.objects.filter(id__in=[i.id for i in self.issues[3:8]]) \
+            .update(created_time=self.issues[3].created_time)
+        self.client.force_authenticate(self.collaborator)
+        self.url = f'/api/projects/{self.project.pk}/issues'
+
+    def test_walk_forward(self):
+        names, pages = self.walk(self.url)
+        self.assertEqual(names, [f"issue {i}" for i in range(12)])
+        self.assertEqual(pages, 3)
+
+    def test_walk_backward(self):
+        response = self.client.get(self.url, {'page_size': 4})
+        last = self.client.get(response.json()['next']).json()
+        last = self.client.get(last['next']).json()
+        self.assertIsNone(last['next'])
+        self.assertEqual(
+            [row['name'] for row in last['results']],
+            [f"issue {i}" for i in range(8, 12)]
+        )
+        previous = self.client.get(last['previous']).json()
+        self.assertEqual(
+            [row['name'] for row in previous['results']],
+            [f"issue {i}" for i in range(4, 8)]
+        )
+        first = self.client.get(previous['previous']).json()
+        self.assertEqual(
+            [row['name'] for row in first['results']],
+            [f"issue {i}" for i in range(4)]
+        )
+        self.assertIsNone(first['previous'])
+
+    def test_page_cost_does_not_depend_on_depth(self):
+        # Première requête pour mettre l'appartenance au projet en cache
+        self.client.get(self.url)
+        caches['responses'].clear()
+        response, first = self.count_queries('get', self.url)
+        url = response.json()['next']
+        url = self.client.get(url).json()['next']
+        _, deep = self.count_queries('get', url)
+        self.assertEqual(first, deep)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_malformed_cursor_values(self):
+        created_time = self.issues[0].created_time.isoformat()
+        for position in (['nope', 1], [{'a': 1}, 1], [None, None],
+                         [created_time, 'nope'], [created_time, [1]],
+                         'ab'):
+            cursor = urlsafe_b64encode(json.dumps({
+                'p': position, 'r': 0, 'o': ['created_time', 'id']
+            }).encode()).decode()
+            with self.subTest(position=position):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+        response = self.client.get('/api/search', {
+            'q': 'issue', 'cursor': urlsafe_b64encode(json.dumps({
+                'p': ['nope', 1], 'r': 0, 'o': ['score', 'rowid']
+            }).encode()).decode()
+        })
+        self.assertEqual(response.status_code, 404)
+
+    def test_comments(self):
+        issue = self.issues[0]
+        self.create_comments(issue, 7)
+        names, pages = self.walk(f'/api/issues/{issue.pk}/comments')
+        self.assertEqual(names, [f"comment {i}" for i in range(7)])
+        self.assertEqual(pages, 2)
+
+    def test_user_tickets(self):
+        self.create_issues(self.project, 3, contributor=self.collaborator)
+        names, _ = self.walk(
+            f'/api/users/{self.collaborator.pk}/projects/'
+            f'{self.project.pk}/tickets/'
+        )
+        self.assertEqual(names, [f"issue {i}" for i in range(3)])
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN de SQLite")
+class TestQueryPlans(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, = self.create_projects(
+            1, contributors=[self.collaborator]
+        )
+        self.issues = self.create_issues(
+            self.project, 12, contributor=self.collaborator
+        )
+        self.create_comments(self.issues[0], 12)
+        self.client.force_authenticate(self.collaborator)
+
+    def get_plans(self, url, table):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        plans = []
+        with connection.cursor() as cursor:
+            for query in queries.captured_queries:
+                if f'FROM "{table}"' not in query['sql']:
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans.append([row[-1] for row in cursor.fetchall()])
+        self.assertTrue(plans)
+        return response, plans
+
+    def assertListUsesIndex(self, url, table, index):
+        # Première page puis page suivante (filtre sur le curseur)
+        for _ in range(2):
+            response, plans = self.get_plans(url, table)
+            # Aucune requête ne parcourt la table ni ne trie en mémoire
+            for plan in plans:
+                self.assertRegex(plan[0], f'^SEARCH {table} USING .*INDEX')
+                self.assertFalse(
+                    [line for line in plan if 'TEMP B-TREE' in line]
+                )
+            # La page est lue dans l'index du tri
+            self.assertIn(
+                f'SEARCH {table} USING INDEX {index}',
+                [plan[0].split(' (')[0] for plan in plans]
+            )
+            url = response.json()['next']
+
+    def test_issue_list(self):
+        self.assertListUsesIndex(
+            f'/api/projects/{self.project.pk}/issues',
+            'api_issue', 'issue_project_created_idx'
+        )
+
+    def test_issue_filters(self):
+        url = f'/api/projects/{self.project.pk}/issues?page_size=5&'
+        for query, index in (
+                ('status=TO_DO', 'issue_project_status_idx'),
+                ('priority=LOW', 'issue_project_priority_idx'),
+                ('tag=BUG', 'issue_project_tag_idx'),
+                (f'author={self.author.pk}', 'issue_project_author_idx'),
+                (f'contributor={self.collaborator.pk}',
+                 'issue_contributor_project_idx'),
+                ('created_after=2000-01-01T00:00:00Z',
+                 'issue_project_created_idx'),
+                ('ordering=-created_time', 'issue_project_created_idx'),
+        ):
+            with self.subTest(query):
+                self.assertListUsesIndex(url + query, 'api_issue', index)
+
+    def test_comment_list(self):
+        self.assertListUsesIndex(
+            f'/api/issues/{self.issues[0].pk}/comments',
+            'api_comment', 'comment_issue_created_idx'
+        )
+
+    def test_user_tickets(self):
+        self.assertListUsesIndex(
+            f'/api/users/{self.collaborator.pk}/projects/'
+            f'{self.project.pk}/tickets/',
+            'api_issue', 'issue_contributor_project_idx'
+        )
+
+
+class TestQueryBudgets(SupportAPITestCase):
+    # Chaque point d'accès fait le même nombre de requêtes pour 10 et pour
+    # 1000 lignes : un N+1 fait échouer le test
+
+    SIZES = (10, 1000)
+
+    def create_dataset(self, size):
+        owner = User.objects.create(
+            username=f'owner-{size}', age=30, can_be_contacted=False,
+            can_data_be_shared=False
+        )
+        members, outsiders = (
+            User.objects.bulk_create([
+                User(username=f'{kind}-{size}-{i}', age=30,
+                     can_be_contacted=False, can_data_be_shared=False)
+                for i in range(size)
+            ])
+            for kind in ('member', 'outsider')
+        )
+        project, = self.create_projects(1, owner, members)
+        self.create_projects(size - 1, owner)
+        issues = self.create_issues(project, size, contributor=owner)
+        comments = self.create_comments(issues[0], size)
+        return owner, members, outsiders, project, issues, comments
+
+    def get_requests(self, size):
+        owner, members, outsiders, project, issues, comments = \
+            self.create_dataset(size)
+        p = f'/api/projects/{project.pk}'
+        issue = issues[0]
+        usernames = {'username': [user.username for user in outsiders]}
+        item = {'name': 'n', 'description': 'd', 'priority': 'LOW',
+                'tag': 'BUG'}
+        return owner, [
+            ('project list', 'get', '/api/projects', {}),
+            ('project', 'get', f'{p}/', {}),
+            ('summary', 'get', f'{p}/summary', {}),
+            ('issue list', 'get', f'{p}/issues?page_size=100', {}),
+            ('issue', 'get', f'{p}/issues/{issue.pk}/', {}),
+            ('comment list', 'get',
+             f'/api/issues/{issue.pk}/comments?page_size=100', {}),
+            ('comment', 'get',
+             f'/api/issues/{issue.pk}/comments/{comments[0].pk}/', {}),
+            ('user tickets', 'get',
+             f'/api/users/{owner.pk}/projects/{project.pk}/tickets/'
+             f'?page_size=100', {}),
+            ('add collaborators', 'patch', f'{p}/add_collaborator',
+             {'data': usernames, 'format': 'json'}),
+            ('delete collaborators', 'delete', f'{p}/delete_collaborator',
+             {'data': usernames, 'format': 'json'}),
+            ('change status', 'patch',
+             f'{p}/issues/{issue.pk}/change_status',
+             {'data': {'status': 'IN PROGRESS'}, 'format': 'json'}),
+            ('assign contributor', 'patch',
+             f'{p}/issues/{issue.pk}/assign_contributor',
+             {'data': {'contributor': members[0].username},
+              'format': 'json'}),
+            ('bulk status', 'patch', f'{p}/issues/bulk',
+             {'data': {'ids': [row.pk for row in issues],
+                       'status': 'FINISHED'},
+              'format': 'json'}),
+            ('bulk creation', 'post', f'{p}/issues',
+             {'data': [item] * size, 'format': 'json'}),
+        ]
+
+    def count_statements(self, function, *args, **kwargs):
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            result = function(*args, **kwargs)
+        # Les lots d'un même bulk_create (limite de paramètres de SQLite)
+        # sont comptés une fois : INSERT dans la même table qui suivent un
+        # lot plein de plusieurs lignes. Les INSERT d'une ligne par objet
+        # sont tous comptés.
+        count, batch = 0, None
+        for sql in statements:
+            if not sql.startswith('INSERT'):
+                count, batch = count + 1, None
+                continue
+            table, rows = sql.split(' (')[0], sql.count('(%s')
+            if batch is not None and batch[0] == table and \
+                    batch[1] == batch[2] > 1:
+                batch = (table, batch[1], rows)
+            else:
+                count, batch = count + 1, (table, rows, rows)
+        return result, count
+
+    def test_per_row_inserts_are_counted(self):
+        project, = self.create_projects(1)
+        _, count = self.count_statements(self.create_issues, project, 1000)
+        self.assertEqual(count, 1)
+
+        def create_one_by_one():
+            for _ in range(3):
+                self.create_issues(project, 1)
+        _, count = self.count_statements(create_one_by_one)
+        self.assertEqual(count, 3)
+
+    def test_query_counts_do_not_grow(self):
+        counts = {}
+        for size in self.SIZES:
+            owner, requests = self.get_requests(size)
+            self.client.force_authenticate(owner)
+            for name, method, url, kwargs in requests:
+                # Caches vides : chemin complet de la requête
+                for cache in caches.all():
+                    cache.clear()
+                response, count = self.count_statements(
+                    getattr(self.client, method), url, **kwargs
+                )
+                self.assertLess(response.status_code, 300,
+                                f'{name} ({size} rows)')
+                counts.setdefault(name, []).append(count)
+        for name, (small, large) in counts.items():
+            with self.subTest(name):
+                self.assertEqual(small, large)
+
+
+class TestProjectCounters(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, = self.create_projects(
+            1, contributors=[self.collaborator]
+        )
+        self.client.force_authenticate(self.author)
+        self.url = f'/api/projects/{self.project.pk}/summary'
+
+    def create_issue(self, **data):
+        response = self.client.post(
+            f'/api/projects/{self.project.pk}/issues',
+            data={
+                "name": "issue",
+                "description": "description",
+                "priority": Issue.HIGH,
+                "tag": Issue.BUG,
+                **data
+            }
+        )
+        self.assertEqual(response.status_code, 201)
+        return Issue.objects.latest('id')
+
+    def test_counters_follow_issues_and_comments(self):
+        issue = self.create_issue()
+        self.create_issue(tag=Issue.TASK, status=Issue.IN_PROGRESS)
+        Comment.objects.create(
+            project=self.project, issue=issue, author=self.author,
+            description="comment"
+        )
+        summary = self.client.get(self.url).json()
+        self.assertEqual(summary['issues_to_do'], 1)
+        self.assertEqual(summary['issues_in_progress'], 1)
+        self.assertEqual(summary['issues_high'], 2)
+        self.assertEqual(summary['issues_bug'], 1)
+        self.assertEqual(summary['issues_task'], 1)
+        self.assertEqual(summary['comments_count'], 1)
+        self.assertIsNotNone(summary['last_activity_time'])
+
+        issue.status = Issue.FINISHED
+        issue.save()
+        summary = self.client.get(self.url).json()
+        self.assertEqual(summary['issues_to_do'], 0)
+        self.assertEqual(summary['issues_finished'], 1)
+
+        # Les commentaires supprimés en cascade sont décomptés
+        issue.delete()
+        summary = self.client.get(self.url).json()
+        self.assertEqual(summary['issues_finished'], 0)
+        self.assertEqual(summary['issues_high'], 1)
+        self.assertEqual(summary['comments_count'], 0)
+
+    def test_summary_is_constant_time(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_summary_requires_membership(self):
+        other = User.objects.create_user(
+            username="other", password="other", age=20,
+            can_be_contacted=False, can_data_be_shared=False
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_rebuild_command(self):
+        # bulk_create n'envoie pas de signaux : les compteurs dérivent
+        issues = self.create_issues(self.project, 3)
+        self.create_comments(issues[0], 2)
+        self.assertEqual(self.client.get(self.url).json()['issues_low'], 0)
+        call_command('rebuild_project_counters', stdout=StringIO())
+        summary = self.client.get(self.url).json()
+        self.assertEqual(summary['issues_low'], 3)
+        self.assertEqual(summary['issues_to_do'], 3)
+        self.assertEqual(summary['comments_count'], 2)
+
+    def test_project_update_keeps_counters(self):
+        # Instance chargée avant la création du ticket
+        stale = Project.objects.get(pk=self.project.pk)
+        self.create_issue()
+        response = self.client.patch(
+            f'/api/projects/{self.project.pk}/', {'name': 'renamed'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            Project.objects.get(pk=self.project.pk).issues_to_do, 1
+        )
+        stale.description = 'changed'
+        stale.save()
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual(project.issues_to_do, 1)
+        self.assertEqual(project.description, 'changed')
+
+    def test_migration_rebuilds_counters(self):
+        issues = self.create_issues(self.project, 2)
+        self.create_comments(issues[0], 1)
+        migration = import_module(
+            'api.migrations.0008_rebuild_project_counters'
+        )
+        migration.rebuild_counters(django_apps, None)
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual(project.issues_to_do, 2)
+        self.assertEqual(project.comments_count, 1)
+
+
+class TestBulkIssueCreation(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, = self.create_projects(
+            1, contributors=[self.collaborator]
+        )
+        self.client.force_authenticate(self.author)
+        self.url = f'/api/projects/{self.project.pk}/issues'
+
+    def items(self, count, **data):
+        return [
+            {
+                "name": f"issue {i}",
+                "description": "description",
+                "priority": Issue.MEDIUM,
+                "tag": Issue.FEATURE,
+                **data
+            }
+            for i in range(count)
+        ]
+
+    def test_bulk_create(self):
+        response = self.client.post(
+            self.url,
+            self.items(3, contributor="collaborator"),
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 3)
+        self.assertEqual(
+            list(Issue.objects.values_list('contributor', flat=True)),
+            [self.collaborator.pk] * 3
+        )
+        summary = Project.objects.get(pk=self.project.pk)
+        self.assertEqual(summary.issues_medium, 3)
+        self.assertEqual(summary.issues_to_do, 3)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        self.client.post(self.url, self.items(1), format='json')
+        _, small = self.count_queries(
+            'post', self.url,
+            data=self.items(2, contributor="collaborator"), format='json'
+        )
+        _, large = self.count_queries(
+            'post', self.url,
+            data=self.items(50, contributor="collaborator"), format='json'
+        )
+        self.assertEqual(small, large)
+
+    def test_errors_are_reported_per_item(self):
+        items = self.items(3)
+        items[0]['contributor'] = "unknown"
+        items[1]['priority'] = "URGENT"
+        User.objects.create_user(
+            username="outsider", password="outsider", age=20,
+            can_be_contacted=False, can_data_be_shared=False
+        )
+        items[2]['contributor'] = "outsider"
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(len(errors), 3)
+        self.assertIn('priority', errors[1])
+        self.assertFalse(Issue.objects.exists())
+
+        items[1]['priority'] = Issue.LOW
+        response = self.client.post(self.url, items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), [
+            {"contributor": ["username doesn't exist."]},
+            {},
+            {"contributor": ["User is not part of the project."]}
+        ])
+        self.assertFalse(Issue.objects.exists())
+
+
+class TestBulkIssueUpdate(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, = self.create_projects(
+            1, contributors=[self.collaborator]
+        )
+        self.issues = self.create_issues(self.project, 5)
+        call_command('rebuild_project_counters', stdout=StringIO())
+        self.client.force_authenticate(self.author)
+        self.url = f'/api/projects/{self.project.pk}/issues/bulk'
+        self.ids = [issue.pk for issue in self.issues]
+
+    def test_change_status_and_contributor(self):
+        response = self.client.patch(self.url, {
+            "ids": self.ids[:3],
+            "status": "in progress",
+            "contributor": "collaborator"
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+        for issue in response.json():
+            self.assertEqual(issue['status'], Issue.IN_PROGRESS)
+            self.assertEqual(issue['contributor'], self.collaborator.pk)
+        self.assertEqual(
+            Issue.objects.filter(status=Issue.TO_DO).count(), 2
+        )
+        project = Project.objects.get(pk=self.project.pk)
+        self.assertEqual(project.issues_to_do, 2)
+        self.assertEqual(project.issues_in_progress, 3)
+        self.assertEqual(project.issues_low, 5)
+
+    def test_query_count_does_not_depend_on_ids(self):
+        more = self.create_issues(self.project, 40)
+        _, small = self.count_queries(
+            'patch', self.url,
+            data={"ids": self.ids[:1], "status": "FINISHED"}, format='json'
+        )
+        _, large = self.count_queries(
+            'patch', self.url,
+            data={"ids": [issue.pk for issue in more], "status": "FINISHED"},
+            format='json'
+        )
+        self.assertEqual(small, large)
+
+    def test_only_author_can_update(self):
+        self.client.force_authenticate(self.collaborator)
+        response = self.client.patch(
+            self.url, {"ids": self.ids, "status": "FINISHED"}, format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Issue.objects.filter(status=Issue.FINISHED).exists())
+
+    def test_unknown_issue(self):
+        other, = self.create_projects(1)
+        outside, = self.create_issues(other, 1)
+        response = self.client.patch(
+            self.url, {"ids": [*self.ids, outside.pk], "status": "FINISHED"},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_invalid_ids(self):
+        for ids in ([], [True], [self.ids[0], False], [str(self.ids[0])]):
+            with self.subTest(ids=ids):
+                response = self.client.patch(
+                    self.url, {"ids": ids, "status": "FINISHED"},
+                    format='json'
+                )
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(Issue.objects.filter(status=Issue.FINISHED).exists())
+
+    def test_contributor_must_be_member(self):
+        User.objects.create_user(
+            username="outsider", password="outsider", age=20,
+            can_be_contacted=False, can_data_be_shared=False
+        )
+        response = self.client.patch(
+            self.url, {"ids": self.ids, "contributor": "outsider"},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_change_status_stores_choice_value(self):
+        self.client.patch(
+            f'/api/projects/{self.project.pk}/issues/{self.ids[0]}/'
+            f'change_status',
+            {"status": "in progress"}
+        )
+        self.assertEqual(
+            Issue.objects.get(pk=self.ids[0]).status, Issue.IN_PROGRESS
+        )
+
+
+class TestCollaborators(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, = self.create_projects(1)
+        self.users = User.objects.bulk_create([
+            User(username=f"member{i}", email=f"member{i}@support.fr",
+                 age=20, can_be_contacted=False, can_data_be_shared=False)
+            for i in range(50)
+        ])
+        self.client.force_authenticate(self.author)
+        self.add_url = f'/api/projects/{self.project.pk}/add_collaborator'
+        self.delete_url = \
+            f'/api/projects/{self.project.pk}/delete_collaborator'
+
+    def contributors(self):
+        return set(self.project.contributors.values_list('username',
+                                                         flat=True))
+
+    def test_add_single_username(self):
+        response = self.client.patch(self.add_url, {"username": "member0"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.contributors(), {"author", "member0"})
+
+    def test_add_and_delete_list(self):
+        response = self.client.patch(
+            self.add_url,
+            {"username": ["member0", "member1", "unknown"]},
+            format='json'
+        )
+        self.assertEqual(response.json()['unknown'], ["unknown"])
+        self.assertEqual(
+            self.contributors(), {"author", "member0", "member1"}
+        )
+        response = self.client.delete(
+            self.delete_url,
+            {"username": ["member0", "member1", "nobody"]},
+            format='json'
+        )
+        self.assertEqual(response.json()['unknown'], ["nobody"])
+        self.assertEqual(self.contributors(), {"author"})
+
+    def test_unknown_usernames_only(self):
+        response = self.client.patch(
+            self.add_url, {"username": ["unknown"]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_query_count_does_not_depend_on_usernames(self):
+        usernames = [user.username for user in self.users]
+        _, small = self.count_queries(
+            'patch', self.add_url,
+            data={"username": usernames[:2]}, format='json'
+        )
+        _, large = self.count_queries(
+            'patch', self.add_url,
+            data={"username": usernames[2:]}, format='json'
+        )
+        self.assertEqual(small, large)
+        _, small = self.count_queries(
+            'delete', self.delete_url,
+            data={"username": usernames[:2]}, format='json'
+        )
+        _, large = self.count_queries(
+            'delete', self.delete_url,
+            data={"username": usernames[2:]}, format='json'
+        )
+        self.assertEqual(small, large)
+
+
+class TestConditionalRequests(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, = self.create_projects(
+            1, contributors=[self.collaborator]
+        )
+        self.issues = self.create_issues(self.project, 3)
+        self.comments = self.create_comments(self.issues[0], 3)
+        # Modifications plus récentes que Last-Modified (à la seconde près)
+        hour_ago = timezone.now() - timedelta(hours=1)
+        for model in (Project, Issue, Comment):
+            model.objects.update(updated_time=hour_ago)
+        self.client.force_authenticate(self.author)
+
+    def assertNotModifiedUntilChange(self, url, change, is_list=False):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        if is_list:
+            # Une suppression ne change pas la date des lignes restantes
+            self.assertFalse(response.has_header('Last-Modified'))
+            since = http_date()
+        else:
+            since = response['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200 if is_list else 304)
+
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+
+    def test_project_list(self):
+        self.assertNotModifiedUntilChange(
+            '/api/projects',
+            lambda: self.project.contributors.remove(self.collaborator),
+            is_list=True
+        )
+
+    def test_project_detail(self):
+        def change():
+            self.project.name = "renamed"
+            self.project.save()
+        self.assertNotModifiedUntilChange(
+            f'/api/projects/{self.project.pk}/', change
+        )
+
+    def test_issue_list(self):
+        self.assertNotModifiedUntilChange(
+            f'/api/projects/{self.project.pk}/issues',
+            lambda: self.issues[2].delete(), is_list=True
+        )
+
+    def test_issue_detail(self):
+        issue = self.issues[0]
+
+        def change():
+            issue.name = "renamed"
+            issue.save()
+        self.assertNotModifiedUntilChange(
+            f'/api/projects/{self.project.pk}/issues/{issue.pk}/', change
+        )
+
+    def test_comment_list(self):
+        self.assertNotModifiedUntilChange(
+            f'/api/issues/{self.issues[0].pk}/comments',
+            lambda: Comment.objects.create(
+                project=self.project, issue=self.issues[0],
+                author=self.author, description="new"
+            ),
+            is_list=True
+        )
+
+    def test_not_modified_does_not_serialize(self):
+        url = f'/api/projects/{self.project.pk}/issues'
+        self.client.get(url)
+        caches['responses'].clear()
+        response, full = self.count_queries('get', url)
+        caches['responses'].clear()
+        _, conditional = self.count_queries(
+            'get', url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        # Pas de lecture de la page
+        self.assertEqual(conditional, full - 1)
+
+    def test_etag_depends_on_user(self):
+        url = f'/api/projects/{self.project.pk}/issues'
+        etag = self.client.get(url)['ETag']
+        self.client.force_authenticate(self.collaborator)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+
+class TestResponseCache(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, = self.create_projects(
+            1, contributors=[self.collaborator]
+        )
+        self.issues = self.create_issues(self.project, 3)
+        self.create_comments(self.issues[0], 3)
+        self.client.force_authenticate(self.collaborator)
+        self.issues_url = f'/api/projects/{self.project.pk}/issues'
+        self.comments_url = f'/api/issues/{self.issues[0].pk}/comments'
+
+    def assertCache(self, url, expected):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], expected)
+        return response
+
+    def test_hit_skips_queries(self):
+        self.assertCache(self.issues_url, 'MISS')
+        _, hit = self.count_queries('get', self.issues_url)
+        # Projet seulement : l'appartenance est aussi en cache
+        self.assertEqual(hit, 1)
+        self.assertCache(self.issues_url, 'HIT')
+
+    def test_cursor_is_part_of_the_key(self):
+        response = self.assertCache(self.issues_url + '?page_size=2', 'MISS')
+        self.assertCache(response.json()['next'], 'MISS')
+        self.assertCache(response.json()['next'], 'HIT')
+
+    def test_issue_changes_invalidate(self):
+        self.assertCache(self.issues_url, 'MISS')
+        issue = self.issues[1]
+        issue.name = "renamed"
+        issue.save()
+        response = self.assertCache(self.issues_url, 'MISS')
+        self.assertEqual(response.json()['results'][1]['name'], "renamed")
+        issue.delete()
+        response = self.assertCache(self.issues_url, 'MISS')
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_bulk_changes_invalidate(self):
+        self.client.force_authenticate(self.author)
+        self.assertCache(self.issues_url, 'MISS')
+        self.client.patch(self.issues_url + '/bulk', {
+            "ids": [issue.pk for issue in self.issues],
+            "status": "FINISHED"
+        }, format='json')
+        response = self.assertCache(self.issues_url, 'MISS')
+        self.assertEqual(
+            {issue['status'] for issue in response.json()['results']},
+            {Issue.FINISHED}
+        )
+        self.client.post(self.issues_url, [{
+            "name": "new", "description": "new",
+            "priority": Issue.LOW, "tag": Issue.BUG
+        }], format='json')
+        response = self.assertCache(self.issues_url, 'MISS')
+        self.assertEqual(len(response.json()['results']), 4)
+
+    def test_comment_changes_invalidate(self):
+        self.assertCache(self.comments_url, 'MISS')
+        self.assertCache(self.comments_url, 'HIT')
+        Comment.objects.create(
+            project=self.project, issue=self.issues[0],
+            author=self.collaborator, description="new"
+        )
+        response = self.assertCache(self.comments_url, 'MISS')
+        self.assertEqual(len(response.json()['results']), 4)
+
+    def test_authorization_is_checked_before_cache(self):
+        self.assertCache(self.issues_url, 'MISS')
+        self.project.contributors.remove(self.collaborator)
+        response = self.client.get(self.issues_url)
+        self.assertNotIn('results', response.json())
+
+    def test_stats(self):
+        self.assertCache(self.issues_url, 'MISS')
+        self.assertCache(self.issues_url, 'HIT')
+        self.issues[0].save()
+        admin = User.objects.create_superuser(
+            username="admin", password="admin", age=30,
+            can_be_contacted=False, can_data_be_shared=False
+        )
+        self.client.force_authenticate(admin)
+        stats = self.client.get('/api/cache/stats').json()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['invalidations'], 1)
+        self.assertEqual(stats['hit_ratio'], 0.5)
+        self.client.force_authenticate(self.collaborator)
+        response = self.client.get('/api/cache/stats')
+        self.assertEqual(response.status_code, 403)
+
+
+class TestValuesSerialization(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, = self.create_projects(
+            1, contributors=[self.collaborator]
+        )
+        self.issues = self.create_issues(self.project, 3)
+        Issue.objects.filter(pk=self.issues[0].pk).update(contributor=None)
+        self.create_comments(self.issues[0], 3)
+
+    def assertSameOutput(self, queryset, serializer_class):
+        queryset = queryset.order_by('created_time', 'id')
+        expected = serializer_class(queryset, many=True).data
+        values = queryset.values(*values_fields(serializer_class))
+        self.assertEqual(serializer_class(values, many=True).data, expected)
+        return expected
+
+    def test_issues(self):
+        data = self.assertSameOutput(
+            Issue.objects.filter(project=self.project), IssueSerializer
+        )
+        self.assertIsNone(data[0]['contributor'])
+        self.assertTrue(data[0]['created_time'].endswith('Z'))
+
+    def test_comments(self):
+        self.assertSameOutput(
+            Comment.objects.filter(issue=self.issues[0]), CommentSerializer
+        )
+
+    def test_list_endpoint(self):
+        self.client.force_authenticate(self.collaborator)
+        response = self.client.get(
+            f'/api/projects/{self.project.pk}/issues?page_size=10'
+        )
+        expected = IssueSerializer(
+            Issue.objects.filter(project=self.project)
+            .order_by('created_time', 'id'), many=True
+        ).data
+        self.assertEqual(response.json()['results'], expected)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('bench_serializers', rows=20, repeat=1, stdout=out)
+        self.assertIn('issues (20 rows', out.getvalue())
+        self.assertEqual(Issue.objects.count(), 3)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class TestProjectExport(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, = self.create_projects(
+            1, contributors=[self.collaborator]
+        )
+        self.issues = self.create_issues(self.project, 3)
+        self.create_comments(self.issues[0], 3)
+        self.url = f'/api/projects/{self.project.pk}/export'
+        self.client.force_authenticate(self.collaborator)
+
+    def export(self, url=None):
+        response = self.client.get(url or self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_lines(self):
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            [line['model'] for line in lines],
+            ['api.project'] + ['api.issue'] * 3 + ['api.comment'] * 3
+        )
+        self.assertEqual(lines[0]['fields']['name'], self.project.name)
+        self.assertEqual(
+            [line['pk'] for line in lines[1:4]],
+            [issue.pk for issue in self.issues]
+        )
+        self.assertEqual(
+            lines[1]['fields'], IssueSerializer(self.issues[0]).data
+        )
+
+    def test_gzip(self):
+        _, plain = self.export()
+        response, content = self.export(f'{self.url}?gzip=1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertEqual(gzip.decompress(content), plain)
+
+    def test_query_count_does_not_depend_on_size(self):
+        self.export()
+        _, small = self.count_export()
+        self.create_issues(self.project, 20)
+        self.create_comments(self.issues[1], 20)
+        content, large = self.count_export()
+        self.assertEqual(len(content.splitlines()), 47)
+        self.assertEqual(small, large)
+
+    def test_reads_in_one_transaction(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.export()
+        statements = [query['sql'] for query in queries]
+        # Transaction du test : atomic() crée un point de sauvegarde
+        start = next(i for i, sql in enumerate(statements)
+                     if sql.startswith('SAVEPOINT'))
+        self.assertTrue(statements[-1].startswith('RELEASE SAVEPOINT'))
+        reads = [i for i, sql in enumerate(statements)
+                 if 'FROM "api_issue"' in sql or 'FROM "api_comment"' in sql]
+        self.assertEqual(len(reads), 2)
+        self.assertGreater(min(reads), start)
+
+    def test_transaction_ends_before_download(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertTrue(queries[-1]['sql'].startswith('RELEASE SAVEPOINT'))
+        with CaptureQueriesContext(connection) as queries:
+            content = b''.join(response.streaming_content)
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(int(response['Content-Length']), len(content))
+        self.assertEqual(len(content.splitlines()), 7)
+
+    def test_asgi_streams_async_iterator(self):
+        async def download(client):
+            response = await client.get(self.url, headers={
+                'Authorization': f'Bearer {token}'
+            })
+            return response, b''.join(
+                [chunk async for chunk in response.streaming_content]
+            )
+
+        token = AccessToken.for_user(self.collaborator)
+        _, expected = self.export()
+        response, content = async_to_sync(download)(AsyncClient())
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(content, expected)
+
+    def count_export(self):
+        with CaptureQueriesContext(connection) as queries:
+            _, content = self.export()
+        return content, len(queries)
+
+    def test_permissions(self):
+        other = User.objects.create_user(
+            username="other", password="other", age=30,
+            can_be_contacted=False, can_data_be_shared=False
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class TestImport(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def import_file(self, path, **options):
+        out = StringIO()
+        call_command('import_softdesk', path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_export_round_trip(self):
+        project, = self.create_projects(1, contributors=[self.collaborator])
+        issues = self.create_issues(project, 3)
+        self.create_comments(issues[0], 2)
+        self.client.force_authenticate(self.author)
+        response = self.client.get(f'/api/projects/{project.pk}/export')
+        content = b''.join(response.streaming_content).decode()
+        path = self.write('export.ndjson', content)
+        created_time = Issue.objects.get(pk=issues[1].pk).created_time
+        project_id = project.pk
+        project.delete()
+
+        output = self.import_file(path, batch_size=2)
+        self.assertIn('Imported 6 records', output)
+        project = Project.objects.get(pk=project_id)
+        self.assertEqual(
+            set(project.contributors.values_list('username', flat=True)),
+            {'author', 'collaborator'}
+        )
+        self.assertEqual(
+            Issue.objects.get(pk=issues[1].pk).created_time, created_time
+        )
+        self.assertEqual(project.issues_to_do, 3)
+        self.assertEqual(project.comments_count, 2)
+        # Relancer l'import sans reprise s'arrête sur le premier id existant
+        with self.assertRaisesMessage(
+                CommandError, f'record 1: api.project {project_id} already '
+                              f'exists'):
+            self.import_file(path)
+        self.assertEqual(Issue.objects.count(), 3)
+
+    def test_csv_with_usernames(self):
+        path = self.write('projects.csv', (
+            "model,pk,author,contributors,name,description,type,"
+            "project,contributor,status,priority,tag\n"
+            "api.project,50,author,author|collaborator,imported,d,"
+            "BACK_END,,,,,\n"
+            "api.issue,60,collaborator,,issue,d,,50,,TO_DO,HIGH,BUG\n"
+        ))
+        self.import_file(path)
+        issue = Issue.objects.get(pk=60)
+        self.assertEqual(issue.author, self.collaborator)
+        self.assertIsNone(issue.contributor_id)
+        self.assertEqual(Project.objects.get(pk=50).issues_high, 1)
+
+    def issue_lines(self, project, count, author='author'):
+        return ''.join(
+            json.dumps({'model': 'api.issue', 'pk': 100 + i, 'fields': {
+                'author': author, 'project': project.pk, 'name': f'{i}',
+                'description': 'd', 'priority': 'LOW', 'tag': 'BUG'
+            }}) + '\n'
+            for i in range(count)
+        )
+
+    def test_resume_from_checkpoint(self):
+        project, = self.create_projects(1)
+        path = self.write('issues.ndjson', self.issue_lines(project, 5))
+        checkpoint = os.path.join(self.directory.name, 'checkpoint.json')
+        with open(checkpoint, 'w') as file:
+            json.dump({'source': path, 'records': 3}, file)
+        output = self.import_file(path, checkpoint=checkpoint)
+        self.assertIn('Resuming after 3 records', output)
+        self.assertEqual(
+            list(Issue.objects.values_list('pk', flat=True).order_by('pk')),
+            [103, 104]
+        )
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_existing_ids_stop_the_import(self):
+        # Ticket d'un autre projet avec le même id : ni ignoré, ni parent
+        # des commentaires importés
+        project, = self.create_projects(1)
+        other, = self.create_projects(1, author=self.collaborator)
+        issue, = self.create_issues(other, 1)
+        path = self.write('issues.ndjson', (
+            self.issue_lines(project, 1) +
+            self.issue_lines(project, 1).replace(
+                '"pk": 100', f'"pk": {issue.pk}'
+            ) +
+            json.dumps({'model': 'api.comment', 'pk': 300, 'fields': {
+                'author': 'author', 'project': project.pk,
+                'issue': issue.pk, 'description': 'd'
+            }}) + '\n'
+        ))
+        checkpoint = os.path.join(self.directory.name, 'checkpoint.json')
+        with self.assertRaisesMessage(
+                CommandError,
+                f'record 2: api.issue {issue.pk} already exists'):
+            self.import_file(path, checkpoint=checkpoint)
+        self.assertEqual(Issue.objects.get(pk=issue.pk).project, other)
+        self.assertEqual(Issue.objects.count(), 1)
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_contributors_invalidate_membership(self):
+        def contributes():
+            return resolve_membership(self.collaborator.pk, 500).is_contributor
+
+        path = self.write('project.ndjson', json.dumps({
+            'model': 'api.project', 'pk': 500, 'fields': {
+                'author': 'author', 'contributors': ['collaborator'],
+                'name': 'p', 'description': 'd', 'type': 'BACK_END'
+            }
+        }) + '\n')
+        self.assertFalse(contributes())
+        self.import_file(path)
+        self.assertTrue(contributes())
+
+    def test_error_keeps_committed_batches(self):
+        project, = self.create_projects(1)
+        path = self.write('issues.ndjson', (
+            self.issue_lines(project, 2) +
+            self.issue_lines(project, 1, author='nobody').replace(
+                '"pk": 100', '"pk": 200'
+            )
+        ))
+        checkpoint = os.path.join(self.directory.name, 'checkpoint.json')
+        with self.assertRaisesMessage(CommandError, 'unknown user nobody'):
+            self.import_file(path, batch_size=2, checkpoint=checkpoint)
+        self.assertEqual(Issue.objects.count(), 2)
+        # Compteurs des lots validés à jour
+        self.assertEqual(Project.objects.get(pk=project.pk).issues_to_do, 2)
+        with open(checkpoint) as file:
+            self.assertEqual(json.load(file)['records'], 2)
+
+
+@skipUnless(connection.vendor == 'sqlite', "FTS5 requires SQLite")
+class TestSearch(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, self.other = self.create_projects(
+            2, contributors=[self.collaborator]
+        )
+        self.other.contributors.remove(self.collaborator)
+        self.issue = Issue.objects.create(
+            project=self.project, author=self.author, name="Login crash",
+            description="The application crashes on the login page",
+            priority=Issue.HIGH, tag=Issue.BUG
+        )
+        self.comment = Comment.objects.create(
+            project=self.project, issue=self.issue, author=self.author,
+            description="Crash reproduced with an empty password"
+        )
+        Issue.objects.create(
+            project=self.other, author=self.author, name="Other crash",
+            description="Not visible", priority=Issue.LOW, tag=Issue.BUG
+        )
+        self.client.force_authenticate(self.collaborator)
+
+    def search(self, query, **params):
+        response = self.client.get('/api/search', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranked_results_with_snippets(self):
+        results = self.search('crash')['results']
+        # Le titre compte plus que le texte
+        self.assertEqual(
+            [(row['type'], row['id']) for row in results],
+            [('issue', self.issue.pk), ('comment', self.comment.pk)]
+        )
+        self.assertEqual(results[0]['title'], "Login <mark>crash</mark>")
+        self.assertIn("<mark>Crash</mark>", results[1]['snippet'])
+        self.assertEqual(results[1]['issue'], self.issue.pk)
+
+    def test_filters(self):
+        results = self.search('crash', type='comment')['results']
+        self.assertEqual([row['id'] for row in results], [self.comment.pk])
+        response = self.client.get(
+            '/api/search', {'q': 'crash', 'project': self.other.pk}
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_index_follows_changes(self):
+        # Les triggers couvrent aussi les mises à jour sans signaux
+        Issue.objects.filter(pk=self.issue.pk).update(name="Signup freeze")
+        self.assertEqual(len(self.search('freeze')['results']), 1)
+        self.assertEqual(len(self.search('login')['results']), 1)
+        self.comment.delete()
+        self.assertEqual(self.search('password')['results'], [])
+        self.assertEqual(len(self.search('sign*')['results']), 1)
+
+    def test_query_syntax_is_escaped(self):
+        self.assertEqual(self.search('crash" OR "x')['results'], [])
+        self.assertEqual(len(self.search('login NEAR')['results']), 0)
+        response = self.client.get('/api/search', {'q': ' * '})
+        self.assertEqual(response.status_code, 400)
+
+    def test_pagination(self):
+        Issue.objects.bulk_create([
+            Issue(project=self.project, author=self.author,
+                  name=f"crash {i}", description="d",
+                  priority=Issue.LOW, tag=Issue.BUG)
+            for i in range(6)
+        ])
+        expected = [
+            (row['type'], row['id'])
+            for row in self.search('crash', page_size=100)['results']
+        ]
+        self.assertEqual(len(expected), 8)
+        seen, url = [], '/api/search?q=crash&page_size=3'
+        while url:
+            page = self.client.get(url).json()
+            seen += [(row['type'], row['id']) for row in page['results']]
+            url = page['next']
+        self.assertEqual(seen, expected)
+        previous = self.client.get(page['previous']).json()
+        self.assertEqual(
+            [(row['type'], row['id']) for row in previous['results']],
+            expected[3:6]
+        )
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM api_search")
+        self.assertEqual(self.search('crash')['results'], [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('3 rows', out.getvalue())
+        self.assertEqual(len(self.search('crash')['results']), 2)
+
+
+class TestIssueFilters(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.project, = self.create_projects(
+            1, contributors=[self.collaborator]
+        )
+        self.issues = self.create_issues(self.project, 6)
+        for issue, (status, priority, tag) in zip(self.issues, [
+                (Issue.TO_DO, Issue.LOW, Issue.BUG),
+                (Issue.IN_PROGRESS, Issue.HIGH, Issue.BUG),
+                (Issue.IN_PROGRESS, Issue.HIGH, Issue.FEATURE),
+                (Issue.IN_PROGRESS, Issue.LOW, Issue.BUG),
+                (Issue.FINISHED, Issue.HIGH, Issue.BUG),
+                (Issue.IN_PROGRESS, Issue.HIGH, Issue.BUG),
+        ]):
+            issue.status, issue.priority, issue.tag = status, priority, tag
+        Issue.objects.bulk_update(self.issues, ['status', 'priority', 'tag'])
+        Issue.objects.filter(pk=self.issues[5].pk).update(
+            contributor=self.collaborator, author=self.collaborator
+        )
+        self.url = f'/api/projects/{self.project.pk}/issues'
+        self.client.force_authenticate(self.collaborator)
+
+    def names(self, **params):
+        response = self.client.get(self.url, {'page_size': 100, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['name'] for row in response.json()['results']]
+
+    def test_combined_filters(self):
+        self.assertEqual(
+            self.names(status='IN_PROGRESS', priority='HIGH', tag='BUG'),
+            ['issue 1', 'issue 5']
+        )
+        self.assertEqual(
+            self.names(contributor=self.collaborator.pk), ['issue 5']
+        )
+        self.assertEqual(self.names(author=self.collaborator.pk), ['issue 5'])
+
+    def test_created_range(self):
+        created = [
+            Issue.objects.get(pk=issue.pk).created_time
+            for issue in self.issues
+        ]
+        Issue.objects.filter(pk=self.issues[0].pk).update(
+            created_time=created[0].replace(year=2000)
+        )
+        self.assertEqual(
+            self.names(created_before='2001-01-01T00:00:00Z'), ['issue 0']
+        )
+        self.assertEqual(
+            len(self.names(created_after='2001-01-01T00:00:00Z')), 5
+        )
+
+    def test_ordering(self):
+        names = self.names(ordering='-created_time')
+        self.assertEqual(names, [f'issue {i}' for i in range(5, -1, -1)])
+        # Pagination dans l'ordre décroissant
+        self.assertEqual(
+            self.walk(f'{self.url}?ordering=-created_time&page_size=4')[0],
+            names
+        )
+
+    def test_invalid_parameters(self):
+        for params in (
+                {'status': 'DONE'},
+                {'ordering': 'name'},
+                {'author': 'x'},
+                {'created_after': 'yesterday'},
+        ):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, 400, params)
+
+
+@override_settings(REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '3/min',
+        'login_username': '2/min',
+        'signup_ip': '1/hour',
+        'write': '2/min',
+    },
+})
+class TestThrottling(SupportAPITestCase):
+
+    def login(self, username, ip='10.0.0.1'):
+        return self.client.post(
+            '/api/login/', {'username': username, 'password': 'wrong'},
+            REMOTE_ADDR=ip
+        )
+
+    def test_login_per_username(self):
+        for ip in ('10.0.0.1', '10.0.0.2'):
+            self.assertEqual(self.login('author', ip).status_code, 401)
+        response = self.login('author', '10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        # Un jeton toutes les 30 secondes
+        self.assertTrue(0 < int(response['Retry-After']) <= 30)
+        self.assertEqual(self.login('collaborator').status_code, 401)
+
+    def test_login_per_ip(self):
+        for username in ('a', 'b', 'c'):
+            self.assertEqual(self.login(username).status_code, 401)
+        self.assertEqual(self.login('d').status_code, 429)
+        self.assertEqual(self.login('d', ip='10.0.0.2').status_code, 401)
+
+    def test_forwarded_for_is_ignored(self):
+        # Adresse choisie par le client : pas de nouveau seau par valeur
+        for number in range(3):
+            response = self.client.post(
+                '/api/login/',
+                {'username': f'user{number}', 'password': 'wrong'},
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'1.2.3.{number}'
+            )
+            self.assertEqual(response.status_code, 401)
+        response = self.client.post(
+            '/api/login/', {'username': 'user3', 'password': 'wrong'},
+            REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='1.2.3.3'
+        )
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(REST_FRAMEWORK={
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_THROTTLE_RATES': {
+            **settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'],
+            'signup_ip': '1/hour',
+        },
+        'NUM_PROXIES': 1,
+    })
+    def test_forwarded_for_behind_a_proxy(self):
+        # Dernière adresse ajoutée par le proxy de confiance
+        for ip in ('1.2.3.4', '1.2.3.5'):
+            response = self.client.post(
+                '/api/sign-up/', REMOTE_ADDR='10.0.0.1',
+                HTTP_X_FORWARDED_FOR=f'6.6.6.6, {ip}'
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_token_endpoint(self):
+        for _ in range(2):
+            self.client.post('/api/token', {'username': 'author'})
+        response = self.client.post('/api/token', {'username': 'author'})
+        self.assertEqual(response.status_code, 429)
+
+    def test_signup(self):
+        self.assertEqual(self.client.post('/api/sign-up/').status_code, 400)
+        self.assertEqual(self.client.post('/api/sign-up/').status_code, 429)
+
+    def test_writes_per_user(self):
+        project, = self.create_projects(1, contributors=[self.collaborator])
+        url = f'/api/projects/{project.pk}/issues'
+        data = {'name': 'n', 'description': 'd', 'priority': 'LOW',
+                'tag': 'BUG'}
+        self.client.force_authenticate(self.collaborator)
+        for _ in range(2):
+            self.assertEqual(self.client.post(url, data).status_code, 201)
+        self.assertEqual(self.client.post(url, data).status_code, 429)
+        # Les lectures ne sont pas limitées
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.client.post(url, data).status_code, 201)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TestProductionDatabase(APITestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def get_connection(self, **options):
+        # Connexion du moteur de production sur une base de test
+        wrapper = ProductionDatabaseWrapper({
+            **connection.settings_dict,
+            'ENGINE': 'softdesk_support.sqlite',
+            'NAME': self.path,
+            'OPTIONS': {
+                'timeout': 0.01,
+                'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL'},
+                **options,
+            },
+        }, alias='production')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_pragmas(self):
+        cursor = self.get_connection().cursor()
+        cursor.execute('PRAGMA journal_mode')
+        self.assertEqual(cursor.fetchone(), ('wal',))
+        cursor.execute('PRAGMA synchronous')
+        self.assertEqual(cursor.fetchone(), (1,))
+
+    def test_transactions_take_the_write_lock(self):
+        first = self.get_connection()
+        first.cursor().execute('CREATE TABLE t (x)')
+        first._start_transaction_under_autocommit()
+        second = self.get_connection()
+        with self.assertRaisesMessage(OperationalError, 'locked'):
+            second.cursor().execute('INSERT INTO t VALUES (1)')
+        first.connection.rollback()
+
+    def test_deferred_transactions_do_not_lock(self):
+        first = self.get_connection()
+        first.cursor().execute('CREATE TABLE t (x)')
+        with first.deferred_transactions():
+            first._start_transaction_under_autocommit()
+        first.cursor().execute('SELECT COUNT(*) FROM t')
+        second = self.get_connection()
+        second.cursor().execute('INSERT INTO t VALUES (1)')
+        # Instantané du début de la transaction de lecture
+        cursor = first.cursor()
+        cursor.execute('SELECT COUNT(*) FROM t')
+        self.assertEqual(cursor.fetchone(), (0,))
+        first.connection.rollback()
+        self.assertEqual(first.begin_statement, 'BEGIN IMMEDIATE')
+
+    def test_locked_writes_are_retried(self):
+        first = self.get_connection()
+        first.cursor().execute('CREATE TABLE t (x)')
+        first._start_transaction_under_autocommit()
+        # Verrou relâché pendant les reprises de la seconde connexion
+        threading.Timer(0.2, first.connection.rollback).start()
+        second = self.get_connection(lock_retries=20, lock_retry_delay=0.05)
+        second.cursor().execute('INSERT INTO t VALUES (1)')
+        cursor = second.cursor()
+        cursor.execute('SELECT COUNT(*) FROM t')
+        self.assertEqual(cursor.fetchone(), (1,))
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('bench_writers', writers=2, readers=1, writes=3,
+                     compare=True, stdout=out)
+        self.assertIn("production: ", out.getvalue())
+        self.assertIn("0 'database is locked' error(s)", out.getvalue())
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class TestReplicas(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.factory = RequestFactory()
+        self.aliases = []
+
+        def get_response(request):
+            self.aliases.append(read_alias())
+            return HttpResponse()
+        self.middleware = ReplicaMiddleware(get_response)
+
+    def call(self, method, user=None, address='127.0.0.1'):
+        headers = {'REMOTE_ADDR': address}
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = \
+                f'Bearer {AccessToken.for_user(user)}'
+        request = getattr(self.factory, method)('/api/projects', **headers)
+        self.middleware(request)
+        return self.aliases[-1]
+
+    def test_reads_go_to_a_replica(self):
+        self.assertIn(self.call('get', self.author),
+                      ['replica1', 'replica2'])
+        self.assertIsNone(read_alias())
+
+    def test_reads_after_a_write_go_to_the_primary(self):
+        self.assertIsNone(self.call('post', self.author))
+        self.assertIsNone(self.call('get', self.author))
+        # Autre jeton du même utilisateur depuis une autre adresse
+        self.assertIsNone(self.call('get', self.author, address='10.0.0.1'))
+
+    def test_stickiness_is_per_user(self):
+        self.call('post', self.author)
+        # Autre utilisateur ou client anonyme à la même adresse
+        self.assertIsNotNone(self.call('get', self.collaborator))
+        self.assertIsNotNone(self.call('get'))
+
+    def test_anonymous_stickiness_is_per_address(self):
+        self.call('post')
+        self.assertIsNone(self.call('get'))
+        self.assertIsNotNone(self.call('get', address='10.0.0.2'))
+        # Jeton invalide : requête anonyme
+        request = self.factory.get(
+            '/api/projects', HTTP_AUTHORIZATION='Bearer invalid'
+        )
+        self.middleware(request)
+        self.assertIsNone(self.aliases[-1])
+
+    def test_async_middleware(self):
+        async def get_response(request):
+            self.aliases.append(read_alias())
+            return HttpResponse()
+        middleware = ReplicaMiddleware(get_response)
+        factory = AsyncRequestFactory()
+        headers = {
+            'Authorization': f'Bearer {AccessToken.for_user(self.author)}'
+        }
+        async_to_sync(middleware)(factory.post('/api/projects',
+                                               headers=headers))
+        async_to_sync(middleware)(factory.get('/api/projects',
+                                              headers=headers))
+        # Autre client
+        async_to_sync(middleware)(factory.get('/api/projects'))
+        self.assertEqual(self.aliases[:2], [None, None])
+        self.assertIsNotNone(self.aliases[2])
+
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Project), 'default')
+        token = _read_alias.set('replica1')
+        self.addCleanup(_read_alias.reset, token)
+        self.assertEqual(router.db_for_write(Project), 'default')
+        with primary_reads():
+            self.assertEqual(router.db_for_read(Project), 'default')
+        # Test dans une transaction : lectures sur la base principale
+        self.assertEqual(router.db_for_read(Project), 'default')
+        connection.in_atomic_block = False
+        try:
+            self.assertEqual(router.db_for_read(Project), 'replica1')
+        finally:
+            connection.in_atomic_block = True
+        self.assertFalse(router.allow_migrate('replica1', 'api'))
+
+    def test_sync_command_without_replicas(self):
+        with override_settings(DATABASE_REPLICAS=[]):
+            with self.assertRaises(CommandError):
+                call_command('sync_replicas')
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TestReplicaSync(APITransactionTestCase):
+
+    def test_sync_command(self):
+        user = User.objects.create_user(
+            username='sync', password='sync', age=30,
+            can_be_contacted=False, can_data_be_shared=False
+        )
+        Project.objects.create(author=user, name='p', description='d',
+                               type=Project.BACK_END)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'replica.sqlite3')
+        out = StringIO()
+        call_command('sync_replicas', path, stdout=out)
+        self.assertIn('1 replica(s) synchronized', out.getvalue())
+        replica = sqlite3.connect(path)
+        self.addCleanup(replica.close)
+        self.assertEqual(
+            replica.execute('SELECT COUNT(*) FROM api_project').fetchone(),
+            (1,)
+        )
+
+
+SQL_INSTRUMENTATION = {
+    'ENABLED': True,
+    'HEADERS': True,
+    'SLOW_REQUEST_MS': 10000,
+    'SLOW_SQL_MS': 10000,
+    'MAX_QUERIES': 1000,
+    'SLOWEST_QUERIES': 2,
+}
+
+
+@override_settings(SQL_INSTRUMENTATION=SQL_INSTRUMENTATION)
+class TestQueryInstrumentation(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create_projects(3)
+        self.client.force_authenticate(self.author)
+
+    def test_headers(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/projects')
+        self.assertEqual(response['X-Query-Count'], str(len(queries)))
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^db;dur=[\d.]+;desc="{len(queries)} queries", app;dur=[\d.]+$'
+        )
+
+    @override_settings(
+        SQL_INSTRUMENTATION={**SQL_INSTRUMENTATION, 'HEADERS': False}
+    )
+    def test_without_headers(self):
+        response = self.client.get('/api/projects')
+        self.assertNotIn('X-Query-Count', response)
+        self.assertNotIn('Server-Timing', response)
+
+    def test_fast_requests_are_not_logged(self):
+        with self.assertNoLogs('softdesk_support.sql'):
+            self.client.get('/api/projects')
+
+    @override_settings(
+        SQL_INSTRUMENTATION={**SQL_INSTRUMENTATION, 'MAX_QUERIES': 0}
+    )
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs('softdesk_support.sql', 'WARNING') as logs:
+            response = self.client.get('/api/projects')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['event'], 'slow_request')
+        self.assertEqual(record['path'], '/api/projects')
+        self.assertEqual(record['status'], 200)
+        self.assertEqual(record['query_count'],
+                         int(response['X-Query-Count']))
+        self.assertEqual(len(record['slowest_queries']), 2)
+        durations = [query['ms'] for query in record['slowest_queries']]
+        self.assertEqual(durations, sorted(durations, reverse=True))
+
+    def test_async_requests(self):
+        async def get_response(request):
+            await User.objects.acount()
+            await Project.objects.acount()
+            return HttpResponse()
+        middleware = QueryInstrumentationMiddleware(get_response)
+        response = async_to_sync(middleware)(
+            AsyncRequestFactory().get('/api/projects')
+        )
+        self.assertEqual(response['X-Query-Count'], '2')
+
+    def test_concurrent_async_requests(self):
+        # Requêtes HTTP entrelacées sur le même thread de sync_to_async :
+        # chacune compte seulement ses requêtes SQL
+        async def get_response(request):
+            for _ in range(int(request.GET['queries'])):
+                await User.objects.acount()
+                await asyncio.sleep(0)
+            return HttpResponse()
+
+        async def send(middleware):
+            factory = AsyncRequestFactory()
+            return await asyncio.gather(*(
+                middleware(factory.get('/', {'queries': count}))
+                for count in range(1, 21)
+            ))
+
+        middleware = QueryInstrumentationMiddleware(get_response)
+        responses = async_to_sync(send)(middleware)
+        self.assertEqual(
+            [response['X-Query-Count'] for response in responses],
+            [str(count) for count in range(1, 21)]
+        )
+
+    def test_concurrent_asgi_requests(self):
+        # Pile complète (ASGIHandler), vues DRF exécutées par sync_to_async
+        project, = self.create_projects(1)
+        issues = self.create_issues(project, 3)
+        token = f'Bearer {AccessToken.for_user(self.author)}'
+        paths = [
+            '/api/projects',
+            f'/api/projects/{project.pk}',
+            f'/api/projects/{project.pk}/issues',
+            f'/api/issues/{issues[0].pk}/comments',
+        ]
+
+        async def send(client, paths):
+            return await asyncio.gather(*(
+                client.get(path, headers={'Authorization': token})
+                for path in paths
+            ))
+
+        client = AsyncClient()
+        # Caches remplis : même nombre de requêtes SQL à chaque appel
+        async_to_sync(send)(client, paths)
+        alone = [
+            async_to_sync(send)(client, [path])[0]['X-Query-Count']
+            for path in paths
+        ]
+        responses = async_to_sync(send)(client, paths * 5)
+        self.assertEqual(
+            [response['X-Query-Count'] for response in responses], alone * 5
+        )
+
+    @override_settings(
+        SQL_INSTRUMENTATION={**SQL_INSTRUMENTATION, 'ENABLED': False}
+    )
+    def test_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            QueryInstrumentationMiddleware(HttpResponse)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TestSeed(APITestCase):
+
+    def test_seed_command(self):
+        out = StringIO()
+        call_command('seed', users=30, projects=10, issues=300, comments=600,
+                     max_contributors=8, seed=1, stdout=out)
+        self.assertIn('api.issue: 300', out.getvalue())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Issue.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 600)
+        sizes = sorted(
+            Project.objects.annotate(issues=Count('issue'))
+            .values_list('issues', flat=True),
+            reverse=True
+        )
+        # Quelques gros projets, beaucoup de petits
+        self.assertGreater(sizes[0], 5 * sizes[len(sizes) // 2])
+        for project in Project.objects.all():
+            self.assertTrue(
+                project.contributors.filter(pk=project.author_id).exists()
+            )
+            self.assertEqual(
+                project.issues_to_do + project.issues_in_progress +
+                project.issues_finished,
+                project.issue_set.count()
+            )
+            self.assertEqual(project.comments_count,
+                             project.comment_set.count())
+        # Dates réparties sur l'historique, pas la date de création
+        self.assertGreater(
+            User.objects.filter(
+                created_time__lt=timezone.now() - timedelta(days=1)
+            ).count(), 20
+        )
+        # Commentaires des membres du projet, après le ticket
+        comment = Comment.objects.select_related('issue').first()
+        self.assertGreaterEqual(comment.created_time,
+                                comment.issue.created_time)
+        with self.assertRaises(CommandError):
+            call_command('seed', users=1, projects=1, stdout=StringIO())
+
+    # Sans le journal des requêtes lentes (création d'utilisateurs)
+    @override_settings(
+        SQL_INSTRUMENTATION={**settings.SQL_INSTRUMENTATION, 'ENABLED': False}
+    )
+    def test_route_benchmark(self):
+        call_command('seed', users=10, projects=3, issues=30, comments=60,
+                     seed=1, stdout=StringIO())
+        out = StringIO()
+        call_command('bench_routes', iterations=1, warmup=0, json=True,
+                     stdout=out)
+        results = json.loads(out.getvalue().splitlines()[-1])
+        routes = {row['route'] for row in results['routes']}
+        self.assertIn('api/projects/<int:pk>/issues', routes)
+        self.assertIn('api/users/(?P<pk>[^/.]+)/$', routes)
+        for row in results['routes']:
+            self.assertEqual(row['errors'], 0, row)
+        # Données du benchmark annulées
+        self.assertFalse(
+            User.objects.filter(username__startswith='bench-routes').exists()
+        )
+        self.assertEqual(Issue.objects.count(), 30)
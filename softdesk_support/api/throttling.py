@@ -0,0 +1,119 @@
+"""
+Limitation du débit des requêtes par seau à jetons (token bucket).
+
+Chaque client (utilisateur, adresse IP ou nom d'utilisateur soumis) a un
+seau de `capacité` jetons, rempli à raison de `capacité` jetons par
+période : le taux "10/min" autorise 10 requêtes d'affilée puis une toutes
+les 6 secondes. Une requête sans jeton reçoit une réponse 429 avec
+l'en-tête Retry-After.
+
+Les taux sont ceux de REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] (None
+désactive une limite). L'état des seaux est stocké dans le cache
+THROTTLE_CACHE_ALIAS, partagé entre les processus (fichiers par défaut).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """
+    "10/min" -> (capacity, refill rate in tokens per second)
+    """
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    scope = None
+
+    def get_cache_key(self, request, view):
+        """
+        Bucket identifier, None to skip the throttle for this request
+        """
+        raise NotImplementedError
+
+    def get_rate(self):
+        return parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(self.scope))
+
+    def allow_request(self, request, view):
+        rate = self.get_rate()
+        if rate is None:
+            return True
+        ident = self.get_cache_key(request, view)
+        if ident is None:
+            return True
+        capacity, refill = rate
+        cache = caches[settings.THROTTLE_CACHE_ALIAS]
+        key = f'throttle:{self.scope}:{ident}'
+        now = time.time()
+        tokens, updated = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+            self.wait_time = None
+        else:
+            self.wait_time = (1 - tokens) / refill
+        # Le seau redevient plein après (capacité / débit) secondes
+        cache.set(key, (tokens, now), timeout=int(capacity / refill) + 1)
+        return allowed
+
+    def wait(self):
+        return self.wait_time
+
+
+class LoginIPThrottle(TokenBucketThrottle):
+    # Connexions par adresse IP
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.get_ident(request)
+
+
+class LoginUsernameThrottle(TokenBucketThrottle):
+    # Connexions par nom d'utilisateur, quelle que soit l'adresse IP
+    # (essais de mots de passe sur un même compte)
+    scope = 'login_username'
+
+    def get_cache_key(self, request, view):
+        data = request.data
+        username = data.get('username') if hasattr(data, 'get') else None
+        if not isinstance(username, str) or not username:
+            return None
+        # Valeur quelconque envoyée par le client : hachée pour la clé
+        return hashlib.md5(
+            username.encode(), usedforsecurity=False
+        ).hexdigest()
+
+
+class SignUpIPThrottle(TokenBucketThrottle):
+    # Inscriptions par adresse IP
+    scope = 'signup_ip'
+
+    def get_cache_key(self, request, view):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return None
+        return self.get_ident(request)
+
+
+class WriteThrottle(TokenBucketThrottle):
+    # Requêtes d'écriture par utilisateur, ou par adresse IP pour les
+    # requêtes anonymes
+    scope = 'write'
+
+    def get_cache_key(self, request, view):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return None
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
@@ -1,6 +1,12 @@
-from django.db.models import Q
-from django.http import Http404
+from collections import Counter
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, Prefetch, Q, prefetch_related_objects
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
@@ -12,41 +18,96 @@ from .models import Project, Issue, Comment
 from authentication.models import User
 
 from .serializers import ProjectSerializer, IssueSerializer, \
-    CommentSerializer
-
+    CommentSerializer, ProjectSummarySerializer, IssueBulkSerializer, \
+    IssueFilterSerializer, values_fields
+
+from . import response_cache, search
+from .conditional import add_validators, instance_validators, \
+    list_state, list_validators, not_modified, state_validators
+from .export import spool_export, file_chunks, afile_chunks
+from .counters import SUMMARY_FIELDS, apply_deltas, issue_deltas
+from .pagination import KeysetPagination, SearchPagination
+from .membership import get_membership, is_contributor
 from .permissions import IsAuthor, IsContributor
 from authentication.permissions import IsOwner
+from softdesk_support.replicas import primary_reads
+
+
+def can_read_project(request, project_id):
+    membership = get_membership(request, project_id)
+    return (
+        membership.is_contributor or
+        membership.is_author or
+        request.user.is_superuser
+    )
+
+
+def get_usernames(data):
+    # 'username' contient un nom d'utilisateur ou une liste de noms
+    if hasattr(data, 'getlist'):
+        usernames = data.getlist('username')
+    else:
+        usernames = data.get('username')
+        if isinstance(usernames, str):
+            usernames = [usernames]
+    if (
+            not isinstance(usernames, list) or not usernames or
+            not all(isinstance(username, str) for username in usernames)
+    ):
+        return None
+    # Sans doublons, dans l'ordre de la requête
+    return list(dict.fromkeys(usernames))
+
+
+def resolve_usernames(usernames):
+    # Une seule requête pour tous les noms d'utilisateurs
+    user_ids = dict(
+        User.objects.filter(username__in=usernames)
+        .values_list('username', 'id')
+    )
+    unknown = [username for username in usernames if username not in user_ids]
+    return list(user_ids.values()), unknown
 
 
 @api_view(['PATCH'])
 @permission_classes([IsAuthenticated & IsContributor | IsAuthor | IsAdminUser])
 def add_collaborator(request, pk):
     # Définition d'une action accessible sur la méthode PATCH
-    # Pour l'ajout d'un collaborateur à l'attribut du projet
+    # Pour l'ajout de collaborateurs à l'attribut du projet
 
     # detail car elle concerne un projet spécifique
 
-    # Récupérer les données du collaborateur dans le corps de la requête
+    # Récupérer les données des collaborateurs dans le corps de la requête
     # Ce qui spécifie un collaborateur (utilisateur) : nom d'utilisateur
     # Le nom d'utilisateur est unique
 
     if request.method == "PATCH":
-        print("ok")
-        collaborator_username = request.data['username']
-
-        # Rechercher le collaborateur dans la base de données
-        collaborator = User.objects.get(username=collaborator_username)
+        usernames = get_usernames(request.data)
+        if usernames is None:
+            return Response({"message": "Username is missing."},
+                            status=status.HTTP_400_BAD_REQUEST)
 
         # Rechercher le projet à partir de l'id spécifié dans le chemin
-        project = Project.objects.get(pk=pk)
-
-        if project.author == request.user or request.user.is_superuser:
-            project.contributors.add(collaborator)
-            # Enregistrer le projet
-            project.save()
-            return Response({"message": 'New contributor added.'})
-        else:
+        project = get_object(pk, Project)
+        if (
+                project.author_id != request.user.pk and
+                not request.user.is_superuser
+        ):
             return Response({"message": "User doesn't have permission."})
+
+        # Rechercher les collaborateurs dans la base de données
+        user_ids, unknown = resolve_usernames(usernames)
+        if not user_ids:
+            return Response(
+                {"message": "username doesn't exist.", "unknown": unknown},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # Un seul INSERT dans la table d'association
+        project.contributors.add(*user_ids)
+        return Response({
+            "message": 'New contributor added.',
+            "unknown": unknown
+        })
     return Response({
         "message": "ERROR : Contributor hasn't been added to the project."
     })
@@ -56,21 +117,25 @@ def add_collaborator(request, pk):
 @permission_classes([IsAuthenticated & IsContributor | IsAuthor | IsAdminUser])
 def delete_collaborator(request, pk):
     if request.method == 'DELETE':
-        if 'username' not in request.data:
+        usernames = get_usernames(request.data)
+        if usernames is None:
             return Response({"message": "Username is missing for deletion."})
-        collaborator_username = request.data['username']
-        collaborator = User.objects.get(username=collaborator_username)
-        project = Project.objects.get(pk=pk)
-        if project.author == request.user or request.user.is_superuser:
-            project.contributors.remove(collaborator)
-            project.save()
-            return Response({
-                "message": "The contributor has been deleted from the project."
-            })
-        else:
+        project = get_object(pk, Project)
+        if (
+                project.author_id != request.user.pk and
+                not request.user.is_superuser
+        ):
             return Response({
                 "message": "User doesn't have permission."
             })
+        user_ids, unknown = resolve_usernames(usernames)
+        if user_ids:
+            # Un seul DELETE dans la table d'association
+            project.contributors.remove(*user_ids)
+        return Response({
+            "message": "The contributor has been deleted from the project.",
+            "unknown": unknown
+        })
     return Response({
         "message": "ERROR : Contributor hasn't been deleted from the project."
     })
@@ -97,8 +162,8 @@ def change_status(request, pk, pk2):
             return Response({
                 'message': "Status must be 'TO DO', 'IN PROGRESS', 'FINISHED'"
             })
-        # Changer le statut du ticket
-        issue.status = request.data["status"]
+        # Changer le statut du ticket ('TO DO' -> Issue.TO_DO)
+        issue.status = data_status.replace(' ', '_')
         issue.save()
         return Response('The issue has a new status.')
     return Response({"message": "The status hasn't been changed."})
@@ -125,7 +190,7 @@ def assign_contributor(request, pk, pk2):
             contributor = User.objects.get(username=contributor_username)
         except User.DoesNotExist:
             return Response({"message": "username doesn't exist."})
-        if contributor not in issue.project.contributors.all():
+        if not is_contributor(request, issue.project_id, user=contributor):
             return Response({
                 'message': 'User is not part of the project.'
             })
@@ -139,6 +204,256 @@ def assign_contributor(request, pk, pk2):
     })
 
 
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def bulk_update_issues(request, pk):
+    # Changement de statut et/ou de contributeur d'une liste de tickets :
+    # autorisation vérifiée en une requête puis un seul UPDATE
+    ids = request.data.get('ids')
+    if (
+            not isinstance(ids, list) or not ids or
+            # true / false sont des int en Python
+            not all(isinstance(pk2, int) and not isinstance(pk2, bool)
+                    for pk2 in ids)
+    ):
+        return Response(
+            {'message': "Missing ids field with a list of issue ids."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if len(ids) > settings.ISSUE_BULK_MAX_ITEMS:
+        return Response(
+            {'message': f"At most {settings.ISSUE_BULK_MAX_ITEMS} issues "
+                        f"can be updated at once."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    if 'status' not in request.data and 'contributor' not in request.data:
+        return Response(
+            {'message': "Missing status or contributor field."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    updates = {}
+    if 'status' in request.data:
+        data_status = str(request.data['status']).upper().replace(' ', '_')
+        if data_status not in dict(Issue.STATUS_CHOICES):
+            return Response(
+                {'message': "Status must be 'TO DO', 'IN PROGRESS', "
+                            "'FINISHED'"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        updates['status'] = data_status
+    if 'contributor' in request.data:
+        contributor = User.objects.only('id').filter(
+            username=request.data['contributor']
+        ).first()
+        if contributor is None:
+            return Response({"message": "username doesn't exist."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not is_contributor(request, pk, user=contributor):
+            return Response({'message': 'User is not part of the project.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        updates['contributor_id'] = contributor.pk
+
+    issues = Issue.objects.filter(project=pk, id__in=set(ids))
+    with transaction.atomic():
+        # Tickets trouvés et tickets de l'utilisateur, par combinaison de
+        # valeurs comptées dans les compteurs du projet
+        groups = list(
+            issues.values_list('status', 'priority', 'tag').annotate(
+                total=Count('id'),
+                own=Count('id', filter=Q(author=request.user))
+            ).order_by()
+        )
+        found = sum(group[3] for group in groups)
+        if found != len(set(ids)):
+            return Response(
+                {'message': "Some issues don't exist in this project."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if (
+                sum(group[4] for group in groups) != found and
+                not request.user.is_superuser
+        ):
+            return Response({'message': 'You don\'t have permissions.'},
+                            status=status.HTTP_403_FORBIDDEN)
+        issues.update(updated_time=timezone.now(), **updates)
+        if 'status' in updates:
+            deltas = Counter()
+            for issue_status, priority, tag, total, _ in groups:
+                deltas.update(issue_deltas(
+                    [(updates['status'], priority, tag)], total
+                ))
+                deltas.subtract(issue_deltas(
+                    [(issue_status, priority, tag)], total
+                ))
+            apply_deltas(pk, deltas)
+        else:
+            apply_deltas(pk)
+        response_cache.invalidate(response_cache.ISSUES, pk)
+    serializer = IssueSerializer(issues.order_by('id'), many=True)
+    return Response(serializer.data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def project_summary(request, pk):
+    # Compteurs dénormalisés du projet : aucune lecture des tickets
+    project = get_object_or_404(
+        Project.objects.only('id', *SUMMARY_FIELDS),
+        pk=pk
+    )
+    if not can_read_project(request, project.pk):
+        return Response(
+            {"detail": "You don't have permissions."},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    return Response(ProjectSummarySerializer(project).data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def project_export(request, pk):
+    # Projet, tickets et commentaires en NDJSON, lus dans une transaction
+    # puis envoyés depuis un fichier temporaire
+    project = get_object_or_404(
+        Project.objects.prefetch_related(contributors_prefetch()),
+        pk=pk
+    )
+    if not can_read_project(request, project.pk):
+        return Response(
+            {"detail": "You don't have permissions."},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    compress = request.query_params.get('gzip') in ('1', 'true')
+    spool, size = spool_export(project, compress=compress)
+    filename = f'project-{project.pk}.ndjson'
+    if compress:
+        content_type = 'application/gzip'
+        filename += '.gz'
+    else:
+        content_type = 'application/x-ndjson'
+    if isinstance(request._request, ASGIRequest):
+        content = afile_chunks(spool)
+    else:
+        content = file_chunks(spool)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Length'] = size
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def full_text_search(request):
+    # Recherche dans les tickets et commentaires des projets de
+    # l'utilisateur, triée par pertinence
+    if not search.is_available():
+        return Response(
+            {"detail": "Search is not available on this database."},
+            status=status.HTTP_501_NOT_IMPLEMENTED
+        )
+    expression = search.match_expression(request.query_params.get('q', ''))
+    if not expression:
+        return Response(
+            {"detail": "The query parameter q is required."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    kind = request.query_params.get('type')
+    if kind is not None and kind not in search.KINDS:
+        return Response(
+            {"detail": f"type must be one of {', '.join(search.KINDS)}."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    project_id = request.query_params.get('project')
+    if project_id is not None:
+        if not project_id.isdigit():
+            return Response(
+                {"detail": "project must be a project id."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not can_read_project(request, int(project_id)):
+            return Response(
+                {"detail": "You don't have permissions."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+    paginator = SearchPagination()
+    paginator.start_page(request)
+    rows = paginator.paginate_rows(search.search(
+        request.user.pk, expression,
+        project_id=project_id and int(project_id),
+        kind=kind,
+        position=paginator.position,
+        reverse=paginator.reverse,
+        limit=paginator.page_size + 1
+    ))
+    return paginator.get_paginated_response([
+        {
+            'type': row['kind'],
+            'id': row['rowid'] // 2,
+            'project': row['project_id'],
+            'issue': row['issue_id'],
+            'title': row['title'] or None,
+            'snippet': row['snippet'],
+            'score': row['score'],
+        }
+        for row in rows
+    ])
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    # Compteurs du cache des listes, pour le réglage de sa taille
+    return Response(response_cache.get_stats())
+
+
+def cached_list_response(request, view, queryset, serializer_class, scope,
+                         object_id, ordering=None):
+    # Liste paginée servie depuis le cache des réponses.
+    # L'autorisation doit avoir été vérifiée avant.
+    key = response_cache.get_key(request, scope, object_id)
+    entry = response_cache.get_entry(key)
+    if entry is None:
+        # Base principale : une entrée lue sur un réplica en retard
+        # resterait dans le cache après l'invalidation
+        with primary_reads():
+            last_modified, count = list_state(queryset)
+    else:
+        last_modified, count = entry['last_modified'], entry['count']
+    validators = state_validators(request, last_modified, count)
+    response = not_modified(request, validators)
+    if response is not None:
+        return response
+    if entry is None:
+        # Lecture seule : les lignes sont lues avec values() et sérialisées
+        # sans instancier les modèles
+        paginator = view.pagination_class(ordering)
+        with primary_reads():
+            page = paginator.paginate_queryset(
+                queryset.values(*values_fields(serializer_class)), request,
+                view=view
+            )
+        serializer = serializer_class(page, many=True)
+        entry = {
+            'last_modified': last_modified,
+            'count': count,
+            'data': paginator.get_paginated_data(serializer.data),
+        }
+        response_cache.set_entry(key, entry)
+        cache_status = 'MISS'
+    else:
+        cache_status = 'HIT'
+    response = add_validators(Response(entry['data']), validators)
+    response['X-Cache'] = cache_status
+    return response
+
+
+def contributors_prefetch():
+    # Seuls les ids des contributeurs sont sérialisés
+    return Prefetch('contributors', queryset=User.objects.only('id'))
+
+
 def get_object(pk, ressource_type):
     try:
         return ressource_type.objects.get(pk=pk)
@@ -150,28 +465,44 @@ class ProjectAPIView(APIView):
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated & IsAuthor | IsContributor | IsAdminUser]
 
+    def get_queryset(self, user):
+        # La jointure OR sur les contributeurs renvoie un projet par
+        # contributeur correspondant : on dédoublonne sur les ids dans une
+        # sous-requête puis on précharge les contributeurs en une requête
+        project_ids = Project.objects.filter(
+            Q(author=user) | Q(contributors=user)
+        ).values('id')
+        return Project.objects.filter(id__in=project_ids).order_by('id') \
+            .prefetch_related(contributors_prefetch())
+
     def get(self, request, pk=None, format=None):
         if pk is not None:
             project = get_object(pk, Project)
             self.check_object_permissions(request, project)
+            membership = get_membership(request, project.pk)
             if (
-                    request.user in project.contributors.all() or
-                    project.author == request.user or
-                    request.user.is_superuser
+                    not membership.is_contributor and
+                    not membership.is_author and
+                    not request.user.is_superuser
             ):
-                serializer = ProjectSerializer(project)
-            else:
                 return Response(
                     {"detail": "You don't have permissions."},
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            validators = instance_validators(request, project)
+            response = not_modified(request, validators)
+            if response is not None:
+                return response
+            prefetch_related_objects([project], contributors_prefetch())
+            serializer = ProjectSerializer(project)
         else:
-            user = request.user
-            projects = Project.objects.filter(
-                Q(author=user) | Q(contributors=user)
-            )
+            projects = self.get_queryset(request.user)
+            validators = list_validators(request, projects)
+            response = not_modified(request, validators)
+            if response is not None:
+                return response
             serializer = ProjectSerializer(projects, many=True)
-        return Response(serializer.data)
+        return add_validators(Response(serializer.data), validators)
 
     def post(self, request, format=None):
         data = request.data.copy()
@@ -204,6 +535,7 @@ class ProjectAPIView(APIView):
 
 class IssueAPIView(APIView):
     serializer_class = IssueSerializer
+    pagination_class = KeysetPagination
     permission_classes = [IsAuthenticated & IsContributor | IsAuthor | IsAdminUser]
 
     def get_queryset(self, pk):
@@ -215,26 +547,37 @@ class IssueAPIView(APIView):
             # Récupérer le ticket qui a pour projet le projet récupéré
             issue = get_object_or_404(Issue, pk=pk2, project=project)
             self.check_object_permissions(request, issue)
+            validators = instance_validators(request, issue)
+            response = not_modified(request, validators)
+            if response is not None:
+                return response
             serializer = IssueSerializer(issue)
-        else:
-            if (
-                    request.user not in project.contributors.all() and
-                    not request.user.is_superuser
-            ):
-                return Response({
-                    'message': 'You are not a collaborator of this project.'
-                })
-            issues = Issue.objects.filter(project=pk)
-            serializer = IssueSerializer(issues, many=True)
-        return Response(serializer.data)
+            return add_validators(Response(serializer.data), validators)
+        if (
+                not is_contributor(request, project.pk) and
+                not request.user.is_superuser
+        ):
+            return Response({
+                'message': 'You are not a collaborator of this project.'
+            })
+        filters = IssueFilterSerializer(data=request.query_params)
+        if not filters.is_valid():
+            return Response(filters.errors, status=status.HTTP_400_BAD_REQUEST)
+        return cached_list_response(
+            request, self,
+            self.get_queryset(pk).filter(**filters.get_filters()),
+            IssueSerializer, response_cache.ISSUES, project.pk,
+            ordering=filters.get_ordering()
+        )
 
     def post(self, request, pk, pk2=None, format=None):
         # Compléter les données avant de sérialiser
         project = get_object(pk, Project)
         self.check_object_permissions(request, project)
+        if isinstance(request.data, list):
+            return self.post_many(request, project)
         if "contributor" not in request.data:
             contributor = request.user.pk
-            print(contributor)
         else:
             contributor_username = request.data["contributor"]
             try:
@@ -253,6 +596,70 @@ class IssueAPIView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def post_many(self, request, project):
+        # Création d'une liste de tickets : une requête pour les noms
+        # d'utilisateurs, une pour l'appartenance au projet, puis un seul
+        # INSERT par lot dans une transaction
+        if len(request.data) > settings.ISSUE_BULK_MAX_ITEMS:
+            return Response(
+                {"message": f"At most {settings.ISSUE_BULK_MAX_ITEMS} "
+                            f"issues can be created at once."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = IssueBulkSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors,
+                            status=status.HTTP_400_BAD_REQUEST)
+        items = serializer.validated_data
+
+        usernames = {
+            item['contributor'] for item in items if 'contributor' in item
+        }
+        user_ids = dict(
+            User.objects.filter(username__in=usernames)
+            .values_list('username', 'id')
+        )
+        members = set(
+            Project.contributors.through.objects.filter(
+                project_id=project.pk,
+                user_id__in=user_ids.values()
+            ).values_list('user_id', flat=True)
+        )
+        errors, issues = [], []
+        for item in items:
+            username = item.pop('contributor', None)
+            if username is None:
+                contributor = request.user.pk
+            elif username not in user_ids:
+                errors.append({"contributor": ["username doesn't exist."]})
+                continue
+            elif user_ids[username] not in members:
+                errors.append({
+                    "contributor": ["User is not part of the project."]
+                })
+                continue
+            else:
+                contributor = user_ids[username]
+            errors.append({})
+            issues.append(Issue(
+                project=project,
+                author_id=request.user.pk,
+                contributor_id=contributor,
+                **item
+            ))
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            issues = Issue.objects.bulk_create(issues)
+            # bulk_create n'envoie pas les signaux des compteurs
+            apply_deltas(project.pk, issue_deltas(
+                (issue.status, issue.priority, issue.tag) for issue in issues
+            ))
+            response_cache.invalidate(response_cache.ISSUES, project.pk)
+        serializer = IssueSerializer(issues, many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
     def patch(self, request, pk, pk2, format=None):
         issue = get_object(pk2, Issue)
         self.check_object_permissions(request, issue)
@@ -272,6 +679,7 @@ class IssueAPIView(APIView):
 
 class CommentAPIView(APIView):
     serializer_class = CommentSerializer
+    pagination_class = KeysetPagination
     permission_classes = [IsAuthenticated & IsContributor | IsAuthor | IsAdminUser]
 
     def get_queryset(self, pk):
@@ -279,19 +687,26 @@ class CommentAPIView(APIView):
         return Comment.objects.filter(issue=pk)
 
     def get(self, request, pk, pk2=None, format=None):
-        issue = get_object(pk, Issue)
+        issue = get_object_or_404(
+            Issue.objects.select_related('project'), pk=pk
+        )
         project = issue.project
         self.check_object_permissions(request, project)
         if pk2 is not None:
             # Récupérer le ticket avec pk
             comment = get_object(pk2, Comment)
             self.check_object_permissions(request, comment)
+            validators = instance_validators(request, comment)
+            response = not_modified(request, validators)
+            if response is not None:
+                return response
             serializer = CommentSerializer(comment)
-        else:
-            # Affiche tous les commentaires d'un ticket
-            comments = Comment.objects.filter(issue=pk)
-            serializer = CommentSerializer(comments, many=True)
-        return Response(serializer.data)
+            return add_validators(Response(serializer.data), validators)
+        # Affiche tous les commentaires d'un ticket
+        return cached_list_response(
+            request, self, self.get_queryset(pk), CommentSerializer,
+            response_cache.COMMENTS, issue.pk
+        )
 
     def post(self, request, pk, format=None):
         # Compléter les données avant de sérialiser
@@ -330,6 +745,7 @@ class CommentAPIView(APIView):
 
 class UserTicketsAPIView(APIView):
     serializer_class = IssueSerializer
+    pagination_class = KeysetPagination
     permission_classes = [IsAuthenticated &
                           IsOwner | IsAdminUser]
 
@@ -338,8 +754,12 @@ class UserTicketsAPIView(APIView):
         return Issue.objects.filter(contributor=pk, project=pk2)
 
     def get(self, request, pk, pk2, format=None):
-        issues = Issue.objects.filter(contributor=pk, project=pk2)
         user = get_object(pk, User)
         self.check_object_permissions(request, user)
+        paginator = self.pagination_class()
+        issues = paginator.paginate_queryset(
+            self.get_queryset(pk, pk2).values(*values_fields(IssueSerializer)),
+            request, view=self
+        )
         serializer = IssueSerializer(issues, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
@@ -4,3 +4,15 @@ from django.apps import AppConfig
 class AuthenticationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'authentication'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import post_delete, post_save
+
+        from .backends import invalidate_user
+
+        # Utilisateur modifié ou supprimé : retiré du cache de
+        # l'authentification JWT
+        User = get_user_model()
+        post_save.connect(invalidate_user, sender=User)
+        post_delete.connect(invalidate_user, sender=User)
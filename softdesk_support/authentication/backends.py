@@ -0,0 +1,93 @@
+"""
+Authentification JWT avec un cache des utilisateurs en mémoire.
+
+JWTAuthentication vérifie la signature du jeton puis lit l'utilisateur en
+base à chaque requête. Ici l'utilisateur est gardé dans un cache LRU borné
+du processus, avec une durée de vie courte :
+- l'enregistrement ou la suppression d'un utilisateur le retire du cache
+  (signaux, authentication/apps.py) ;
+- la durée de vie borne le délai de prise en compte dans les autres
+  processus et pour les modifications sans signaux (QuerySet.update()).
+Un utilisateur supprimé ou désactivé est donc refusé au plus tard après
+USER_CACHE['TIMEOUT'] secondes, immédiatement dans le processus qui l'a
+modifié.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from softdesk_support.replicas import primary_reads
+
+
+class UserCache:
+    """
+    Bounded LRU cache of users by id, with a time to live
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires < time.monotonic():
+                del self._users[user_id]
+                return None
+            self._users.move_to_end(user_id)
+        # Chaque requête reçoit sa propre copie de l'utilisateur
+        return copy.copy(user)
+
+    def set(self, user):
+        with self._lock:
+            self._users[user.pk] = (
+                copy.copy(user), time.monotonic() + self.timeout
+            )
+            self._users.move_to_end(user.pk)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+
+    def delete(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache(
+    settings.USER_CACHE['MAX_SIZE'], settings.USER_CACHE['TIMEOUT']
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            return super().get_user(validated_token)
+        user = user_cache.get(user_id)
+        if user is None:
+            # Lecture en base : utilisateur inconnu ou inactif refusé,
+            # seuls les utilisateurs actifs sont mis en cache (lus sur la
+            # base principale)
+            with primary_reads():
+                user = super().get_user(validated_token)
+            user_cache.set(user)
+        return user
+
+
+def invalidate_user(sender, instance, **kwargs):
+    user_cache.delete(instance.pk)
@@ -0,0 +1,82 @@
+import time
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from authentication.models import User
+from authentication.views import LoginView
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare logins per second with and without a Django session. "
+        "The benchmark user and sessions are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=200)
+        parser.add_argument(
+            '--real-hasher', action='store_true',
+            help="Keep the configured password hasher (by default a fast "
+                 "hasher is used so the database work is what is measured)"
+        )
+
+    def handle(self, *args, **options):
+        if options['logins'] <= 0:
+            raise CommandError("--logins must be positive")
+        hashers = {} if options['real_hasher'] else {
+            'PASSWORD_HASHERS': [
+                'django.contrib.auth.hashers.MD5PasswordHasher'
+            ]
+        }
+        with override_settings(**hashers):
+            try:
+                with transaction.atomic():
+                    self.run(options['logins'])
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run(self, logins):
+        User.objects.create_user(
+            username='bench-login', password='bench-login', age=30,
+            can_be_contacted=False, can_data_be_shared=False
+        )
+        for label, creates_session in (
+                ('session', True),
+                ('token only', False),
+        ):
+            with override_settings(LOGIN_CREATES_SESSION=creates_session):
+                sessions = Session.objects.count()
+                elapsed, queries = self.measure(logins)
+                sessions = Session.objects.count() - sessions
+            self.stdout.write(
+                f"{label}: {logins / elapsed:.0f} logins/s, "
+                f"{queries / logins:.1f} queries/login, "
+                f"{sessions} session(s) created"
+            )
+
+    def measure(self, logins):
+        factory = APIRequestFactory()
+        # Sans limite de débit : toutes les connexions viennent du même client
+        view = LoginView.as_view(throttle_classes=[])
+        data = {'username': 'bench-login', 'password': 'bench-login'}
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            for _ in range(logins):
+                request = factory.post('/api/login/', data, format='json')
+                request.session = SessionStore()
+                response = view(request)
+                if response.status_code != 200:
+                    raise CommandError(f"Login failed: {response.data}")
+            elapsed = time.perf_counter() - start
+        return elapsed, len(queries)
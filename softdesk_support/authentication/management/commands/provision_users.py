@@ -0,0 +1,85 @@
+import csv
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from authentication.provisioning import provision_users
+
+BOOLEAN_VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+
+def read_users(path):
+    """
+    Users of a JSON file (list of objects) or of a CSV file with a header
+    """
+    with open(path, newline='', encoding='utf-8') as source:
+        if path.endswith('.json'):
+            return json.load(source)
+        users = []
+        for row in csv.DictReader(source):
+            # Cellules vides : champ absent, booléens écrits en texte
+            user = {key: value for key, value in row.items() if value != ''}
+            for key in ('can_be_contacted', 'can_data_be_shared'):
+                if key in user:
+                    user[key] = BOOLEAN_VALUES.get(
+                        user[key].lower(), user[key]
+                    )
+            users.append(user)
+        return users
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users from a JSON or CSV file, all of them or none: "
+        "uniqueness is checked in one query, passwords are hashed in a "
+        "process pool and users are inserted in bulk"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="JSON (.json) or CSV file")
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Password hashing processes (default: "
+                 "PASSWORD_HASH_WORKERS, else one per CPU)"
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.USER_BULK_MAX_ITEMS,
+            help="Users created per transaction"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            users = read_users(options['path'])
+        except (OSError, ValueError) as error:
+            raise CommandError(f"Cannot read {options['path']}: {error}")
+        if not isinstance(users, list):
+            raise CommandError("Expected a list of users.")
+        batch_size = max(options['batch_size'], 1)
+        created = 0
+        start = time.perf_counter()
+        for offset in range(0, len(users), batch_size):
+            errors, batch = provision_users(
+                users[offset:offset + batch_size], options['workers']
+            )
+            if errors:
+                self.report(errors, offset)
+                raise CommandError(
+                    f"Invalid users, {created} user(s) created before "
+                    f"the failing batch."
+                )
+            created += len(batch)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} user(s) created in {elapsed:.1f}s."
+        ))
+
+    def report(self, errors, offset):
+        if isinstance(errors, dict):
+            # Lot entier refusé (pas une liste)
+            self.stderr.write(json.dumps(errors))
+            return
+        for index, error in enumerate(errors, offset + 1):
+            if error:
+                self.stderr.write(f"User {index}: {json.dumps(error)}")
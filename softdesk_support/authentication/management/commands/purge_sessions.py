@@ -0,0 +1,48 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored sessions in small batches: expired ones by default, "
+        "or all of them (sessions created by API logins) with --all"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Delete every session (logs out browsable API users)"
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--pause', type=float, default=0,
+            help="Seconds to wait between batches, to let other writers in"
+        )
+
+    def handle(self, *args, **options):
+        sessions = Session.objects.all()
+        if not options['all']:
+            sessions = sessions.filter(expire_date__lt=timezone.now())
+        batch_size = max(options['batch_size'], 1)
+        deleted = 0
+        while True:
+            # Lots courts : le verrou d'écriture (SQLite) est relâché entre
+            # deux lots
+            with transaction.atomic():
+                keys = list(
+                    sessions.values_list('session_key', flat=True)
+                    [:batch_size]
+                )
+                if not keys:
+                    break
+                Session.objects.filter(session_key__in=keys).delete()
+            deleted += len(keys)
+            if options['pause']:
+                time.sleep(options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{deleted} session(s) deleted."
+        ))
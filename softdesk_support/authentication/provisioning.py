@@ -0,0 +1,147 @@
+"""
+Création d'utilisateurs en masse (POST /api/users/bulk/ et commande
+provision_users).
+
+Le lot est validé sans requête par élément, les noms d'utilisateur et les
+emails sont normalisés comme par create_user() puis leur unicité est
+vérifiée en une seule requête, les mots de passe sont hachés en parallèle
+dans un pool de processus (PBKDF2 occupe un cœur pendant toute la durée du
+hachage) puis les utilisateurs sont insérés avec bulk_create.
+
+Le pool est créé au premier lot parallèle de chaque processus puis gardé
+pour les suivants : une requête ne démarre pas de processus.
+"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Q
+
+from .models import User
+from .serializers import UserBulkSerializer
+
+# En dessous, l'envoi au pool coûte plus que le hachage
+PARALLEL_MIN_PASSWORDS = 8
+
+# Pool partagé du processus : (nombre de processus, pool)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _setup_worker():
+    # Processus démarrés sans copie du parent (méthode spawn)
+    os.environ.setdefault(
+        'DJANGO_SETTINGS_MODULE', 'softdesk_support.settings'
+    )
+    django.setup()
+
+
+def get_pool(workers):
+    """
+    Process pool of `workers` processes, kept for the next batches
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool[0] != workers:
+            _pool[1].shutdown(wait=False)
+            _pool = None
+        if _pool is None:
+            _pool = (workers, ProcessPoolExecutor(
+                workers, initializer=_setup_worker
+            ))
+        return _pool[1]
+
+
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool[1] is pool:
+            _pool = None
+
+
+def hash_passwords(passwords, workers=None):
+    """
+    Hash passwords with the configured hasher, in a process pool of
+    `workers` processes (PASSWORD_HASH_WORKERS or one per CPU by default)
+    """
+    workers = workers or settings.PASSWORD_HASH_WORKERS or os.cpu_count()
+    if workers <= 1 or len(passwords) < PARALLEL_MIN_PASSWORDS:
+        return [make_password(password) for password in passwords]
+    pool = get_pool(workers)
+    try:
+        return list(pool.map(
+            make_password, passwords,
+            chunksize=max(1, len(passwords) // (workers * 4))
+        ))
+    except BrokenProcessPool:
+        # Processus arrêté : un nouveau pool pour le lot suivant
+        _discard_pool(pool)
+        raise
+
+
+def normalize(items):
+    for item in items:
+        item['username'] = User.normalize_username(item['username'])
+        if item.get('email'):
+            item['email'] = User.objects.normalize_email(item['email'])
+
+
+def find_conflicts(items):
+    """
+    Per item errors for usernames and emails that are already used, in the
+    database (one query) or earlier in the batch
+    """
+    usernames = [item['username'] for item in items]
+    emails = [item['email'] for item in items if item.get('email')]
+    taken_usernames, taken_emails = set(), set()
+    for username, email in User.objects.filter(
+            Q(username__in=usernames) | Q(email__in=emails)
+    ).values_list('username', 'email'):
+        taken_usernames.add(username)
+        if email:
+            taken_emails.add(email)
+
+    errors = []
+    for item in items:
+        error = {}
+        if item['username'] in taken_usernames:
+            error['username'] = ['A user with that username already exists.']
+        if item.get('email') and item['email'] in taken_emails:
+            error['email'] = ['An account with this email already exists.']
+        taken_usernames.add(item['username'])
+        if item.get('email'):
+            taken_emails.add(item['email'])
+        errors.append(error)
+    return errors
+
+
+def provision_users(data, workers=None):
+    """
+    Create the users described by `data` (a list of dicts).
+    Returns (errors, users): per item errors and no user if an item is
+    invalid, else no errors and the created users.
+    """
+    serializer = UserBulkSerializer(data=data, many=True)
+    if not serializer.is_valid():
+        return serializer.errors, []
+    items = serializer.validated_data
+    normalize(items)
+    errors = find_conflicts(items)
+    if any(errors):
+        return errors, []
+
+    passwords = hash_passwords(
+        [item.pop('password') for item in items], workers
+    )
+    users = [
+        User(password=password, **item)
+        for item, password in zip(items, passwords)
+    ]
+    with transaction.atomic():
+        users = User.objects.bulk_create(users)
+    return None, users
@@ -1,3 +1,4 @@
+from django.contrib.auth.validators import UnicodeUsernameValidator
 from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer, CharField
 
@@ -76,3 +77,27 @@ class SignUpSerializer(ModelSerializer):
             can_be_contacted=data['can_be_contacted']
         )
         return user
+
+
+class UserBulkSerializer(ModelSerializer):
+    # Éléments d'une création en masse : l'unicité des noms d'utilisateur
+    # et des emails est vérifiée pour tout le lot en une seule requête
+    # (authentication/provisioning.py), pas par élément
+    username = CharField(
+        max_length=150, validators=[UnicodeUsernameValidator()]
+    )
+    password = CharField(write_only=True, style={"input_type": "password"})
+
+    class Meta:
+        model = User
+        fields = [
+            'id',
+            'username',
+            'email',
+            'password',
+            'first_name',
+            'last_name',
+            'age',
+            'can_be_contacted',
+            'can_data_be_shared'
+        ]
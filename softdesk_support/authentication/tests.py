@@ -1,11 +1,33 @@
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.hashers import check_password
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.models import Q
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse_lazy
+from django.utils import timezone
 from rest_framework.test import APITestCase
 
+from api.models import Project
+from api.tests import TEST_CACHES
+
+from .backends import UserCache, user_cache
 from .models import User
+from . import provisioning
+from .provisioning import hash_passwords
 
 
+@override_settings(CACHES=TEST_CACHES)
 class SupportAPITestCase(APITestCase):
 
     @classmethod
@@ -53,6 +75,9 @@ class SupportAPITestCase(APITestCase):
             can_data_be_shared=True
         )
 
+    def setUp(self):
+        caches['throttle'].clear()
+
     def format_datetime(self, value):
         return value.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
 
@@ -330,3 +355,291 @@ class TestUser(SupportAPITestCase):
         self.assertEqual(response.status_code, 204)
 
         self.assertFalse(User.objects.filter(username="user1").exists())
+
+
+class TestCachedAuthentication(SupportAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        user_cache.clear()
+        response = self.client.post(
+            '/api/login/', data={"username": "user1", "password": "user1"}
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Bearer {response.json()["access"]}'
+        )
+        self.url = f'/api/users/{self.user.pk}/'
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, len(queries)
+
+    def test_user_is_read_once(self):
+        response, first = self.count_queries()
+        self.assertEqual(response.status_code, 200)
+        response, second = self.count_queries()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(second, first - 1)
+
+    def test_save_invalidates(self):
+        self.count_queries()
+        User.objects.filter(pk=self.user.pk).update(first_name="changed")
+        user = User.objects.get(pk=self.user.pk)
+        user.save()
+        _, queries = self.count_queries()
+        response, cached = self.count_queries()
+        self.assertEqual(queries, cached + 1)
+
+    def test_deleted_user_is_refused(self):
+        self.count_queries()
+        User.objects.get(pk=self.user.pk).delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_lru_and_timeout(self):
+        cache = UserCache(max_size=2, timeout=60)
+        for user in (self.admin, self.user, self.author):
+            cache.set(user)
+        self.assertIsNone(cache.get(self.admin.pk))
+        self.assertEqual(cache.get(self.author.pk), self.author)
+        self.assertIsNot(cache.get(self.author.pk), cache.get(self.author.pk))
+        expired = UserCache(max_size=2, timeout=-1)
+        expired.set(self.user)
+        self.assertIsNone(expired.get(self.user.pk))
+
+
+class TestLogin(SupportAPITestCase):
+
+    def login(self):
+        response = self.client.post(
+            '/api/login/', data={"username": "user1", "password": "user1"}
+        )
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_no_session(self):
+        self.login()
+        self.assertFalse(Session.objects.exists())
+        self.assertIsNotNone(User.objects.get(pk=self.user.pk).last_login)
+
+    @override_settings(LOGIN_CREATES_SESSION=True)
+    def test_session_mode(self):
+        self.login()
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_last_login_is_throttled(self):
+        self.login()
+        last_login = User.objects.get(pk=self.user.pk).last_login
+        with CaptureQueriesContext(connection) as queries:
+            self.login()
+        # Lecture de l'utilisateur seulement
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            User.objects.get(pk=self.user.pk).last_login, last_login
+        )
+        User.objects.filter(pk=self.user.pk).update(
+            last_login=timezone.now() - timedelta(days=1)
+        )
+        self.login()
+        self.assertGreater(
+            User.objects.get(pk=self.user.pk).last_login, last_login
+        )
+
+    def test_purge_sessions(self):
+        for expiry in (-60, -60, 3600):
+            session = SessionStore()
+            session.set_expiry(expiry)
+            session.create()
+        out = StringIO()
+        call_command('purge_sessions', batch_size=1, stdout=out)
+        self.assertIn('2 session(s) deleted', out.getvalue())
+        call_command('purge_sessions', all=True, stdout=out)
+        self.assertFalse(Session.objects.exists())
+
+    def test_bench_login(self):
+        out = StringIO()
+        call_command('bench_login', logins=2, stdout=out)
+        self.assertIn('token only', out.getvalue())
+        self.assertFalse(User.objects.filter(username='bench-login').exists())
+
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.MD5PasswordHasher'
+])
+class TestProvisioning(SupportAPITestCase):
+
+    url = '/api/users/bulk/'
+
+    def authenticate_admin(self):
+        # IsAdminUser : membre de l'équipe (is_staff)
+        self.admin.is_staff = True
+        self.admin.save()
+        self.client.force_authenticate(self.admin)
+
+    def new_users(self, count, prefix='bulk'):
+        return [
+            {
+                'username': f'{prefix}{n}',
+                'password': f'{prefix}{n}',
+                'email': f'{prefix}{n}@support.fr',
+                'age': 30,
+                'can_be_contacted': False,
+                'can_data_be_shared': True
+            }
+            for n in range(count)
+        ]
+
+    def test_bulk_create(self):
+        self.authenticate_admin()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                self.url, self.new_users(20), format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()), 20)
+        self.assertEqual(response.json()[0]['username'], 'bulk0')
+        # Unicité vérifiée en une requête, insertion en une requête
+        self.assertEqual(
+            len([q for q in queries if 'INSERT' in q['sql']]), 1
+        )
+        user = User.objects.get(username='bulk7')
+        self.assertTrue(user.check_password('bulk7'))
+        self.assertEqual(response.json()[7]['id'], user.pk)
+
+    def test_conflicts_create_nothing(self):
+        self.authenticate_admin()
+        users = self.new_users(3)
+        users[1]['username'] = 'user1'
+        users[2]['email'] = users[0]['email']
+        response = self.client.post(self.url, users, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertEqual(errors[0], {})
+        self.assertIn('username', errors[1])
+        self.assertIn('email', errors[2])
+        self.assertFalse(User.objects.filter(username='bulk0').exists())
+
+    def test_invalid_items(self):
+        self.authenticate_admin()
+        users = self.new_users(2)
+        users[1]['age'] = 5
+        response = self.client.post(self.url, users, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('age', response.json()[1])
+        response = self.client.post(self.url, users[0], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(USER_BULK_MAX_ITEMS=2)
+    def test_limit_and_permissions(self):
+        self.authenticate_admin()
+        response = self.client.post(
+            self.url, self.new_users(3), format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            self.url, self.new_users(1), format='json'
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_hash_in_process_pool(self):
+        passwords = [f'password{n}' for n in range(10)]
+        hashes = hash_passwords(passwords, workers=2)
+        self.assertEqual(len(hashes), 10)
+        for password, encoded in zip(passwords, hashes):
+            self.assertTrue(check_password(password, encoded))
+        # Pool gardé pour les lots suivants
+        pool = provisioning.get_pool(2)
+        hash_passwords(passwords, workers=2)
+        self.assertIs(provisioning.get_pool(2), pool)
+
+    def test_normalized_conflicts(self):
+        self.authenticate_admin()
+        User.objects.create_user(
+            username='bulk0', email='bulk0@support.fr', password='bulk0',
+            age=30, can_be_contacted=False, can_data_be_shared=False
+        )
+        users = self.new_users(3)
+        # Même nom après normalisation NFKC, domaine en majuscules
+        users[0]['username'] = '\uff42ulk0'
+        users[1]['email'] = 'bulk0@SUPPORT.FR'
+        users[2]['email'] = 'bulk2@Support.Fr'
+        response = self.client.post(self.url, users, format='json')
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()
+        self.assertIn('username', errors[0])
+        self.assertIn('email', errors[1])
+        self.assertEqual(errors[2], {})
+        response = self.client.post(self.url, users[2:], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(User.objects.get(username='bulk2').email,
+                         'bulk2@support.fr')
+
+    def test_provision_users_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'users.csv')
+            with open(path, 'w', newline='') as file:
+                file.write(
+                    'username,password,email,age,can_be_contacted,'
+                    'can_data_be_shared\n'
+                    'csv1,csv1,,20,true,false\n'
+                    'csv2,csv2,csv2@support.fr,40,0,1\n'
+                )
+            out = StringIO()
+            call_command(
+                'provision_users', path, workers=1, batch_size=1, stdout=out
+            )
+            self.assertIn('2 user(s) created', out.getvalue())
+            self.assertTrue(User.objects.get(username='csv1').can_be_contacted)
+            with self.assertRaises(CommandError):
+                call_command('provision_users', path, stderr=StringIO())
+
+
+class TestUserQueryBudget(SupportAPITestCase):
+    # Même nombre de requêtes pour 10 et 1000 lignes (aucun N+1)
+
+    def create_users(self, prefix, count):
+        # Utilisateurs membres chacun d'un projet avec deux contributeurs
+        users = User.objects.bulk_create([
+            User(username=f'{prefix}-{i}', age=30, can_be_contacted=False,
+                 can_data_be_shared=False)
+            for i in range(count)
+        ])
+        projects = Project.objects.bulk_create([
+            Project(author=user, name='p', description='d',
+                    type=Project.BACK_END)
+            for user in users
+        ])
+        through = Project.contributors.through
+        through.objects.bulk_create([
+            through(project_id=project.pk, user_id=user_id)
+            for project in projects
+            for user_id in (project.author_id, self.collaborator.pk)
+        ])
+        return projects
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_list(self):
+        self.client.force_authenticate(self.admin)
+        counts = []
+        for prefix, count in (('small', 10), ('large', 1000)):
+            self.create_users(prefix, count)
+            counts.append(self.count_queries('/api/users/?limit=100'))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_retrieve(self):
+        self.client.force_authenticate(self.collaborator)
+        counts = []
+        for prefix, count in (('small', 10), ('large', 1000)):
+            # Le collaborateur est membre de tous les projets créés
+            self.create_users(prefix, count)
+            counts.append(
+                self.count_queries(f'/api/users/{self.collaborator.pk}/')
+            )
+        self.assertEqual(counts[0], counts[1])
@@ -1,13 +1,22 @@
+from django.conf import settings
 from django.contrib.auth import authenticate, login
+from django.db.models import Prefetch, Q
+from django.utils import timezone
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ViewSet
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework import status
 from .permissions import IsOwner
+from .provisioning import provision_users
+from api.throttling import LoginIPThrottle, LoginUsernameThrottle, \
+    SignUpIPThrottle
 
 from .models import User
 from .serializers import UserSerializer
+from api.models import Project
+from api.views import contributors_prefetch
 from rest_framework_simplejwt.tokens import RefreshToken
 from .serializers import SignUpSerializer
 
@@ -21,6 +30,28 @@ def get_tokens_for_user(user):
     }
 
 
+def projects_prefetch():
+    # Projets des utilisateurs et leurs contributeurs (UserSerializer) :
+    # deux requêtes quel que soit le nombre d'utilisateurs et de projets
+    return Prefetch(
+        'projects',
+        queryset=Project.objects.prefetch_related(contributors_prefetch())
+    )
+
+
+def update_last_login(user):
+    # Une écriture au plus par LAST_LOGIN_UPDATE_INTERVAL et par
+    # utilisateur : les connexions répétées n'écrivent pas en base
+    now = timezone.now()
+    threshold = now - settings.LAST_LOGIN_UPDATE_INTERVAL
+    if user.last_login is not None and user.last_login >= threshold:
+        return
+    User.objects.filter(pk=user.pk).filter(
+        Q(last_login__isnull=True) | Q(last_login__lt=threshold)
+    ).update(last_login=now)
+    user.last_login = now
+
+
 class UserViewSet(ModelViewSet):
 
     serializer_class = UserSerializer
@@ -28,13 +59,15 @@ class UserViewSet(ModelViewSet):
 
     def get_queryset(self):
         if self.request.user.is_superuser:
-            return User.objects.all()
+            return User.objects.order_by('id') \
+                .prefetch_related(projects_prefetch())
         else:
             return User.objects.none()
 
     def retrieve(self, request, pk=None):
         try:
-            user = User.objects.get(pk=pk)
+            user = User.objects.prefetch_related(projects_prefetch()) \
+                .get(pk=pk)
             self.check_object_permissions(request, user)
             serializer = self.get_serializer(user)
             return Response(serializer.data)
@@ -44,7 +77,8 @@ class UserViewSet(ModelViewSet):
 
     def partial_update(self, request, pk=None):
         try:
-            user = User.objects.get(pk=pk)
+            user = User.objects.prefetch_related(projects_prefetch()) \
+                .get(pk=pk)
             self.check_object_permissions(request, user)
             serializer = self.get_serializer(
                 user,
@@ -62,6 +96,33 @@ class UserViewSet(ModelViewSet):
             return Response({"detail": "User not found."},
                             status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=False, methods=['post'], url_path='bulk',
+            permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        # Création d'utilisateurs en masse : tout le lot ou rien
+        if not isinstance(request.data, list):
+            return Response(
+                {'message': 'Expected a list of users.'},
+                status.HTTP_400_BAD_REQUEST
+            )
+        if len(request.data) > settings.USER_BULK_MAX_ITEMS:
+            return Response(
+                {'message': f'At most {settings.USER_BULK_MAX_ITEMS} users '
+                            f'can be created at once.'},
+                status.HTTP_400_BAD_REQUEST
+            )
+        errors, users = provision_users(request.data)
+        if errors:
+            return Response(errors, status.HTTP_400_BAD_REQUEST)
+        return Response(
+            [
+                {'id': user.pk, 'username': user.username,
+                 'email': user.email}
+                for user in users
+            ],
+            status.HTTP_201_CREATED
+        )
+
     def destroy(self, request, pk=None):
         try:
             user = User.objects.get(pk=pk)
@@ -76,6 +137,7 @@ class UserViewSet(ModelViewSet):
 class SignUpView(ViewSet):
 
     serializer_class = SignUpSerializer
+    throttle_classes = [SignUpIPThrottle]
 
     def create(self, request, *args, **kwargs):
         # Sérialiser les données récupérées dans le corps de la requête
@@ -99,6 +161,7 @@ class SignUpView(ViewSet):
 
 
 class LoginView(APIView):
+    throttle_classes = [LoginIPThrottle, LoginUsernameThrottle]
 
     def post(self, request):
         if 'username' not in request.data or 'password' not in request.data:
@@ -114,8 +177,14 @@ class LoginView(APIView):
                 {'message': 'Credentials are invalid.'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
-        login(request, user)
-        tokens = get_tokens_for_user(request.user)
+        if settings.LOGIN_CREATES_SESSION:
+            # Session Django (interface navigable de l'API)
+            login(request, user)
+        else:
+            # Jetons seulement : pas de session ni d'écriture à chaque
+            # connexion
+            update_last_login(user)
+        tokens = get_tokens_for_user(user)
         return Response(
             {'message': 'Successfully logged', **tokens},
             status=status.HTTP_200_OK
@@ -0,0 +1,162 @@
+"""
+Mesure des requêtes SQL de chaque requête HTTP (SQL_INSTRUMENTATION dans
+settings.py).
+
+QueryInstrumentationMiddleware enregistre, sur toutes les bases, le nombre
+de requêtes SQL, leur durée totale et les plus lentes. Chaque connexion a
+un execute_wrapper permanent qui passe les requêtes SQL à l'enregistreur
+de la requête HTTP courante (variable de contexte) : en ASGI, les requêtes
+HTTP simultanées partagent le thread de sync_to_async et ses connexions,
+mais chacune a son contexte. Il les renvoie dans
+les en-têtes Server-Timing et X-Query-Count (si HEADERS) et écrit une
+ligne JSON dans le journal softdesk_support.sql pour les requêtes HTTP qui
+dépassent un des seuils. Désactivé, il est retiré de la chaîne des
+middlewares (aucun coût).
+"""
+import heapq
+import json
+import logging
+import time
+from contextvars import ContextVar
+from itertools import count
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger('softdesk_support.sql')
+
+# Longueur maximale d'une requête SQL dans le journal
+MAX_SQL_LENGTH = 500
+
+# Enregistreur de la requête HTTP en cours (None : aucune mesure)
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+class QueryRecorder:
+    """
+    Execute wrapper counting the queries, their total time and keeping the
+    `slowest` slowest ones
+    """
+
+    def __init__(self, slowest):
+        self.slowest = slowest
+        self.count = 0
+        self.duration = 0.0
+        self.queries = []
+        # Départage des requêtes de même durée dans le tas
+        self.order = count()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if self.slowest:
+                # Tas des plus lentes : la plus rapide est remplacée
+                item = (duration, next(self.order), sql)
+                if len(self.queries) < self.slowest:
+                    heapq.heappush(self.queries, item)
+                else:
+                    heapq.heappushpop(self.queries, item)
+
+    def slowest_queries(self):
+        return [
+            {'sql': sql[:MAX_SQL_LENGTH], 'ms': round(duration * 1000, 2)}
+            for duration, _, sql in sorted(self.queries, reverse=True)
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_wrapper(connection, **kwargs):
+    # Premier de la liste : les execute_wrapper() temporaires retirent le
+    # dernier élément en sortie
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+class QueryInstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.options = settings.SQL_INSTRUMENTATION
+        if not self.options['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connexions déjà créées dans ce thread, puis toutes les suivantes
+        # (chaque thread a les siennes)
+        for alias in connections:
+            install_wrapper(connections[alias])
+        connection_created.connect(
+            install_wrapper, dispatch_uid='softdesk_support.instrumentation'
+        )
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder = QueryRecorder(self.options['SLOWEST_QUERIES'])
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.report(request, response, recorder,
+                           time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder(self.options['SLOWEST_QUERIES'])
+        # Copié dans le contexte des appels sync_to_async de cette requête
+        # HTTP seulement
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        return self.report(request, response, recorder,
+                           time.perf_counter() - start)
+
+    def report(self, request, response, recorder, duration):
+        if self.options['HEADERS']:
+            response['X-Query-Count'] = str(recorder.count)
+            response['Server-Timing'] = (
+                f'db;dur={recorder.duration * 1000:.2f};'
+                f'desc="{recorder.count} queries", '
+                f'app;dur={duration * 1000:.2f}'
+            )
+        if self.is_slow(recorder, duration):
+            logger.warning(json.dumps({
+                'event': 'slow_request',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration * 1000, 2),
+                'query_count': recorder.count,
+                'sql_ms': round(recorder.duration * 1000, 2),
+                'slowest_queries': recorder.slowest_queries(),
+            }))
+        return response
+
+    def is_slow(self, recorder, duration):
+        options = self.options
+        return (
+            duration * 1000 > options['SLOW_REQUEST_MS'] or
+            recorder.duration * 1000 > options['SLOW_SQL_MS'] or
+            recorder.count > options['MAX_QUERIES']
+        )
@@ -0,0 +1,174 @@
+"""
+Lectures sur des réplicas de la base (DATABASE_REPLICAS dans settings.py).
+
+ReplicaMiddleware choisit un réplica pour chaque requête GET, HEAD ou
+OPTIONS et ReplicaRouter y envoie ses lectures. Les écritures, les
+lectures des autres requêtes, celles faites dans une transaction et celles
+du code hors requête (commandes) vont sur la base principale, de même que
+les lectures qui remplissent les caches partagés (primary_reads()).
+
+Un client qui vient d'écrire lit ses propres écritures : après une
+requête d'écriture, les lectures du même client vont sur la base
+principale pendant REPLICA_STICKY_SECONDS, délai qui doit dépasser celui
+de la synchronisation des réplicas (commande sync_replicas). Le client est
+identifié par l'utilisateur de son jeton (tous ses jetons, quelle que soit
+son adresse), sinon par son cookie de session ; seules les requêtes
+anonymes le sont par leur adresse IP (NUM_PROXIES, comme les limites de
+débit). L'état est gardé dans le cache REPLICA_STICKY_CACHE_ALIAS partagé
+entre les processus.
+"""
+import hashlib
+import random
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+from rest_framework.throttling import BaseThrottle
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Réplica des lectures de la requête en cours, None pour la base principale
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def read_alias():
+    return _read_alias.get()
+
+
+@contextmanager
+def primary_reads():
+    """
+    Send the reads of the block to the primary database
+    """
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Mêmes données sur toutes les bases
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Les réplicas sont des copies de la base principale
+        return db == DEFAULT_DB_ALIAS
+
+
+def _token_user_id(request):
+    # Jeton vérifié sans lecture de la base : un jeton invalide sera refusé
+    # par la vue, la requête est traitée comme anonyme
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = header and authentication.get_raw_token(header)
+    if not raw_token:
+        return None
+    try:
+        token = authentication.get_validated_token(raw_token)
+        return token[api_settings.USER_ID_CLAIM]
+    except (InvalidToken, KeyError):
+        return None
+
+
+def _digest(value):
+    return hashlib.md5(value.encode(), usedforsecurity=False).hexdigest()
+
+
+def client_key(request):
+    """
+    Sticky cache key of the client of a request: its user, its session,
+    or its address for anonymous requests (None if unknown)
+    """
+    user_id = _token_user_id(request)
+    if user_id is not None:
+        return f'replicas:sticky:user:{user_id}'
+    session = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if session:
+        return f'replicas:sticky:session:{_digest(session)}'
+    address = BaseThrottle().get_ident(request)
+    if address:
+        return f'replicas:sticky:ip:{_digest(address)}'
+    return None
+
+
+class ReplicaMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cache = caches[settings.REPLICA_STICKY_CACHE_ALIAS]
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def choose(self, request, sticky):
+        if request.method not in READ_METHODS or sticky:
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        key = client_key(request)
+        sticky = request.method in READ_METHODS and key is not None and \
+            self.cache.get(key, False)
+        token = _read_alias.set(self.choose(request, sticky))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        if request.method not in READ_METHODS and key is not None:
+            self.cache.set(key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        key = client_key(request)
+        sticky = request.method in READ_METHODS and key is not None and \
+            await self.cache.aget(key, False)
+        token = _read_alias.set(self.choose(request, sticky))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        if request.method not in READ_METHODS and key is not None:
+            await self.cache.aset(key, True, settings.REPLICA_STICKY_SECONDS)
+        return response
+
+
+def copy_database(path, pages=-1):
+    """
+    Copy the primary database into the SQLite file `path` with the backup
+    API (consistent copy, readers of the replica see the old or the new
+    version)
+    """
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    with primary.wrap_database_errors:
+        target = sqlite3.connect(path)
+        try:
+            primary.connection.backup(target, pages=pages)
+        finally:
+            target.close()
@@ -9,9 +9,13 @@ https://docs.djangoproject.com/en/4.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
+import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -47,8 +51,23 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 5,
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.backends.CachedJWTAuthentication',
+    ),
+    # Seaux à jetons (api/throttling.py) : "capacité/période".
+    # Les vues de connexion et d'inscription ont leurs propres limites.
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.WriteThrottle',
     ),
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '30/min',
+        'login_username': '10/min',
+        'signup_ip': '20/hour',
+        'write': '120/min',
+    },
+    # Nombre de proxys devant le serveur : l'adresse IP des limites par
+    # adresse est lue dans X-Forwarded-For à cette position. 0 : REMOTE_ADDR
+    # seulement (l'en-tête est choisi par le client).
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '0')),
 }
 
 SIMPLE_JWT = {
@@ -56,9 +75,53 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
 }
 
+# POST /api/login/ renvoie des jetons JWT sans créer de session Django.
+# True : crée aussi une session (login()), par exemple pour l'interface
+# navigable de l'API.
+LOGIN_CREATES_SESSION = False
+# Intervalle minimal entre deux mises à jour de User.last_login lors des
+# connexions sans session
+LAST_LOGIN_UPDATE_INTERVAL = timedelta(minutes=15)
+
+# Cache des utilisateurs authentifiés par jeton, par processus
+# (authentication/backends.py) : nombre d'utilisateurs et durée de vie en
+# secondes, qui borne le délai de prise en compte d'une désactivation dans
+# les autres processus
+USER_CACHE = {
+    'MAX_SIZE': 10000,
+    'TIMEOUT': 60,
+}
+
+# Mesure des requêtes SQL par requête HTTP (softdesk_support/instrumentation.py),
+# activée par la variable d'environnement SQL_INSTRUMENTATION (par défaut
+# avec DEBUG). HEADERS : en-têtes Server-Timing et X-Query-Count.
+# Une requête qui dépasse un des seuils (durée totale, durée SQL en
+# millisecondes, nombre de requêtes SQL) est écrite dans le journal
+# softdesk_support.sql avec ses SLOWEST_QUERIES requêtes SQL les plus lentes.
+SQL_INSTRUMENTATION = {
+    'ENABLED': os.environ.get(
+        'SQL_INSTRUMENTATION', '1' if DEBUG else '0'
+    ) == '1',
+    'HEADERS': DEBUG,
+    'SLOW_REQUEST_MS': 500,
+    'SLOW_SQL_MS': 200,
+    'MAX_QUERIES': 50,
+    'SLOWEST_QUERIES': 3,
+}
+
+# Création d'utilisateurs en masse (POST /api/users/bulk/, commande
+# provision_users) : nombre maximal d'utilisateurs par requête et nombre de
+# processus qui hachent les mots de passe (None : un par cœur)
+USER_BULK_MAX_ITEMS = 5000
+PASSWORD_HASH_WORKERS = None
+
 
 MIDDLEWARE = [
+    # Premier : mesure aussi les requêtes SQL des autres middlewares
+    'softdesk_support.instrumentation.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Choix de la base des lectures (sans effet sans réplica)
+    'softdesk_support.replicas.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -94,10 +157,140 @@ WSGI_APPLICATION = 'softdesk_support.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+    }
+}
+
+# Profil de la base choisi par la variable d'environnement DATABASE_PROFILE :
+# - 'development' (défaut) : configuration SQLite de Django ;
+# - 'production' : moteur softdesk_support/sqlite (pragmas, BEGIN IMMEDIATE,
+#   reprise des écritures bloquées) et connexions persistantes.
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'development')
+
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'ENGINE': 'softdesk_support.sqlite',
+        # Connexion gardée entre les requêtes, vérifiée avant réutilisation
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Attente du verrou d'écriture (secondes)
+            'timeout': 5,
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                # Valeur négative : taille en Kio (64 Mio)
+                'cache_size': -64000,
+                'mmap_size': 256 * 1024 * 1024,
+                'temp_store': 'MEMORY',
+            },
+            # Reprises d'un BEGIN ou d'une requête hors transaction après
+            # "database is locked", attente initiale en secondes
+            'lock_retries': 5,
+            'lock_retry_delay': 0.05,
+        },
+    })
+elif DATABASE_PROFILE != 'development':
+    raise ImproperlyConfigured(
+        f"Unknown DATABASE_PROFILE {DATABASE_PROFILE!r}"
+    )
+
+# Réplicas en lecture (softdesk_support/replicas.py) : fichiers SQLite
+# séparés par des virgules dans DATABASE_REPLICAS, copies de la base
+# principale tenues à jour par la commande sync_replicas.
+# Pendant les tests, ils désignent la base de test principale.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = [
+    'softdesk_support.replicas.ReplicaRouter'
+] if DATABASE_REPLICAS else []
+
+# Durée (secondes) pendant laquelle un client lit la base principale après
+# une écriture : supérieure au délai de synchronisation des réplicas
+REPLICA_STICKY_SECONDS = 10
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'softdesk-default',
+    },
+    # Réponses des listes de tickets et de commentaires (api/response_cache.py),
+    # partagées entre les processus d'une même machine pour que les
+    # invalidations les atteignent tous
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'RESPONSE_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'softdesk-responses')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Seaux des limites de débit (api/throttling.py), partagés entre les
+    # processus d'une même machine
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'THROTTLE_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'softdesk-throttle')
+        ),
+    },
+    # Appartenance aux projets (api/membership.py), partagée entre les
+    # processus d'une même machine
+    'membership': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'MEMBERSHIP_CACHE_DIR',
+            os.path.join(tempfile.gettempdir(), 'softdesk-membership')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
 }
 
+THROTTLE_CACHE_ALIAS = 'throttle'
+# Clients qui viennent d'écrire (softdesk_support/replicas.py), dans un
+# cache partagé entre les processus
+REPLICA_STICKY_CACHE_ALIAS = 'throttle'
+
+# Appartenance d'un utilisateur à un projet (api/membership.py), dans un
+# cache partagé entre les processus pour que les invalidations les
+# atteignent tous. La durée de conservation (en secondes) borne le retard
+# des processus qui ne partagent pas le cache (autres machines).
+MEMBERSHIP_CACHE_ALIAS = 'membership'
+MEMBERSHIP_CACHE_TIMEOUT = 30
+
+
+# Cache des réponses des listes de tickets et de commentaires
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = 300
+
+# Nombre maximal de tickets créés par une requête
+# POST /api/projects/<pk>/issues avec une liste
+ISSUE_BULK_MAX_ITEMS = 5000
+
+# Nombre de lignes lues par requête lors de l'export d'un projet
+EXPORT_CHUNK_SIZE = 2000
+
+# Taille (octets) au-delà de laquelle l'export d'un projet est écrit sur
+# disque avant son envoi plutôt que gardé en mémoire
+EXPORT_SPOOL_MAX_SIZE = 10 * 1024 * 1024
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -147,3 +340,22 @@ AUTH_USER_MODEL = "authentication.User"
 AUTHENTICATION_BACKENDS = (
     'django.contrib.auth.backends.ModelBackend',
 )
+
+# Journal des requêtes HTTP lentes (softdesk_support/instrumentation.py),
+# une ligne JSON par requête
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'softdesk_support.sql': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
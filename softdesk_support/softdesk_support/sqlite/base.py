@@ -0,0 +1,106 @@
+"""
+Moteur SQLite du profil de production (DATABASE_PROFILE=production dans
+settings.py).
+
+- Les pragmas de OPTIONS['pragmas'] sont appliqués à chaque connexion :
+  journal WAL (les lectures ne bloquent pas l'écriture et inversement),
+  synchronous=NORMAL, cache et mmap plus grands, tables temporaires en
+  mémoire.
+- Les transactions commencent par BEGIN IMMEDIATE : le verrou d'écriture
+  est demandé au début, avec l'attente de OPTIONS['timeout'], au lieu
+  d'échouer sans attendre quand une transaction qui a lu veut écrire
+  pendant qu'une autre écrit. Dans deferred_transactions(), elles
+  commencent par BEGIN, pour les transactions qui ne font que lire
+  (instantané cohérent sans bloquer les écritures).
+- Un BEGIN ou une requête hors transaction qui échoue avec "database is
+  locked" est relancé au plus OPTIONS['lock_retries'] fois, après une
+  attente croissante : rien n'a été écrit, la reprise est sans risque.
+  Dans une transaction, l'erreur est levée (tout est annulé).
+"""
+import random
+import time
+from contextlib import contextmanager
+
+from django.db.backends.sqlite3 import base
+
+# Options de ce moteur, qui ne sont pas passées à sqlite3.connect()
+ENGINE_OPTIONS = ('pragmas', 'lock_retries', 'lock_retry_delay')
+MAX_RETRY_DELAY = 1.0
+
+
+def is_locked(error):
+    return 'database is locked' in str(error)
+
+
+def retry_delay(delay, attempt):
+    # Attente exponentielle bornée, avec une part aléatoire pour que les
+    # écritures en attente ne repartent pas ensemble
+    return min(delay * 2 ** attempt, MAX_RETRY_DELAY) * \
+        random.uniform(0.5, 1)
+
+
+class SQLiteCursorWrapper(base.SQLiteCursorWrapper):
+    lock_retries = 0
+    lock_retry_delay = 0
+
+    def execute(self, query, params=None):
+        return self.retry_locked(super().execute, query, params)
+
+    def executemany(self, query, param_list):
+        if self.lock_retries:
+            # Paramètres relus à chaque tentative
+            param_list = list(param_list)
+        return self.retry_locked(super().executemany, query, param_list)
+
+    def retry_locked(self, method, *args):
+        for attempt in range(self.lock_retries + 1):
+            in_transaction = self.connection.in_transaction
+            try:
+                return method(*args)
+            except base.Database.OperationalError as error:
+                if (
+                        in_transaction or
+                        attempt == self.lock_retries or
+                        not is_locked(error)
+                ):
+                    raise
+            time.sleep(retry_delay(self.lock_retry_delay, attempt))
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    begin_statement = 'BEGIN IMMEDIATE'
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for name in ENGINE_OPTIONS:
+            params.pop(name, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = self.settings_dict['OPTIONS'].get('pragmas', {})
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def create_cursor(self, name=None):
+        options = self.settings_dict['OPTIONS']
+        cursor = self.connection.cursor(factory=SQLiteCursorWrapper)
+        cursor.lock_retries = options.get('lock_retries', 0)
+        cursor.lock_retry_delay = options.get('lock_retry_delay', 0)
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(self.begin_statement)
+
+    @contextmanager
+    def deferred_transactions(self):
+        """
+        Start the transactions of the block with BEGIN, without taking the
+        write lock
+        """
+        previous, self.begin_statement = self.begin_statement, 'BEGIN'
+        try:
+            yield
+        finally:
+            self.begin_statement = previous
@@ -22,8 +22,11 @@ from rest_framework_simplejwt.views import TokenObtainPairView, \
     TokenRefreshView
 
 from authentication.views import UserViewSet
+from api.throttling import LoginIPThrottle, LoginUsernameThrottle
 from api.views import ProjectAPIView, IssueAPIView, CommentAPIView, \
-    add_collaborator, delete_collaborator, change_status, assign_contributor
+    add_collaborator, delete_collaborator, change_status, assign_contributor, \
+    project_summary, project_export, bulk_update_issues, cache_stats, \
+    full_text_search
 
 # Utilisation d'un router pour la ressource User défini avec un ModelViewSet
 from authentication.views import SignUpView, LoginView
@@ -38,20 +41,32 @@ urlpatterns = [
     path('api/', include(router.urls)),
     path('api/sign-up/', SignUpView.as_view({'post': 'create'})),
     path('api/login/', LoginView.as_view()),
-    path('api/token', TokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path(
+        'api/token',
+        TokenObtainPairView.as_view(
+            throttle_classes=[LoginIPThrottle, LoginUsernameThrottle]
+        ),
+        name='token_obtain_pair'
+    ),
     path(
         'api/token/refresh',
         TokenRefreshView.as_view(),
         name='token_refresh'
     ),
 
+    path('api/cache/stats', cache_stats),
+    path('api/search', full_text_search),
+
     path('api/projects', ProjectAPIView.as_view()),
     path('api/projects/<int:pk>/', ProjectAPIView.as_view()),
     path('api/projects/<int:pk>/add_collaborator', add_collaborator),
     path('api/projects/<int:pk>/delete_collaborator', delete_collaborator),
+    path('api/projects/<int:pk>/summary', project_summary),
+    path('api/projects/<int:pk>/export', project_export),
 
     path('api/projects/<int:pk>/issues', IssueAPIView.as_view()),
     path('api/projects/<int:pk>/issues/<int:pk2>/', IssueAPIView.as_view()),
+    path('api/projects/<int:pk>/issues/bulk', bulk_update_issues),
     path(
         'api/projects/<int:pk>/issues/<int:pk2>/change_status',
         change_status